@@ -0,0 +1,4 @@
+set PYTHONPATH=%cd%\tools
+set EVE_ROOT=%cd%
+
+"C:\Python27\python.exe" %cd%\tools\core\database\service.py
\ No newline at end of file
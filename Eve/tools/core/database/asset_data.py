@@ -17,15 +17,24 @@ Asset configuration:
 
 # TODO: design asset configuration
 
-import sqlite3
 import entities
+import query
+import connection
+import profiler
+
+from core import settings
 
 
 class AssetData:
-    def __init__(self, SQL_FILE_PATH, asset_id):
-        # Load database
+    def __init__(self, SQL_FILE_PATH, asset_id,
+                 replica_path=settings.SQL_REPLICA_PATH, service_address=settings.SERVICE_ADDRESS,
+                 in_memory=settings.SQL_IN_MEMORY):
+        # Load database (read from local replica on farm nodes, work through Eve data service or in memory)
         self.SQL_FILE_PATH = SQL_FILE_PATH
+        self.connection = connection.get_pool(SQL_FILE_PATH, replica_path, service_address, in_memory)
         self.asset_id = asset_id
+        if settings.PROFILE_DATABASE:
+            profiler.instrument(self)
 
         # Data attributes
         self.asset = None
@@ -44,15 +53,5 @@ class AssetData:
                 self.asset_type_dic = entities.Asset.asset_types[asset_type]
 
     def get_asset(self, asset_id):
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        cursor.execute("SELECT * FROM assets WHERE id=:id",
-                       {'id': asset_id})
-
-        asset_tuple = cursor.fetchone()
-
-        connection.close()
 
-        if asset_tuple:
-            return entities.Converter.convert_to_asset([asset_tuple])[0]
+        return query.Query(entities.Asset).filter('id', asset_id).first(self.connection.cursor())
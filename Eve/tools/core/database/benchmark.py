@@ -0,0 +1,598 @@
+"""
+Eve database layer benchmarks
+
+Generate synthetic databases (generator.py) and time EveData, AssetData and entities.Converter methods
+on each scale. Results are saved as JSON, compare files made before and after a change to find regressions:
+    {"python": "2.7.18", "sqlite": "3.31.1", "created_at": "...",
+     "scales": {"small": {"parameters": {...}, "rows": {...}, "generate_time": 0.5,
+                          "results": {"EveData.get_asset": {"repeat": 20, "min": 0.05, "median": 0.06, ...}},
+                          "memory": {"Shot (100000 entities)": {"bytes": 20800000, "per_entity": 208}},
+                          "not_measured": [...]}}}
+Times are in milliseconds.
+
+Entity benchmarks compare __slots__ entities built by Converter with dict based entities built field by field
+(entities before __slots__, see DictShot) on 100k rows, by conversion time and memory.
+
+Benchmarks of reads run first, on data made by the generator. Then write methods add, change and remove
+their own entities. Work done to prepare each call (e.g. add a shot to delete) is not measured.
+Reads marked "(in memory)" run on in-memory copy of the database (memory.MemoryPool).
+
+Run from command line:
+    python benchmark.py <results.json> [small medium large] [--folder C:/temp] [--repeat 20]
+"""
+
+
+import gc
+import sys
+import time
+import json
+import inspect
+import itertools
+import sqlite3
+import datetime
+import platform
+import tempfile
+
+import entities
+import query
+import collection
+import eve_data
+import asset_data
+import generator
+import memory
+
+
+class DictShot:
+    """
+    Shot entity with attributes in instance dictionary, baseline of entity benchmarks
+    """
+
+    def __init__(self, shot_name, sequence_id):
+        self.id = None
+        self.name = shot_name
+        self.sequence = sequence_id
+        self.start_frame = ''
+        self.end_frame = ''
+        self.width = ''
+        self.height = ''
+        self.description = ''
+
+
+def convert_to_dict_shots(shot_tuples):
+
+    shots = []
+
+    for shot_tuple in shot_tuples:
+        shot = DictShot(shot_tuple[1], shot_tuple[2])
+        shot.id = shot_tuple[0]
+        shot.start_frame = shot_tuple[3]
+        shot.end_frame = shot_tuple[4]
+        shot.width = shot_tuple[5]
+        shot.height = shot_tuple[6]
+        shot.description = shot_tuple[7]
+        shots.append(shot)
+
+    return shots
+
+
+def get_memory(entity_objects):
+    """
+    Get memory used by entity objects: objects, their attribute dictionaries and loaded state tuples
+    (column values are shared with database rows and not counted)
+
+    :return: dictionary {'bytes': total size, 'per_entity': size of one entity}
+    """
+
+    size = 0
+    for entity in entity_objects:
+        size += sys.getsizeof(entity)
+        if hasattr(entity, '__dict__'):
+            size += sys.getsizeof(entity.__dict__)
+        if getattr(entity, 'loaded_state', None) is not None:
+            size += sys.getsizeof(entity.loaded_state)
+
+    return {'bytes': size, 'per_entity': size // max(len(entity_objects), 1)}
+
+
+def measure(function, setup=None, repeat=20):
+    """
+    Time function calls
+
+    :param function: function to measure
+    :param setup: function called before each measured call, returns tuple of function arguments
+    :param repeat: int, number of measured calls
+    :return: dictionary of call times in milliseconds
+    """
+
+    times = []
+    gc_enabled = gc.isenabled()
+
+    for _ in range(repeat):
+        arguments = setup() if setup else ()
+
+        gc.disable()
+        start = time.time()
+        function(*arguments)
+        times.append((time.time() - start) * 1000)
+        if gc_enabled:
+            gc.enable()
+
+    times.sort()
+
+    return {'repeat': repeat,
+            'min': times[0],
+            'median': times[len(times) // 2],
+            'mean': sum(times) / len(times),
+            'max': times[-1]}
+
+
+class Benchmark:
+    def __init__(self, SQL_FILE_PATH, repeat=20):
+        """
+        Benchmarks of one database
+
+        :param SQL_FILE_PATH: string, path to database made by generator.generate_database()
+        :param repeat: int, number of measured calls of each method
+        """
+
+        self.SQL_FILE_PATH = SQL_FILE_PATH
+        self.repeat = repeat
+        self.results = {}
+        self.memory = {}  # {name: dictionary of get_memory()}
+
+        self.eve_data = eve_data.EveData(SQL_FILE_PATH)
+
+        # Sample entities (lists hold partial entities, full entities are read by ID)
+        self.project = self.eve_data.get_project(self.eve_data.projects[0].id)
+        self.eve_data.get_project_sequences(self.project)
+        self.sequence = self.eve_data.get_sequence(self.eve_data.project_sequences[0].id)
+        self.eve_data.get_sequence_shots(self.sequence.id)
+        self.shot = self.eve_data.get_shot(self.eve_data.sequence_shots[0].id)
+        self.eve_data.get_project_assets(self.project)
+        self.asset = self.eve_data.get_asset(self.eve_data.project_assets[0].id)
+        self.asset_ids = [asset.id for asset in self.eve_data.project_assets[:100]]
+        self.shot_ids = [shot.id for shot in self.eve_data.sequence_shots[:100]]
+        self.unlinked_asset = self.eve_data.project_assets[-1]
+
+    def run(self, name, function, setup=None, repeat=None):
+
+        self.results[name] = measure(function, setup, repeat or self.repeat)
+
+    def drop_cache(self):
+        """
+        Setup for reads from database: forget cached entities and loaded project graph
+        """
+
+        self.eve_data.cache.clear()
+        self.eve_data.drop_project_graph()
+
+        return ()
+
+    def run_all(self):
+
+        self.run_converter()
+        self.run_entities()
+        self.run_collection()
+        self.run_reads()
+        self.run_change_feed()
+        self.run_writes()
+        self.run_asset_data()
+
+        self.eve_data.close()
+
+    # Benchmarks
+    def run_converter(self):
+
+        cursor = self.eve_data.connection.cursor()
+        converter = entities.Converter
+
+        rows = {}
+        for entity_class in [entities.Project, entities.Asset, entities.Sequence, entities.Shot,
+                             entities.AssetType]:
+            rows[entity_class] = query.Query(entity_class).rows(cursor)
+
+        self.run('Converter.convert_to_project', lambda: converter.convert_to_project(rows[entities.Project]))
+        self.run('Converter.convert_to_asset', lambda: converter.convert_to_asset(rows[entities.Asset]))
+        self.run('Converter.convert_to_sequence', lambda: converter.convert_to_sequence(rows[entities.Sequence]))
+        self.run('Converter.convert_to_shot', lambda: converter.convert_to_shot(rows[entities.Shot]))
+        self.run('Converter.convert_to_asset_types',
+                 lambda: converter.convert_to_asset_types(rows[entities.AssetType]))
+
+        assets = converter.convert_to_asset(rows[entities.Asset][:1000])
+        source_assets = converter.convert_to_asset(rows[entities.Asset][:1000])
+
+        def update_entities():
+            for asset, source_asset in zip(assets, source_assets):
+                converter.update_entity(asset, source_asset)
+
+        self.run('Converter.update_entity (1000 entities)', update_entities)
+
+    def run_entities(self, count=100000):
+        """
+        Build entities of count shot rows (database rows repeated with new IDs)
+        """
+
+        cursor = self.eve_data.connection.cursor()
+        shot_rows = query.Query(entities.Shot).rows(cursor)
+        rows = [(index + 1,) + tuple(row[1:]) for index, row in zip(range(count), itertools.cycle(shot_rows))]
+
+        self.run('Converter.convert_to_shot ({0} rows)'.format(count),
+                 lambda: entities.Converter.convert_to_shot(rows), repeat=5)
+        self.run('convert_to_dict_shots ({0} rows)'.format(count), lambda: convert_to_dict_shots(rows), repeat=5)
+
+        self.memory['Shot ({0} entities)'.format(count)] = get_memory(entities.Converter.convert_to_shot(rows))
+        self.memory['DictShot ({0} entities)'.format(count)] = get_memory(convert_to_dict_shots(rows))
+
+    def run_reads(self):
+
+        data = self.eve_data
+        project = self.project
+        asset_type = self.asset.type
+        name_prefix = self.asset.name[:5]
+        cursor = data.connection.cursor()
+
+        self.run('EveData.__init__', lambda: eve_data.EveData(self.SQL_FILE_PATH).close(), repeat=5)
+        self.run('EveData.__init__ (project scoped)',
+                 lambda: eve_data.EveData(self.SQL_FILE_PATH, project_name=project.name).close(), repeat=5)
+        self.run('EveData.init_data', data.init_data)
+        self.run('EveData.get_entity_lists', data.get_entity_lists)
+
+        # Project
+        self.run('EveData.get_projects', data.get_projects)
+        self.run('EveData.get_project', data.get_project, lambda: self.drop_cache() + (project.id,))
+        self.run('EveData.get_project (cached)', lambda: data.get_project(project.id))
+        self.run('EveData.get_project_by_name', lambda: data.get_project_by_name(project.name))
+        self.run('EveData.get_project_assets', data.get_project_assets, lambda: self.drop_cache() + (project,))
+        self.run('EveData.get_project_assets (type)', lambda: data.get_project_assets(project, asset_type),
+                 self.drop_cache)
+        self.run('EveData.get_project_assets (prefix)',
+                 lambda: data.get_project_assets(project, name_prefix=name_prefix), self.drop_cache)
+        self.run('EveData.get_project_sequences', data.get_project_sequences,
+                 lambda: self.drop_cache() + (project,))
+        self.run('EveData.read_sequence_shots', lambda: data.read_sequence_shots(self.sequence.id),
+                 self.drop_cache)
+        self.run('EveData.get_sequence_shots', lambda: data.get_sequence_shots(self.sequence.id), self.drop_cache)
+
+        # List entries (id, name) against full entities
+        asset_query = query.Query(entities.Asset).filter('project', project.id)
+        self.run('EveData.read_list (project assets)', lambda: data.read_list(asset_query), self.drop_cache)
+        self.run('Query.all (project assets)', lambda: asset_query.all(cursor))
+
+        def partial_asset():
+            entry = entities.Asset.from_list_row((self.asset.id, self.asset.name))
+            return collection.EntityCollection([entry]), self.asset
+
+        self.run('EveData.fill_partial', data.fill_partial, partial_asset)
+
+        # Pages
+        self.run('EveData.get_project_assets_page', lambda: data.get_project_assets_page(project))
+        self.run('EveData.get_project_assets_page (last)',
+                 lambda: data.get_project_assets_page(project, after_id=data.project_assets[-1].id - 10))
+        self.run('EveData.get_project_sequences_page', lambda: data.get_project_sequences_page(project))
+        self.run('EveData.get_sequence_shots_page', lambda: data.get_sequence_shots_page(self.sequence.id))
+        self.run('EveData.read_page',
+                 lambda: data.read_page(query.Query(entities.Asset).filter('project', project.id), None, 200))
+
+        # Project graph
+        self.run('EveData.read_project_graph', data.read_project_graph, lambda: (project,), repeat=5)
+        self.run('EveData.read_project_links', data.read_project_links, lambda: (project.id,), repeat=5)
+        self.run('EveData.load_project_graph', data.load_project_graph, lambda: self.drop_cache() + (project,),
+                 repeat=5)
+        self.run('EveData.get_project_graph', data.get_project_graph)
+        self.run('EveData.get_project_assets (graph)', lambda: data.get_project_assets(project))
+        self.run('EveData.find_loaded_entity', lambda: data.find_loaded_entity('assets', self.asset.id))
+        self.run('EveData.get_asset_shots (graph)', lambda: data.get_asset_shots(self.asset.id))
+        self.run('EveData.get_asset_usage (graph)', lambda: data.get_asset_usage(project))
+        self.run('EveData.drop_project_graph', data.drop_project_graph)
+        project_graph = data.read_project_graph(project)
+        self.run('EveData.set_project_graph', data.set_project_graph, lambda: (project_graph,))
+        data.drop_project_graph()
+
+        # In-memory copy
+        self.run('EveData.__init__ (in memory)',
+                 lambda: eve_data.EveData(self.SQL_FILE_PATH, in_memory=memory.SNAPSHOT).close(), repeat=5)
+        memory_data = eve_data.EveData(self.SQL_FILE_PATH, in_memory=memory.SNAPSHOT)
+        self.run('EveData.read_project_graph (in memory)', memory_data.read_project_graph, lambda: (project,),
+                 repeat=5)
+        self.run('EveData.get_project_assets (in memory)', lambda: memory_data.get_project_assets(project),
+                 lambda: memory_data.cache.clear() or ())
+        memory_data.close()
+
+        # Entities
+        self.run('EveData.get_asset', data.get_asset, lambda: self.drop_cache() + (self.asset.id,))
+        self.run('EveData.get_asset (cached)', lambda: data.get_asset(self.asset.id))
+        self.run('EveData.get_assets_by_ids (100)', data.get_assets_by_ids,
+                 lambda: self.drop_cache() + (self.asset_ids,))
+        self.run('EveData.get_asset_by_name', lambda: data.get_asset_by_name(project.id, self.asset.name))
+        self.run('EveData.get_asset_types', data.get_asset_types)
+        self.run('EveData.get_asset_type_string', lambda: data.get_asset_type_string(asset_type))
+        self.run('EveData.get_sequence', data.get_sequence, lambda: self.drop_cache() + (self.sequence.id,))
+        self.run('EveData.get_sequences_by_ids', data.get_sequences_by_ids,
+                 lambda: self.drop_cache() + ([self.sequence.id],))
+        self.run('EveData.get_shot', data.get_shot, lambda: self.drop_cache() + (self.shot.id,))
+        self.run('EveData.get_shots_by_ids (100)', data.get_shots_by_ids,
+                 lambda: self.drop_cache() + (self.shot_ids,))
+        self.run('EveData.read_shot_assets', lambda: data.read_shot_assets(self.shot.id), self.drop_cache)
+        self.run('EveData.read_links', lambda: data.read_links(cursor, self.shot.id))
+        self.run('EveData.get_shot_assets', lambda: data.get_shot_assets(self.shot.id), self.drop_cache)
+        self.run('EveData.get_asset_shots', lambda: data.get_asset_shots(self.asset.id), self.drop_cache)
+        self.run('EveData.get_asset_usage', lambda: data.get_asset_usage(project), self.drop_cache)
+        self.run('EveData.get_rows_by_ids (100)', lambda: data.get_rows_by_ids(entities.Asset, self.asset_ids))
+        self.run('EveData.get_last_id', lambda: data.get_last_id(cursor, 'assets'))
+        self.run('EveData.get_inserted_ids', lambda: data.get_inserted_ids(cursor, 'assets', self.asset_ids[-1]))
+
+        # Search
+        self.run('EveData.search', lambda: data.search(project, name_prefix))
+        self.run('EveData.scan_search', lambda: data.scan_search(cursor, project, [name_prefix], ['assets'], 50))
+
+        self.run('EveData.close', data.close)  # Next read opens new connection
+
+    def run_change_feed(self):
+
+        data = self.eve_data
+
+        self.run('EveData.get_change_token', data.get_change_token)
+        self.run('EveData.pull_changes (not changed)', data.pull_changes)
+
+    def run_writes(self):
+
+        data = self.eve_data
+        project = self.project
+        token = data.get_change_token()
+
+        def new_project():
+            return entities.Project('benchmark_project'),
+
+        def new_asset():
+            return entities.Asset('benchmark_asset', project.id), project.id
+
+        def new_assets():
+            return [entities.Asset('benchmark_asset', project.id) for _ in range(100)], project.id
+
+        def new_sequence():
+            return entities.Sequence('benchmark_sequence', project.id), project.id
+
+        def new_sequences():
+            return [entities.Sequence('benchmark_sequence', project.id) for _ in range(100)], project.id
+
+        def new_shot():
+            return entities.Shot('benchmark_shot', self.sequence.id), self.sequence.id
+
+        def new_shots():
+            return [entities.Shot('benchmark_shot', self.sequence.id) for _ in range(100)], self.sequence.id
+
+        def added(add_entity, new_entity):
+            """
+            Setup of delete benchmarks: add entity and return its ID
+            """
+
+            arguments = new_entity()
+            add_entity(*arguments)
+
+            return arguments[0].id,
+
+        edits = itertools.count()
+
+        def changed(entity):
+            """
+            Setup of update benchmarks: edit description, so update writes one column
+            """
+
+            entity.description = 'benchmark {0}'.format(next(edits))
+
+            return entity,
+
+        # Project
+        self.run('EveData.add_project', data.add_project, new_project)
+        self.run('EveData.update_project', data.update_project, lambda: changed(data.projects[-1]))
+        self.run('EveData.del_project', data.del_project, lambda: added(data.add_project, new_project))
+
+        # Assets
+        self.run('EveData.add_asset', data.add_asset, new_asset)
+        self.run('EveData.add_assets (100)', data.add_assets, new_assets, repeat=5)
+        self.run('EveData.update_asset', data.update_asset, lambda: changed(self.asset))
+        self.run('EveData.del_asset', data.del_asset, lambda: added(data.add_asset, new_asset))
+
+        # Sequences
+        self.run('EveData.add_sequence', data.add_sequence, new_sequence)
+        self.run('EveData.add_sequences (100)', data.add_sequences, new_sequences, repeat=5)
+        self.run('EveData.update_sequence', data.update_sequence, lambda: changed(self.sequence))
+        self.run('EveData.del_sequence', data.del_sequence, lambda: added(data.add_sequence, new_sequence))
+
+        # Shots
+        self.run('EveData.add_shot', data.add_shot, new_shot)
+        self.run('EveData.add_shots (100)', data.add_shots, new_shots, repeat=5)
+        self.run('EveData.update_shot', data.update_shot, lambda: changed(self.shot))
+        self.run('EveData.update_shot (not changed)', data.update_shot, lambda: (self.shot,))
+        self.run('EveData.save', data.save, lambda: changed(self.shot) + (['description'],))
+        self.run('EveData.del_shot', data.del_shot, lambda: added(data.add_shot, new_shot))
+
+        # Links
+        def unlinked():
+            data.unlink_asset(self.unlinked_asset.id, self.shot.id)
+            return self.unlinked_asset.id, self.shot.id
+
+        def linked():
+            data.link_asset(self.unlinked_asset.id, self.shot.id)
+            return self.unlinked_asset.id, self.shot.id
+
+        self.run('EveData.link_asset', data.link_asset, unlinked)
+        self.run('EveData.unlink_asset', data.unlink_asset, linked)
+
+        many_ids = self.asset_ids[:50]
+
+        def unlinked_many():
+            data.unlink_many(self.shot.id, many_ids)
+            return self.shot.id, many_ids
+
+        def linked_many():
+            data.link_many(self.shot.id, many_ids)
+            return self.shot.id, many_ids
+
+        def link_one_by_one(shot_id, asset_ids):
+            for asset_id in asset_ids:
+                data.link_asset(asset_id, shot_id)
+
+        self.run('EveData.link_many (50)', data.link_many, unlinked_many, repeat=5)
+        self.run('EveData.link_asset (50 one by one)', link_one_by_one, unlinked_many, repeat=5)
+        self.run('EveData.unlink_many (50)', data.unlink_many, linked_many, repeat=5)
+        self.run('EveData.set_shot_assets (50)', data.set_shot_assets, unlinked_many, repeat=5)
+        self.run('EveData.change_links', data.change_links, lambda: unlinked_many() + ([],))
+
+        def delete_links(shot_id, asset_ids):
+            with data.connection.transaction() as cursor:
+                data.delete_links(cursor, shot_id, asset_ids)
+
+        self.run('EveData.delete_links (50)', delete_links, linked_many, repeat=5)
+        self.run('EveData.write', lambda: data.write(('shots', self.shot.id), "UPDATE shots SET width=? WHERE id=?",
+                                                     (1920, self.shot.id)))
+        self.run('EveData.flush', data.flush)
+
+        # Write-behind: edits are queued until flush (long delay, flush thread does not interfere)
+        queued_data = eve_data.EveData(self.SQL_FILE_PATH, write_delay=3600)
+        shots = queued_data.get_shots_by_ids(self.shot_ids[:50])
+
+        def queue_updates():
+            for shot in shots:
+                queued_data.update_shot(changed(shot)[0])
+
+        self.run('EveData.update_shot (write-behind)', queued_data.update_shot, lambda: changed(self.shot))
+        self.run('EveData.flush (write-behind, 50 updates)', queued_data.flush, lambda: queue_updates() or ())
+        self.run('EveData.on_flush', queued_data.on_flush, lambda: ([('shots', shot.id) for shot in shots], []))
+
+        def queue_links(shot_id, asset_ids):
+            for asset_id in asset_ids:
+                queued_data.link_asset(asset_id, shot_id)
+
+        self.run('EveData.link_asset (write-behind, 50 one by one)', queue_links,
+                 lambda: queued_data.flush() or unlinked_many(), repeat=5)
+        self.run('EveData.read_queued_links', queued_data.read_queued_links, lambda: (self.shot.id,))
+        queued_data.flush()
+        queued_data.close()
+
+        # Changes made by writes above
+        self.run('EveData.changes_since', data.changes_since, lambda: (token,))
+        changes = data.changes_since(token)
+        self.run('EveData.apply_changes', data.apply_changes, lambda: (changes,))
+        self.run('EveData.sync_loaded_data', data.sync_loaded_data,
+                 lambda: setattr(data, 'change_token', token) or ())
+        self.run('EveData.on_commit', data.on_commit, lambda: (data.change_token, data.change_token))
+
+    def run_collection(self):
+
+        assets = list(self.eve_data.project_assets)
+        assets_collection = collection.EntityCollection(assets)
+        asset = assets[-1]
+
+        def copy(entities_list=assets):
+            return (collection.EntityCollection(entities_list),)
+
+        def unindexed():
+            data = collection.EntityCollection(assets)
+            data.refresh([])  # Rows and names are rebuilt on next lookup
+            return (data,)
+
+        self.run('EntityCollection.__init__', collection.EntityCollection, lambda: (assets,))
+        self.run('EntityCollection.get', lambda: assets_collection.get(asset.id))
+        self.run('EntityCollection.get_by_name', lambda: assets_collection.get_by_name(asset.name))
+        self.run('EntityCollection.row', lambda: assets_collection.row(asset.id))
+        self.run('EntityCollection.index', lambda: assets_collection.index(asset))
+        self.run('EntityCollection.ids', assets_collection.ids)
+        self.run('EntityCollection.update_index', lambda data: data.update_index(), unindexed)
+        self.run('EntityCollection.notify', lambda: assets_collection.notify('rows_changed', 0, 0))
+        self.run('EntityCollection.append', lambda data: data.append(asset), lambda: copy(assets[:-1]))
+        self.run('EntityCollection.extend', lambda data: data.extend(assets), lambda: copy([]))
+        self.run('EntityCollection.set_entity', lambda: assets_collection.set_entity(asset))
+        self.run('EntityCollection.refresh (100)', lambda: assets_collection.refresh(self.asset_ids))
+        self.run('EntityCollection.remove', lambda data: data.remove(asset), copy)
+        self.run('EntityCollection.remove_ids (100)', lambda data: data.remove_ids(self.asset_ids), copy)
+        self.run('EntityCollection.replace', lambda data: data.replace(assets), copy)
+        self.run('EntityCollection.clear', lambda data: data.clear(), copy)
+
+    def run_asset_data(self):
+
+        self.run('AssetData.__init__',
+                 lambda: asset_data.AssetData(self.SQL_FILE_PATH, self.asset.id).connection.close())
+
+        data = asset_data.AssetData(self.SQL_FILE_PATH, self.asset.id)
+        self.run('AssetData.init_asset', data.init_asset)
+        self.run('AssetData.get_asset', lambda: data.get_asset(self.asset.id))
+        data.connection.close()
+
+    def get_not_measured(self):
+        """
+        Public methods of benchmarked classes without results (new methods need a benchmark)
+        """
+
+        measured = set([name.split(' ')[0] for name in self.results])
+        not_measured = []
+
+        for class_name, data_class in [('EveData', eve_data.EveData),
+                                       ('AssetData', asset_data.AssetData),
+                                       ('Converter', entities.Converter),
+                                       ('EntityCollection', collection.EntityCollection)]:
+            for name, member in inspect.getmembers(data_class):
+                if name.startswith('_') and name != '__init__' or not callable(member):
+                    continue
+
+                method_name = '{0}.{1}'.format(class_name, name)
+                if method_name not in measured:
+                    not_measured.append(method_name)
+
+        return not_measured
+
+
+def run_benchmarks(results_path, scales, folder=None, repeat=20):
+    """
+    Generate database of each scale, run benchmarks and save results to JSON file
+
+    :param results_path: string, path to JSON file
+    :param scales: list of scale names (generator.SCALES keys)
+    :param folder: string, folder for database files (system temp folder by default)
+    :param repeat: int, number of measured calls of each method
+    """
+
+    folder = folder or tempfile.gettempdir()
+    report = {'created_at': datetime.datetime.now().isoformat(),
+              'python': platform.python_version(),
+              'sqlite': sqlite3.sqlite_version,
+              'scales': {}}
+
+    for scale in scales:
+        SQL_FILE_PATH = '{0}/eve_benchmark_{1}.db'.format(folder, scale)
+
+        print '>> Generating {0} database...'.format(scale)
+        start = time.time()
+        rows = generator.generate_database(SQL_FILE_PATH, **generator.SCALES[scale])
+        generate_time = time.time() - start
+
+        print '>> Running {0} benchmarks...'.format(scale)
+        benchmark = Benchmark(SQL_FILE_PATH, repeat)
+        benchmark.run_all()
+
+        report['scales'][scale] = {'parameters': generator.SCALES[scale],
+                                   'rows': rows,
+                                   'generate_time': generate_time,
+                                   'results': benchmark.results,
+                                   'memory': benchmark.memory,
+                                   'not_measured': benchmark.get_not_measured()}
+
+    with open(results_path, 'w') as json_file:
+        json.dump(report, json_file, indent=4, sort_keys=True)
+
+    print '>> Benchmark results saved to {0}'.format(results_path)
+
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Eve database benchmarks')
+    parser.add_argument('results', help='path to results JSON file')
+    parser.add_argument('scales', nargs='*', default=['small', 'medium'], choices=sorted(generator.SCALES))
+    parser.add_argument('--folder', help='folder for generated databases')
+    parser.add_argument('--repeat', type=int, default=20, help='number of measured calls of each method')
+    arguments = parser.parse_args()
+
+    run_benchmarks(arguments.results, arguments.scales, arguments.folder, arguments.repeat)
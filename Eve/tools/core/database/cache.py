@@ -0,0 +1,165 @@
+"""
+Identity map for Eve entities
+
+Keep entities read from the database by (table, id) and return the same object on repeated reads.
+Cache is bounded, least recently used entities are evicted first.
+
+Other processes (artists) write to the same eve.db, so before each lookup cache compares
+PRAGMA data_version of the connection with the value seen last time. The value changes only when
+another connection commits to the database, in this case EntityCache.updater (EveData.sync_loaded_data)
+applies the changes to cached entities, without updater the whole cache is dropped.
+Writes done by EveData itself update the cache directly (put, remove).
+Other data built from database rows (e.g. project graph) can subscribe to drops with EntityCache.listeners.
+"""
+
+
+import threading
+from collections import OrderedDict
+
+
+class EntityCache:
+    def __init__(self, connection, size):
+        """
+        :param connection: connection.ConnectionPool
+        :param size: int, maximum number of cached entities, 0 disables cache
+        """
+
+        self.connection = connection
+        self.size = size
+
+        self.listeners = []  # Functions called when cache is dropped
+        self.updater = None  # Function which applies external changes to cached entities, returns True on success
+
+        self._entities = OrderedDict()
+        self._data_versions = {}  # {connection: data_version}
+        self._lock = threading.Lock()
+
+    def get_data_version(self):
+        """
+        Get data version of the current thread connection
+        """
+
+        return self.connection.get_data_version()
+
+    def validate(self):
+        """
+        Bring cached entities up to date if another connection has changed the database since last check:
+        apply the changes with updater or drop the cache.
+
+        Data version is stored only when cache is current, so changes which updater could not apply yet
+        (e.g. in a worker thread) are seen again by the next check.
+
+        :return: True if cache is current, False if it should not be used
+        """
+
+        connection, data_version = self.get_data_version()
+
+        with self._lock:
+            last_version = self._data_versions.get(connection)
+
+        if last_version == data_version:
+            return True
+
+        if self.updater:
+            if not self.updater():
+                return False
+        elif last_version is not None:
+            self.drop()
+
+        with self._lock:
+            self._data_versions[connection] = data_version
+
+        return True
+
+    def drop(self):
+        """
+        Drop cached entities and notify listeners, e.g. when database file was replaced
+        """
+
+        with self._lock:
+            self._entities.clear()
+
+        for listener in self.listeners:
+            listener()
+
+    def get(self, table, entity_id):
+        """
+        Get entity from cache
+
+        :param table: string, table name of the entity ('assets', 'shots', etc)
+        :param entity_id: int, database ID
+        :return: entity object or None
+        """
+
+        if not self.size or not self.validate():
+            return
+
+        key = (table, entity_id)
+
+        with self._lock:
+            entity = self._entities.pop(key, None)
+            if entity is not None:
+                self._entities[key] = entity  # Mark as recently used
+
+        return entity
+
+    def peek(self, table, entity_id):
+        """
+        Get entity from cache without validation
+        """
+
+        with self._lock:
+            return self._entities.get((table, entity_id))
+
+    def get_many(self, table, entity_ids):
+        """
+        Get cached entities for many ids with one validation
+
+        :return: dictionary {id: entity} of cached entities
+        """
+
+        if not self.size or not self.validate():
+            return {}
+
+        entities = {}
+
+        with self._lock:
+            for entity_id in entity_ids:
+                key = (table, entity_id)
+                entity = self._entities.pop(key, None)
+                if entity is not None:
+                    self._entities[key] = entity
+                    entities[entity_id] = entity
+
+        return entities
+
+    def put(self, table, entity):
+        """
+        Add or replace entity in cache
+        """
+
+        if not self.size:
+            return
+
+        with self._lock:
+            key = (table, entity.id)
+            self._entities.pop(key, None)
+            self._entities[key] = entity
+
+            while len(self._entities) > self.size:
+                self._entities.popitem(last=False)
+
+    def put_many(self, table, entities):
+
+        for entity in entities:
+            self.put(table, entity)
+
+    def remove(self, table, entity_id):
+
+        with self._lock:
+            self._entities.pop((table, entity_id), None)
+
+    def clear(self):
+
+        with self._lock:
+            self._entities.clear()
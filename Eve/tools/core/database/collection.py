@@ -0,0 +1,252 @@
+"""
+Ordered collection of Eve entities with lookup by ID and name
+
+EveData lists (projects, project_assets, project_sequences, sequence_shots, shot_assets) are EntityCollections:
+    asset = eve_data.project_assets.get(asset_id)
+    asset = eve_data.project_assets.get_by_name('chair')
+    eve_data.project_assets.remove_ids([asset_id])
+
+Collection keeps insertion order and reads like a list (len, iteration, index, slices), so it serves as data
+of models.ListModel. Models observe the collection and receive row notifications before and after each change:
+    rows_about_to_be_inserted(first, last), rows_inserted()
+    rows_about_to_be_removed(first, last), rows_removed()
+    rows_changed(first, last)
+    rows_about_to_be_reset(), rows_reset()
+"""
+
+
+import weakref
+
+
+class EntityCollection:
+    def __init__(self, entities=None):
+        """
+        :param entities: list of entities with id and name attributes
+        """
+
+        self._entities = []
+        self._ids = {}  # {id: entity}
+        self._rows = {}  # {id: row}, rebuilt on demand after rows were removed
+        self._names = {}  # {name: entity}, first entity with the name, rebuilt on demand
+        self._indexed = True  # Rows and names are up to date
+        self._names_indexed = True  # Names are up to date, set_entity can rename entity without moving rows
+
+        self.observers = weakref.WeakSet()  # Models showing the collection
+
+        if entities:
+            self.extend(entities)
+
+    # List interface
+    def __len__(self):
+
+        return len(self._entities)
+
+    def __iter__(self):
+
+        return iter(self._entities)
+
+    def __getitem__(self, index):
+
+        return self._entities[index]
+
+    def __contains__(self, entity):
+
+        return getattr(entity, 'id', None) in self._ids
+
+    def __repr__(self):
+
+        return 'EntityCollection({0})'.format(self._entities)
+
+    def index(self, entity):
+        """
+        Get row of the entity, raise ValueError if entity is not in collection
+        """
+
+        row = self.row(getattr(entity, 'id', None))
+        if row == -1:
+            raise ValueError('Entity is not in collection')
+
+        return row
+
+    # Lookup
+    def update_index(self):
+
+        if self._indexed:
+            return
+
+        self._rows = {}
+        self._names = {}
+        for row, entity in enumerate(self._entities):
+            self._rows[entity.id] = row
+            self._names.setdefault(entity.name, entity)
+
+        self._indexed = True
+        self._names_indexed = True
+
+    def get(self, entity_id, default=None):
+        """
+        Get entity by database ID
+        """
+
+        return self._ids.get(entity_id, default)
+
+    def get_by_name(self, name):
+        """
+        Get first entity with the name or None
+        """
+
+        self.update_index()
+
+        if not self._names_indexed:
+            self._names = {}
+            for entity in self._entities:
+                self._names.setdefault(entity.name, entity)
+            self._names_indexed = True
+
+        return self._names.get(name)
+
+    def row(self, entity_id):
+        """
+        Get row of the entity by database ID, -1 if entity is not in collection
+        """
+
+        if entity_id not in self._ids:
+            return -1
+
+        self.update_index()
+
+        return self._rows[entity_id]
+
+    def ids(self):
+
+        return [entity.id for entity in self._entities]
+
+    # Change
+    def notify(self, event, *args):
+
+        for observer in list(self.observers):
+            getattr(observer, event)(*args)
+
+    def append(self, entity):
+
+        self.extend([entity])
+
+    def extend(self, entities):
+        """
+        Add entities to the end. Entity with ID already in collection replaces the old entity in its row.
+        """
+
+        new_entities = []
+
+        for entity in entities:
+            if entity.id in self._ids:
+                self.set_entity(entity)
+            else:
+                self._ids[entity.id] = entity
+                new_entities.append(entity)
+
+        if not new_entities:
+            return
+
+        first = len(self._entities)
+        self.notify('rows_about_to_be_inserted', first, first + len(new_entities) - 1)
+
+        self._entities.extend(new_entities)
+        if self._indexed:
+            for row, entity in enumerate(new_entities, first):
+                self._rows[entity.id] = row
+                self._names.setdefault(entity.name, entity)
+
+        self.notify('rows_inserted')
+
+    def set_entity(self, entity):
+        """
+        Replace entity with the same ID
+        """
+
+        row = self.row(entity.id)
+        old_entity = self._entities[row]
+        self._entities[row] = entity
+        self._ids[entity.id] = entity
+
+        # Row does not move, name lookup is updated in place. If the first entity with old name was renamed,
+        # next entity with that name is found when names are read.
+        if self._indexed and self._names_indexed:
+            first = self._names.get(entity.name)
+            if old_entity.name != entity.name and self._names.get(old_entity.name) is old_entity:
+                self._names_indexed = False
+            elif first is None or first is old_entity or self._rows[first.id] > row:
+                self._names[entity.name] = entity
+
+        self.notify('rows_changed', row, row)
+
+    def refresh(self, entity_ids):
+        """
+        Entities were changed in place: update name lookup and notify observers
+        """
+
+        self._names_indexed = False
+
+        for entity_id in entity_ids:
+            row = self.row(entity_id)
+            if row != -1:
+                self.notify('rows_changed', row, row)
+
+    def remove(self, entity):
+
+        self.remove_ids([entity.id])
+
+    def remove_ids(self, entity_ids):
+        """
+        Remove entities by database IDs, IDs which are not in collection are ignored
+        """
+
+        removed_ids = set([entity_id for entity_id in entity_ids if entity_id in self._ids])
+        if not removed_ids:
+            return
+
+        if not self.observers:
+            self._entities = [entity for entity in self._entities if entity.id not in removed_ids]
+        else:
+            # Remove ranges of adjacent rows, last range first, so rows of other ranges do not move
+            rows = sorted([self.row(entity_id) for entity_id in removed_ids], reverse=True)
+            while rows:
+                last = first = rows.pop(0)
+                while rows and rows[0] == first - 1:
+                    first = rows.pop(0)
+
+                self.notify('rows_about_to_be_removed', first, last)
+                del self._entities[first:last + 1]
+                self.notify('rows_removed')
+
+        for entity_id in removed_ids:
+            del self._ids[entity_id]
+        self._indexed = False
+
+    def replace(self, entities):
+        """
+        Replace all entities (observers reset)
+        """
+
+        self.notify('rows_about_to_be_reset')
+
+        self._entities = []
+        self._ids = {}
+        self._rows = {}
+        self._names = {}
+        self._indexed = True
+        self._names_indexed = True
+
+        for entity in entities:
+            if entity.id in self._ids:
+                continue
+            self._ids[entity.id] = entity
+            self._rows[entity.id] = len(self._entities)
+            self._names.setdefault(entity.name, entity)
+            self._entities.append(entity)
+
+        self.notify('rows_reset')
+
+    def clear(self):
+
+        self.replace([])
@@ -0,0 +1,214 @@
+"""
+SQLite connection management for Eve database
+
+Eve database (eve.db) usually sits on a network share, so opening a connection costs a round trip and a file lock.
+ConnectionPool keeps one long-lived connection per thread and applies the PRAGMA profile from settings once,
+when the connection is opened.
+
+Usage:
+    pool = ConnectionPool(SQL_FILE_PATH)
+
+    # Read
+    cursor = pool.cursor()
+    cursor.execute("SELECT * FROM projects")
+
+    # Write (BEGIN IMMEDIATE ... COMMIT, nested blocks become savepoints)
+    with pool.transaction() as cursor:
+        cursor.execute("DELETE FROM projects WHERE id=:id", {'id': 1})
+
+PRAGMA data_version of a connection changes when other connections of the same pool commit, so data read
+by the pool owner can not tell own commits from commits of other clients by data_version alone.
+Commit listeners (add_commit_listener) get database revision before and after each own write transaction.
+
+Use get_pool() to get a pool configured for the current machine: direct connection to eve.db,
+local read replica on render farm nodes (replica.ReplicaPool), Eve data service client (service.ServicePool)
+or in-memory copy of eve.db (memory.MemoryPool).
+"""
+
+
+import sys
+import sqlite3
+import threading
+import contextlib
+
+from core import settings
+
+
+def rollback(connection, savepoint=None):
+    """
+    Roll back transaction (or savepoint) after an error. Errors of the rollback itself are ignored,
+    so the original error is raised by the caller, e.g. SQLite could already roll back a failed COMMIT.
+    """
+
+    try:
+        if savepoint:
+            connection.execute('ROLLBACK TO {0}'.format(savepoint))
+            connection.execute('RELEASE {0}'.format(savepoint))
+        else:
+            connection.execute('ROLLBACK')
+    except sqlite3.Error:
+        pass
+
+
+def get_pool(SQL_FILE_PATH, replica_path=None, service_address=None, in_memory=None):
+    """
+    Get connection pool of Eve database
+
+    :param SQL_FILE_PATH: string, path to eve.db
+    :param replica_path: string, path to local replica file
+    :param service_address: string, "host:port" of Eve data service
+    :param in_memory: string, work with in-memory copy of eve.db: memory.SNAPSHOT or memory.WRITE_BACK
+    :return: ConnectionPool, replica.ReplicaPool, service.ServicePool or memory.MemoryPool
+    """
+
+    if in_memory:
+        import memory
+        if in_memory not in (memory.SNAPSHOT, memory.WRITE_BACK):
+            raise ValueError('Unknown in-memory mode "{0}"'.format(in_memory))
+        return memory.MemoryPool(SQL_FILE_PATH, write_back=in_memory == memory.WRITE_BACK)
+
+    if service_address:
+        import service
+        return service.ServicePool(service_address)
+
+    if replica_path:
+        import replica
+        return replica.ReplicaPool(SQL_FILE_PATH, replica_path)
+
+    return ConnectionPool(SQL_FILE_PATH)
+
+
+class ConnectionPool:
+    def __init__(self, SQL_FILE_PATH, pragmas=None):
+        self.SQL_FILE_PATH = SQL_FILE_PATH
+        self.pragmas = pragmas if pragmas is not None else settings.SQL_PRAGMAS
+
+        # Connection per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+        self._commit_listeners = []  # (get_revision, listener), see add_commit_listener
+
+    def open(self):
+        """
+        Create new connection to the database and apply PRAGMA profile.
+
+        Connection works in autocommit mode (isolation_level=None),
+        transactions are controlled explicitly with ConnectionPool.transaction()
+        """
+
+        connection = sqlite3.connect(self.SQL_FILE_PATH, isolation_level=None, check_same_thread=False,
+                                     cached_statements=settings.SQL_CACHED_STATEMENTS)
+
+        for pragma, value in self.pragmas:
+            connection.execute('PRAGMA {0}={1}'.format(pragma, value))
+
+        return connection
+
+    def get(self):
+        """
+        Get connection of the current thread, open it on first use
+        """
+
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = self.open()
+            self._local.connection = connection
+            self._local.depth = 0
+
+            with self._lock:
+                self._connections.append(connection)
+
+        return connection
+
+    def cursor(self):
+        """
+        Get cursor of the current thread connection
+        """
+
+        return self.get().cursor()
+
+    def get_data_version(self):
+        """
+        Get PRAGMA data_version of the current thread connection.
+        The value changes when another connection commits to the database.
+
+        :return: tuple (connection, data_version)
+        """
+
+        connection = self.get()
+
+        return connection, connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def add_commit_listener(self, get_revision, listener):
+        """
+        Call listener after each committed write transaction of the pool (on any thread)
+
+        :param get_revision: function(cursor), reads database revision inside the transaction
+        :param listener: function(revision, new_revision), revisions before and after the transaction
+        """
+
+        self._commit_listeners.append((get_revision, listener))
+
+    @contextlib.contextmanager
+    def transaction(self, mode='IMMEDIATE'):
+        """
+        Run statements in one transaction. Commit on exit, rollback on exception.
+
+        By default outer block holds the write lock (BEGIN IMMEDIATE) until commit,
+        use mode='DEFERRED' to read several tables from one consistent snapshot.
+        Nested blocks are savepoints, so they can fail without breaking the outer transaction.
+        Failed COMMIT (or RELEASE of savepoint) is rolled back, so the connection can start next transaction.
+        """
+
+        connection = self.get()
+        depth = self._local.depth
+        savepoint = 'eve_{0}'.format(depth) if depth else None
+
+        # Write transaction holds the write lock, revisions read inside it do not include commits of other clients
+        listeners = self._commit_listeners if depth == 0 and mode != 'DEFERRED' else []
+        revisions = []
+
+        if depth == 0:
+            connection.execute('BEGIN {0}'.format(mode))
+        else:
+            connection.execute('SAVEPOINT {0}'.format(savepoint))
+
+        self._local.depth = depth + 1
+
+        try:
+            for get_revision, listener in listeners:
+                revisions.append(get_revision(connection.cursor()))
+
+            yield connection.cursor()
+
+            new_revisions = [get_revision(connection.cursor()) for get_revision, listener in listeners]
+
+            if depth == 0:
+                connection.execute('COMMIT')
+            else:
+                connection.execute('RELEASE {0}'.format(savepoint))
+        except:
+            error = sys.exc_info()
+            rollback(connection, savepoint)
+            raise error[0], error[1], error[2]
+        finally:
+            self._local.depth = depth
+
+        for (get_revision, listener), revision, new_revision in zip(listeners, revisions, new_revisions):
+            listener(revision, new_revision)
+
+    def close(self):
+        """
+        Close all connections opened by the pool
+        """
+
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+            del self._connections[:]
+
+        self._local = threading.local()
@@ -1,9 +1,135 @@
 """
 Database entities classes for all tables
+
+Entities stored in the database declare table name and columns (in table order), used by query.Query
+
+Entities remember column values loaded from the database (loaded_state). Update methods of EveData write
+only columns changed since load or last save, and nothing if entity was not changed:
+    shot.start_frame = 1001
+    shot.get_changes(['start_frame', 'end_frame'])  # {'start_frame': 1001}
+
+Entities keep column values in __slots__ (no per object __dict__), projects hold hundred thousands of them.
+from_row() builds an entity from a database row in one step, the row itself becomes loaded state.
+Entities accept only declared attributes.
+
+Lists in UI show only names, so list queries read LIST_COLUMNS and build partial entities (from_list_row).
+Partial entity has no other columns and no loaded state until EveData fills it with the full row
+when the entity is selected (EveData.get_asset, get_shot...).
 """
 
 
-class Project:
+# Columns read by list queries for Qt models (see models.ListModel)
+LIST_COLUMNS = ['id', 'name']
+
+
+class Entity(object):
+    __slots__ = ('loaded_state',)  # Tuple of column values in database (in columns order), None if entity is not saved
+
+    table = None
+    columns = []
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Build entity from a database row, row values are in columns order
+        """
+
+        entity = cls.__new__(cls)
+        for column, value in zip(cls.columns, row):
+            setattr(entity, column, value)
+        entity.loaded_state = row
+
+        return entity
+
+    @classmethod
+    def from_list_row(cls, row):
+        """
+        Build partial entity from a row of LIST_COLUMNS
+        """
+
+        entity = cls.__new__(cls)
+        entity.id, entity.name = row
+
+        return entity
+
+    def __getattr__(self, name):
+        # Called only for attributes which are not set: other columns of partial entities
+
+        if name in self.columns:
+            raise AttributeError('{0} "{1}" is not set, entity was read by list query with {2} only. '
+                                 'Get full entity by ID.'.format(type(self).__name__, name, ', '.join(LIST_COLUMNS)))
+
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+
+    def is_partial(self):
+
+        return not hasattr(self, 'loaded_state')
+
+    def get_state(self):
+
+        return tuple([getattr(self, column) for column in self.columns])
+
+    def mark_saved(self, columns=None):
+        """
+        Remember current values as database state
+
+        :param columns: list of saved columns, all columns by default
+        """
+
+        if columns is None or self.loaded_state is None:
+            self.loaded_state = self.get_state()
+            return
+
+        state = list(self.loaded_state)
+        for column in columns:
+            state[self.columns.index(column)] = getattr(self, column)
+
+        self.loaded_state = tuple(state)
+
+    def get_changes(self, columns=None):
+        """
+        Get columns changed since entity was loaded or saved
+
+        :param columns: list of columns to check, all columns except id by default
+        :return: dictionary {column: value}, all checked columns if entity was not loaded from database
+        """
+
+        if self.is_partial():
+            raise ValueError('{0} {1} was read by list query, get full entity by ID to change it'.format(
+                type(self).__name__, self.id))
+
+        if columns is None:
+            columns = self.columns[1:]
+
+        if self.loaded_state is None:
+            return dict([(column, getattr(self, column)) for column in columns])
+
+        changes = {}
+        for column in columns:
+            value = getattr(self, column)
+            loaded_value = self.loaded_state[self.columns.index(column)]
+
+            if value == loaded_value:
+                continue
+
+            # UI sets text to integer columns (width '1920'), database returns numbers
+            if isinstance(loaded_value, (int, long)) and value == unicode(loaded_value):
+                continue
+
+            changes[column] = value
+
+        return changes
+
+    def is_dirty(self, columns=None):
+
+        return bool(self.get_changes(columns))
+
+
+class Project(Entity):
+    table = 'projects'
+    columns = ['id', 'name', 'houdini_build', 'width', 'height', 'description']
+    __slots__ = columns
+
     def __init__(self, project_name):
         self.id = None
         self.name = project_name
@@ -11,9 +137,23 @@ class Project:
         self.width = ''
         self.height = ''
         self.description = ''
+        self.loaded_state = None
+
+    @classmethod
+    def from_row(cls, row):
 
+        project = cls.__new__(cls)
+        project.id, project.name, project.houdini_build, project.width, project.height, project.description = row
+        project.loaded_state = row
+
+        return project
+
+
+class Asset(Entity):
+    table = 'assets'
+    columns = ['id', 'name', 'project', 'type', 'description']
+    __slots__ = columns
 
-class Asset:
     asset_types = {
         'character':
             {'id': 1,
@@ -46,17 +186,45 @@ class Asset:
         self.project = project_id
         self.type = None
         self.description = ''
+        self.loaded_state = None
+
+    @classmethod
+    def from_row(cls, row):
 
+        asset = cls.__new__(cls)
+        asset.id, asset.name, asset.project, asset.type, asset.description = row
+        asset.loaded_state = row
+
+        return asset
+
+
+class Sequence(Entity):
+    table = 'sequences'
+    columns = ['id', 'name', 'project', 'description']
+    __slots__ = columns
 
-class Sequence:
     def __init__(self, sequence_name, project_id):
         self.id = None
         self.name = sequence_name
         self.project = project_id
         self.description = ''
+        self.loaded_state = None
+
+    @classmethod
+    def from_row(cls, row):
+
+        sequence = cls.__new__(cls)
+        sequence.id, sequence.name, sequence.project, sequence.description = row
+        sequence.loaded_state = row
 
+        return sequence
+
+
+class Shot(Entity):
+    table = 'shots'
+    columns = ['id', 'name', 'sequence', 'start_frame', 'end_frame', 'width', 'height', 'description']
+    __slots__ = columns
 
-class Shot:
     def __init__(self, shot_name, sequence_id):
         self.id = None
         self.name = shot_name
@@ -66,13 +234,29 @@ class Shot:
         self.width = ''
         self.height = ''
         self.description = ''
+        self.loaded_state = None
+
+    @classmethod
+    def from_row(cls, row):
+
+        shot = cls.__new__(cls)
+        (shot.id, shot.name, shot.sequence, shot.start_frame, shot.end_frame,
+         shot.width, shot.height, shot.description) = row
+        shot.loaded_state = row
 
+        return shot
+
+
+class AssetType(Entity):
+    table = 'asset_types'
+    columns = ['id', 'name', 'description']
+    __slots__ = columns
 
-class AssetType:
     def __init__(self, id, name, description):
         self.id = id
         self.name = name
         self.description = description
+        self.loaded_state = None
 
 
 class EveFile:
@@ -150,17 +334,9 @@ class Converter:
         :return:
         """
 
-        projects = []
-        for project_tuple in project_tuples:
-            project = Project(project_tuple[1])
-            project.id = project_tuple[0]
-            project.houdini_build = project_tuple[2]
-            project.width = project_tuple[3]
-            project.height = project_tuple[4]
-            project.description = project_tuple[5]
-            projects.append(project)
+        from_row = Project.from_row
 
-        return projects
+        return [from_row(project_tuple) for project_tuple in project_tuples]
 
     @staticmethod
     def convert_to_asset(asset_tuples):
@@ -170,16 +346,9 @@ class Converter:
         :return:
         """
 
-        assets = []
+        from_row = Asset.from_row
 
-        for asset_tuple in asset_tuples:
-            asset = Asset(asset_tuple[1], asset_tuple[2])
-            asset.id = asset_tuple[0]
-            asset.type = asset_tuple[3]
-            asset.description = asset_tuple[4]
-            assets.append(asset)
-
-        return assets
+        return [from_row(asset_tuple) for asset_tuple in asset_tuples]
 
     @staticmethod
     def convert_to_sequence(sequence_tuples):
@@ -189,15 +358,9 @@ class Converter:
         :return:
         """
 
-        sequences = []
-
-        for sequence_tuple in sequence_tuples:
-            sequence = Sequence(sequence_tuple[1], sequence_tuple[2])
-            sequence.id = sequence_tuple[0]
-            sequence.description = sequence_tuple[3]
-            sequences.append(sequence)
+        from_row = Sequence.from_row
 
-        return sequences
+        return [from_row(sequence_tuple) for sequence_tuple in sequence_tuples]
 
     @staticmethod
     def convert_to_shot(shot_tuples):
@@ -207,19 +370,20 @@ class Converter:
         :return:
         """
 
-        shots = []
+        from_row = Shot.from_row
 
-        for shot_tuple in shot_tuples:
-            shot = Shot(shot_tuple[1], shot_tuple[2])
-            shot.id = shot_tuple[0]
-            shot.start_frame = shot_tuple[3]
-            shot.end_frame = shot_tuple[4]
-            shot.width = shot_tuple[5]
-            shot.height = shot_tuple[6]
-            shot.description = shot_tuple[7]
-            shots.append(shot)
+        return [from_row(shot_tuple) for shot_tuple in shot_tuples]
+
+    @staticmethod
+    def update_entity(entity, source_entity):
+        """
+        Copy data of source entity to entity (refresh entity object in place with new database data).
+        Loaded state is copied too, so local edits of the entity are overwritten.
+        """
 
-        return shots
+        for column in entity.columns:
+            setattr(entity, column, getattr(source_entity, column))
+        entity.loaded_state = source_entity.loaded_state
 
     @staticmethod
     def convert_to_asset_types(asset_types_tuples):
@@ -229,9 +393,6 @@ class Converter:
         :return:
         """
 
-        asset_types = []
-        for asset_types_tuple in asset_types_tuples:
-            asset_type = AssetType(asset_types_tuple[0], asset_types_tuple[1], asset_types_tuple[2])
-            asset_types.append(asset_type)
+        from_row = AssetType.from_row
 
-        return asset_types
+        return [from_row(asset_types_tuple) for asset_types_tuple in asset_types_tuples]
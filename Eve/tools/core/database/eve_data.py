@@ -1,28 +1,179 @@
 """
 Project Manager entities CRUD: materials, projects, assets, shots
+
+Project Manager reads projects and asset types when EveData is created. Houdini tools and farm scripts
+work with one project, EveData scoped to the project reads nothing at start:
+    eve_data = EveData(SQL_FILE_PATH, project_name='ROMA')
+    eve_data.project  # Read on first access
+    eve_data.projects, eve_data.asset_types  # Read on first access too
 """
 
 
+import re
 import sqlite3
+import threading
+import collections
+
 import entities
+import collection
+import connection
+import query
+import migrations
+import cache
+import graph
+import profiler
+import write_behind
+
+from core import settings
+
+
+# Maximum number of ids in one "IN (...)" query (SQLite host parameters limit is 999 in old builds)
+CHUNK_SIZE = 500
+# Queued asset link edits (write-behind mode, see EveData.read_queued_links)
+LINK_SQL = "INSERT OR IGNORE INTO shot_assets (shot_id, asset_id) VALUES (:shot_id, :asset_id)"
+UNLINK_SQL = "DELETE FROM shot_assets WHERE asset_id=:asset_id AND shot_id=:shot_id"
+# Entity classes of tables tracked by change feed (see EveData.changes_since)
+ENTITY_CLASSES = {'projects': entities.Project,
+                  'assets': entities.Asset,
+                  'sequences': entities.Sequence,
+                  'shots': entities.Shot}
+# Entity tables covered by EveData.search()
+SEARCH_KINDS = ['assets', 'sequences', 'shots']
+
+
+def get_link_changes(linked_ids, link_ids, unlink_ids, replace=False):
+    """
+    Get asset links which change links of a shot
+
+    :param linked_ids: list of asset IDs linked to the shot
+    :param link_ids: list of asset IDs to link
+    :param unlink_ids: list of asset IDs to unlink
+    :param replace: bool, unlink all linked assets which are not in link_ids
+    :return: tuple of lists (asset IDs to link, asset IDs to unlink), without duplicates
+    """
+
+    link_ids = list(collections.OrderedDict.fromkeys(link_ids))
+    unlink_ids = list(collections.OrderedDict.fromkeys(unlink_ids))
+    linked_ids = set(linked_ids)
+
+    if replace:
+        keep_ids = set(link_ids)
+        unlink_ids = [asset_id for asset_id in linked_ids if asset_id not in keep_ids]
+
+    return ([asset_id for asset_id in link_ids if asset_id not in linked_ids],
+            [asset_id for asset_id in unlink_ids if asset_id in linked_ids])
+
+
+def merge_changes(changes, new_changes):
+    """
+    Add changes dictionary (see EveData.changes_since) to earlier changes.
+    Rows changed again replace their earlier versions, so merged changes do not grow with repeated edits.
+
+    :param changes: dictionary of earlier changes or None
+    :param new_changes: dictionary of later changes
+    :return: merged changes dictionary
+    """
+
+    if not changes:
+        return new_changes
+
+    merged = {'token': new_changes['token'],
+              'complete': changes['complete'] and new_changes['complete'],
+              'deleted': {}}
+
+    for table in migrations.CHANGE_TABLES:
+        rows = collections.OrderedDict()
+        for row in changes[table] + new_changes[table]:
+            row_id = row[0] if isinstance(row, tuple) else row.id  # shot_assets rows are (link_id, shot_id, asset_id)
+            rows.pop(row_id, None)
+            rows[row_id] = row
+
+        merged[table] = rows.values()
+        merged['deleted'][table] = list(collections.OrderedDict.fromkeys(changes['deleted'][table] +
+                                                                        new_changes['deleted'][table]))
+
+    return merged
 
 
 class EveData:
-    def __init__(self, SQL_FILE_PATH):
-        # Load database
+    def __init__(self, SQL_FILE_PATH, cache_size=settings.ENTITY_CACHE_SIZE,
+                 replica_path=settings.SQL_REPLICA_PATH, service_address=settings.SERVICE_ADDRESS,
+                 write_delay=settings.WRITE_BEHIND_DELAY, project_name=None, in_memory=settings.SQL_IN_MEMORY):
+        """
+        :param project_name: string, scope instance to one project: projects, asset types and the project
+            (self.project) are read on first access instead of init_data()
+        :param in_memory: string, work with in-memory copy of the database: memory.SNAPSHOT or memory.WRITE_BACK
+        """
+
+        # Load database (read from local replica on farm nodes, work through Eve data service or in memory)
         self.SQL_FILE_PATH = SQL_FILE_PATH
+        self.connection = connection.get_pool(SQL_FILE_PATH, replica_path, service_address, in_memory)
+
+        # Commit updates and links in batches (see write and flush)
+        self.write_behind = bool(write_delay)
+        self.queued_entities = {}  # {(table, id): entity} with queued updates (see on_flush)
+        if self.write_behind:
+            self.connection = write_behind.WriteBehindPool(self.connection, write_delay)
+            self.connection.flush_listeners.append(self.on_flush)
+
+        if settings.PROFILE_DATABASE:
+            profiler.instrument(self)
+        migrations.migrate(self.connection)
+
+        # Entities read by ID (identity map)
+        self.cache = cache.EntityCache(self.connection, cache_size)
+        if hasattr(self.connection, 'listeners'):  # Replica file can be replaced
+            self.connection.listeners.append(self.cache.drop)
+
+        # Database revision of loaded data. Changes of other clients are applied to loaded data before reads
+        # (see sync_loaded_data), own commits on any connection of the pool move the revision (see on_commit).
+        self.change_token = self.get_change_token()
+        self.pending_changes = None  # Changes applied since last pull_changes()
+        self.owner_thread = threading.current_thread()  # Thread of UI models showing EveData lists
+        self._token_lock = threading.Lock()
+        self.cache.updater = self.sync_loaded_data
+        self.connection.add_commit_listener(self.get_change_token, self.on_commit)
+
+        # Loaded project data (see load_project_graph)
+        self.project_graph = None
+
+        # Full text search index is available (see search)
+        self.search_index = None
+        self.cache.listeners.append(self.drop_project_graph)
 
         # Data attributes
         # INTERNAL SET
-        self.projects = []
-        self.project_assets = []
-        self.asset_types = []
-        self.project_sequences = []
-        self.sequence_shots = []
-        self.shot_assets = []
-
-        # Initialize data
-        self.init_data()
+        self.project_assets = collection.EntityCollection()
+        self.project_sequences = collection.EntityCollection()
+        self.sequence_shots = collection.EntityCollection()
+        self.shot_assets = collection.EntityCollection()
+        self.shot_assets_shot_id = None  # Shot of shot_assets list (see get_shot_assets)
+        self.project_name = project_name
+
+        # Initialize data, instance scoped to one project reads it on first access (see __getattr__)
+        if not project_name:
+            self.projects = collection.EntityCollection()
+            self.asset_types = []
+            self.init_data()
+
+    def __getattr__(self, name):
+        # Called only for attributes which are not set: lazy data attributes of instance scoped to one project
+
+        if not self.__dict__.get('project_name'):
+            raise AttributeError("EveData instance has no attribute '{0}'".format(name))
+
+        if name == 'projects':
+            self.projects = collection.EntityCollection()
+            self.get_projects()
+        elif name == 'asset_types':
+            self.asset_types = []
+            self.get_asset_types()
+        elif name == 'project':
+            self.project = self.get_project_by_name(self.project_name)
+        else:
+            raise AttributeError("EveData instance has no attribute '{0}'".format(name))
+
+        return self.__dict__[name]
 
     # UI
     def init_data(self):
@@ -33,249 +184,929 @@ class EveData:
         self.get_projects()
         self.get_asset_types()
 
+    def close(self):
+        """
+        Save queued edits, prune change feed history and close all database connections of EveData instance
+        """
+
+        # Memory copy is dropped on close, its history is needed to write changes back
+        if not hasattr(self.connection, 'write_back'):
+            try:
+                migrations.prune_changes(self.connection, settings.CHANGE_HISTORY_SIZE)
+            except sqlite3.Error as error:
+                print '>> Eve change history was not pruned: {0}'.format(error)
+
+        self.connection.close()
+
+    # Project graph
+    def read_project_graph(self, project):
+        """
+        Read all project sequences, shots, assets and asset links with 4 queries from one snapshot.
+        Graph token is the database revision of the snapshot (see set_project_graph).
+
+        :param project: entities.Project
+        :return: graph.ProjectGraph
+        """
+
+        with self.connection.transaction('DEFERRED') as cursor:
+            token = self.get_change_token(cursor)
+
+            asset_objects = query.Query(entities.Asset).filter('project', project.id).order_by('id').all(cursor)
+
+            sequence_ids = query.Query(entities.Sequence).select('id').filter('project', project.id)
+            sequence_objects = query.Query(entities.Sequence).filter('project', project.id).order_by('id').all(cursor)
+
+            shot_objects = query.Query(entities.Shot).filter('sequence', sequence_ids, 'IN').order_by('id').all(cursor)
+
+            links = self.read_project_links(project.id, cursor)
+
+        project_graph = graph.ProjectGraph(project).build(asset_objects, sequence_objects, shot_objects, links)
+        project_graph.token = token
+
+        return project_graph
+
+    def read_project_links(self, project_id, cursor=None):
+        """
+        Get all asset links of the project
+
+        :return: list of (shot_id, asset_id) tuples
+        """
+
+        if not cursor:
+            cursor = self.connection.cursor()
+
+        cursor.execute("SELECT shot_assets.shot_id, shot_assets.asset_id FROM shot_assets "
+                       "JOIN assets ON assets.id=shot_assets.asset_id "
+                       "WHERE assets.project=:project "
+                       "ORDER BY shot_assets.id",
+
+                       {'project': project_id})
+
+        return cursor.fetchall()
+
+    def set_project_graph(self, project_graph):
+        """
+        Make project graph current: fill project assets and sequences, cache all entities.
+        Graph could be read in a worker thread: changes committed after it was read are applied to it.
+        """
+
+        # Apply changes made by other clients to loaded data, changes made from now on are applied to the graph
+        self.cache.validate()
+
+        self.project_graph = project_graph
+
+        self.cache.put('projects', project_graph.project)
+        self.cache.put_many('assets', project_graph.assets.values())
+        self.cache.put_many('sequences', project_graph.sequences.values())
+        self.cache.put_many('shots', project_graph.shots.values())
+
+        if project_graph.token is not None and project_graph.token < self.change_token:
+            self.apply_changes(self.changes_since(project_graph.token))
+
+            if self.project_graph is None:  # Project was deleted
+                return
+
+        self.project_assets.replace(project_graph.assets.values())
+        self.project_sequences.replace(project_graph.sequences.values())
+
+    def load_project_graph(self, project):
+        """
+        Load project data into memory, after that get_project_assets, get_project_sequences, get_sequence_shots
+        and get_shot_assets of this project do not query database (changes made by other clients are applied
+        to the graph, see sync_loaded_data).
+
+        :param project: entities.Project
+        :return: graph.ProjectGraph
+        """
+
+        project_graph = self.read_project_graph(project)
+        self.set_project_graph(project_graph)
+
+        return project_graph
+
+    def get_project_graph(self):
+        """
+        Get loaded project graph with changes made by other clients applied.
+        In threads which can not apply changes the graph is not used until the owner thread applies them.
+        """
+
+        if self.project_graph and not self.cache.validate():
+            return
+
+        return self.project_graph
+
+    def drop_project_graph(self):
+
+        self.project_graph = None
+
+    # Change feed
+    def get_change_token(self, cursor=None):
+        """
+        Get current database revision. Pass it to changes_since() to get rows changed after this moment.
+        """
+
+        if not cursor:
+            cursor = self.connection.cursor()
+
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'")
+        revision = cursor.fetchone()
+
+        if revision:
+            return revision[0]
+
+        return 0
+
+    def changes_since(self, token):
+        """
+        Get rows added, updated and deleted after token revision (by any client)
+
+        :param token: int, revision from get_change_token() or previous changes_since() result
+        :return: dictionary:
+            {'token': int, revision of returned data,
+             'complete': bool, False if history of deleted rows after token was pruned (see migrations.prune_changes),
+             'projects': [Project, ...], 'assets': [Asset, ...], 'sequences': [Sequence, ...], 'shots': [Shot, ...],
+             'shot_assets': [(link_id, shot_id, asset_id), ...],
+             'deleted': {'projects': [project_id, ...], 'assets': [asset_id, ...], ...}}
+        """
+
+        # Read all tables from one snapshot
+        with self.connection.transaction('DEFERRED') as cursor:
+            new_token = self.get_change_token(cursor)
+            changes = {'token': new_token,
+                       'complete': True,
+                       'deleted': {}}
+
+            for table in migrations.CHANGE_TABLES:
+                entity_class = ENTITY_CLASSES.get(table)
+                columns = ', '.join(entity_class.columns) if entity_class else '*'
+
+                cursor.execute("SELECT {0} FROM {1} WHERE updated_at>:token ORDER BY id".format(columns, table),
+                               {'token': token})
+                rows = cursor.fetchall()
+
+                if entity_class:
+                    changes[table] = query.CONVERTERS[entity_class](rows)
+                else:
+                    changes[table] = [row[:3] for row in rows]
+
+                changes['deleted'][table] = []
+
+            cursor.execute("SELECT entity, entity_id FROM changes WHERE id>:token ORDER BY id",
+                           {'token': token})
+
+            for table, entity_id in cursor.fetchall():
+                if table == 'changes':  # Oldest revision of pruned history is newer than token
+                    changes['complete'] = False
+                else:
+                    changes['deleted'][table].append(entity_id)
+
+        return changes
+
+    def pull_changes(self):
+        """
+        Apply changes made by other clients since last pull to loaded data: cached entities, project graph,
+        projects list. Changes already applied by cached reads since last pull are returned too.
+        Cheap to call often: if database was not changed it costs one PRAGMA read.
+
+        :return: changes dictionary (see changes_since) or None if database was not changed
+        """
+
+        self.cache.validate()
+
+        changes = self.pending_changes
+        self.pending_changes = None
+
+        return changes
+
+    def sync_loaded_data(self):
+        """
+        Apply changes made by other clients to loaded data. Called by cache when database was changed.
+
+        Changes are applied only in owner thread (UI models must not be updated from worker threads),
+        other threads do not use cached data until then.
+
+        :return: True if loaded data is current
+        """
+
+        token = self.change_token
+        if self.get_change_token() <= token:  # No changes of other clients since last sync
+            return True
+
+        if threading.current_thread() is not self.owner_thread:
+            return False
+
+        changes = self.changes_since(token)
+
+        with self._token_lock:
+            self.change_token = max(self.change_token, changes['token'])
+
+        self.apply_changes(changes)
+        self.pending_changes = merge_changes(self.pending_changes, changes)
+
+        return True
+
+    def on_commit(self, revision, new_revision):
+        """
+        Own write transaction was committed (on any connection of the pool, e.g. write behind flush thread).
+        Loaded data has own changes, so change token moves to the new revision
+        unless other clients committed changes which are not applied yet.
+        """
+
+        with self._token_lock:
+            if revision == self.change_token:
+                self.change_token = new_revision
+
+    def find_loaded_entity(self, table, entity_id):
+        """
+        Get entity object already loaded by EveData (cached or in project graph)
+        """
+
+        entity = self.cache.peek(table, entity_id)
+
+        if not entity and self.project_graph and table in ('assets', 'sequences', 'shots'):
+            entity = getattr(self.project_graph, table).get(entity_id)
+
+        # Partial list entries (not cached)
+        for entity_list in self.get_entity_lists()[table]:
+            if entity:
+                break
+            entity = entity_list.get(entity_id)
+
+        return entity
+
+    def get_entity_lists(self):
+        """
+        Get EveData lists by table. Lists which were not read yet (projects of instance scoped to one project)
+        are skipped, so updating them does not read them.
+
+        :return: dictionary {table: [EntityCollection, ...]}
+        """
+
+        entity_lists = {'projects': [],
+                        'assets': [self.project_assets, self.shot_assets],
+                        'sequences': [self.project_sequences],
+                        'shots': [self.sequence_shots]}
+
+        if 'projects' in self.__dict__:
+            entity_lists['projects'].append(self.projects)
+
+        return entity_lists
+
+    def apply_changes(self, changes):
+        """
+        Update loaded entities in place with changed data, add new entities to project graph
+        and remove deleted entities. Shown shot assets are read again if links of the shot changed.
+
+        :param changes: dictionary, result of changes_since()
+        """
+
+        entity_lists = self.get_entity_lists()
+
+        # History of deleted rows was pruned: drop cached entities and project graph (as for replaced database file)
+        # and find deleted entries of EveData lists by ID
+        if not changes['complete']:
+            self.cache.drop()
+
+            for table, table_lists in entity_lists.iteritems():
+                entity_ids = list(set([entity.id for entity_list in table_lists for entity in entity_list]))
+                rows = self.get_rows_by_ids(ENTITY_CLASSES[table], entity_ids)
+                deleted_ids = set(changes['deleted'][table])
+                changes['deleted'][table].extend([entity_id for entity_id in entity_ids
+                                                  if entity_id not in rows and entity_id not in deleted_ids])
+
+        project_graph = self.project_graph
+
+        # Updated and added entities
+        for project in changes['projects']:
+            loaded_project = self.find_loaded_entity('projects', project.id)
+            if loaded_project:
+                entities.Converter.update_entity(loaded_project, project)
+            else:
+                for projects in entity_lists['projects']:
+                    projects.append(project)
+
+        for asset in changes['assets']:
+            loaded_asset = self.find_loaded_entity('assets', asset.id)
+            if loaded_asset:
+                entities.Converter.update_entity(loaded_asset, asset)
+            elif project_graph and asset.project == project_graph.project.id:
+                project_graph.add_asset(asset)
+
+        for sequence in changes['sequences']:
+            loaded_sequence = self.find_loaded_entity('sequences', sequence.id)
+            if loaded_sequence:
+                entities.Converter.update_entity(loaded_sequence, sequence)
+            elif project_graph and sequence.project == project_graph.project.id:
+                project_graph.add_sequence(sequence)
+
+        for shot in changes['shots']:
+            loaded_shot = self.find_loaded_entity('shots', shot.id)
+            if loaded_shot:
+                # Move shot to another sequence in the graph
+                if project_graph and loaded_shot.id in project_graph.shots and loaded_shot.sequence != shot.sequence:
+                    project_graph.remove_shot(loaded_shot.id)
+                    entities.Converter.update_entity(loaded_shot, shot)
+                    if shot.sequence in project_graph.sequences:
+                        project_graph.add_shot(loaded_shot)
+                else:
+                    entities.Converter.update_entity(loaded_shot, shot)
+            elif project_graph and shot.sequence in project_graph.sequences:
+                project_graph.add_shot(shot)
+
+        # Notify models showing updated entities
+        for table, table_lists in entity_lists.iteritems():
+            for entity_list in table_lists:
+                entity_list.refresh([entity.id for entity in changes[table]])
+
+        # Deleted entities
+        deleted = changes['deleted']
+
+        for table in ('projects', 'assets', 'sequences', 'shots'):
+            for entity_id in deleted[table]:
+                self.cache.remove(table, entity_id)
+
+        if project_graph:
+            if project_graph.project.id in deleted['projects']:
+                self.project_graph = project_graph = None
+            else:
+                for asset_id in deleted['assets']:
+                    project_graph.remove_asset(asset_id)
+                for sequence_id in deleted['sequences']:
+                    project_graph.remove_sequence(sequence_id)
+                for shot_id in deleted['shots']:
+                    project_graph.remove_shot(shot_id)
+
+        for table, table_lists in entity_lists.iteritems():
+            for entity_list in table_lists:
+                entity_list.remove_ids(deleted[table])
+
+        # Asset links
+        if project_graph:
+            if deleted['shot_assets']:
+                project_graph.set_links(self.read_project_links(project_graph.project.id))
+            else:
+                for link_id, shot_id, asset_id in changes['shot_assets']:
+                    project_graph.link(shot_id, asset_id)
+
+        # Shown shot assets. Tombstones of links have no shot ID, any deleted link reads the list again.
+        shot_id = self.shot_assets_shot_id
+        if shot_id is not None:
+            if (deleted['shot_assets'] or not changes['complete'] or
+                    shot_id in [link_shot_id for link_id, link_shot_id, asset_id in changes['shot_assets']]):
+                self.get_shot_assets(shot_id)
+
+    # Search
+    def search(self, project, text, kinds=SEARCH_KINDS, limit=50):
+        """
+        Find project assets, sequences and shots by words in their names and descriptions.
+
+        Each word matches by prefix ("char" finds "character"), entity must match all words.
+        Results are ranked by relevance, matches in names rank higher than matches in descriptions.
+
+        :param project: entities.Project
+        :param text: string, search words
+        :param kinds: list of tables to search in: 'assets', 'sequences', 'shots'
+        :param limit: int, maximum number of results
+        :return: list of entities.Asset, entities.Sequence and entities.Shot, best matches first
+        """
+
+        words = re.findall(r'\w+', text, re.UNICODE)
+        kinds = [kind for kind in kinds if kind in SEARCH_KINDS]
+
+        if not words or not kinds:
+            return []
+
+        cursor = self.connection.cursor()
+
+        if self.search_index is None:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name='search_index'")
+            self.search_index = bool(cursor.fetchone())
+
+        if self.search_index:
+            cursor.execute("SELECT kind, entity_id FROM search_index "
+                           "WHERE search_index MATCH ? "
+                           "AND project=? "
+                           "AND kind IN ({0}) "
+                           "ORDER BY bm25(search_index, 10.0, 1.0) "
+                           "LIMIT ?".format(','.join('?' * len(kinds))),
+
+                           [' '.join(['"{0}"*'.format(word) for word in words]), project.id] + kinds + [limit])
+            found = cursor.fetchall()
+        else:
+            found = self.scan_search(cursor, project, words, kinds, limit)
+
+        # Read found entities
+        ids = {}
+        for kind, entity_id in found:
+            ids.setdefault(kind, []).append(entity_id)
+
+        found_entities = {}
+        for kind, get_entities in (('assets', self.get_assets_by_ids),
+                                   ('sequences', self.get_sequences_by_ids),
+                                   ('shots', self.get_shots_by_ids)):
+            for entity in get_entities(ids.get(kind, [])):
+                found_entities[(kind, entity.id)] = entity
+
+        return [found_entities[key] for key in found if key in found_entities]
+
+    def scan_search(self, cursor, project, words, kinds, limit):
+        """
+        Search without full text index (SQLite built without FTS5): match words with LIKE, rank names first
+
+        :return: list of (kind, entity_id) tuples
+        """
+
+        found = []
+
+        for kind in kinds:
+            if kind == 'shots':
+                sql = "SELECT id, name FROM shots WHERE sequence IN (SELECT id FROM sequences WHERE project=?)"
+            else:
+                sql = "SELECT id, name FROM {0} WHERE project=?".format(kind)
+
+            parameters = [project.id]
+            for word in words:
+                sql += " AND (name LIKE ? OR description LIKE ?)"
+                parameters.extend(['%{0}%'.format(word)] * 2)
+
+            cursor.execute(sql, parameters)
+
+            for entity_id, name in cursor.fetchall():
+                name_matches = len([word for word in words if word.lower() in name.lower()])
+                found.append((-name_matches, kind, entity_id))
+
+        found.sort()
+
+        return [(kind, entity_id) for name_matches, kind, entity_id in found[:limit]]
+
     # CRUD
+    def write(self, key, sql, parameters):
+        """
+        Run write statement of an edit. With write-behind enabled the statement is queued and replaces queued
+        statement with the same key, otherwise it is committed immediately.
+
+        :param key: tuple, edited row: (table, id) or ('shot_assets', shot_id, asset_id)
+        """
+
+        if self.write_behind:
+            self.connection.put(key, sql, parameters)
+            return
+
+        with self.connection.transaction() as cursor:
+            cursor.execute(sql, parameters)
+
+    def save(self, entity, columns):
+        """
+        Write entity columns changed since the entity was loaded or saved, nothing if they were not changed.
+        With write-behind enabled changes are merged with queued changes of the same entity.
+
+        :param entity: entities.Project, entities.Asset, entities.Sequence or entities.Shot
+        :param columns: list of columns which can be updated
+        :return: dictionary {column: value} of written columns
+        """
+
+        changes = entity.get_changes(columns)
+        if not changes:
+            return changes
+
+        if self.write_behind:
+            self.queued_entities[(entity.table, entity.id)] = entity
+            self.connection.put_update(entity.table, entity.id, changes)
+        else:
+            self.write((entity.table, entity.id),
+                       query.get_update_sql(entity.table, sorted(changes)),
+                       dict(changes, id=entity.id))
+
+        entity.mark_saved(changes.keys())
+
+        return changes
+
+    def flush(self):
+        """
+        Commit queued edits now (write-behind mode). Raise the error if edits were not saved.
+        Any other EveData call, which reads or writes database, flushes queued edits first.
+        """
+
+        if self.write_behind:
+            self.connection.flush()
+
+    def on_flush(self, keys, rejected):
+        """
+        Queued edits were written (write-behind mode, may be called in the flush thread).
+        Entities were marked saved when their edits were queued: entities of rejected edits get database
+        state back, so get_changes() returns the rejected values and next save sends them again.
+
+        :param keys: list of written edit keys
+        :param rejected: list of (key, error) of rejected edits
+        """
+
+        entity_objects = {}
+        for key in keys:
+            entity_objects[key] = self.queued_entities.get(key)
+            if key not in self.connection.writes:  # Not edited again while the flush was running
+                self.queued_entities.pop(key, None)
+
+        for key, error in rejected:
+            entity = entity_objects.get(key)
+            if entity is None:
+                continue
+
+            row = self.get_rows_by_ids(type(entity), [entity.id]).get(entity.id)
+            entity.loaded_state = tuple(row) if row else None
+
+    def get_inserted_ids(self, cursor, table, last_id):
+        """
+        Get ids of rows inserted into the table after the row with last_id.
+
+        Used by bulk inserts: executemany() does not report row ids, but inside one write transaction
+        AUTOINCREMENT ids grow in insertion order, so new rows are the ones after last_id.
+        """
+
+        cursor.execute("SELECT id FROM {0} WHERE id>:id ORDER BY id".format(table),
+                       {'id': last_id})
+
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_rows_by_ids(self, entity_class, ids):
+        """
+        Get table rows for many ids with chunked "IN (...)" queries
+
+        :param entity_class: entity class of the table (entities.Asset, entities.Shot...)
+        :param ids: iterable of database IDs
+        :return: dictionary {id: row tuple}
+        """
+
+        ids = list(set(ids))
+        rows = {}
+        cursor = self.connection.cursor()
+
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+
+            for row in query.Query(entity_class).filter('id', chunk, 'IN').rows(cursor):
+                rows[row[0]] = row
+
+        return rows
+
+    def read_list(self, entity_query):
+        """
+        Read list entries for Qt models: partial entities with id and name (see entities.LIST_COLUMNS).
+        Entities already in cache replace partial entries, so lists and cache share objects.
+        Does not change EveData lists, so it is safe to call from a worker thread.
+
+        :param entity_query: query.Query
+        :return: list of entities
+        """
+
+        entity_objects = entity_query.partial(self.connection.cursor())
+        cached = self.cache.get_many(entity_query.entity_class.table, [entity.id for entity in entity_objects])
+
+        return [cached.get(entity.id, entity) for entity in entity_objects]
+
+    def fill_partial(self, entity_list, entity):
+        """
+        Fill partial list entry with data of the full entity read by ID (e.g. when the entry is selected in UI),
+        so list, selection and cache share one object.
+
+        List entries are shown by UI models, so they are filled in owner thread only. Entities read in worker
+        threads are returned as is, fill them in owner thread (e.g. in data loader callback).
+
+        :param entity_list: collection.EntityCollection, EveData list which may hold the entity
+        :param entity: full entity
+        :return: list entry if it was partial, otherwise entity
+        """
+
+        if threading.current_thread() is not self.owner_thread:
+            return entity
+
+        entry = entity_list.get(entity.id)
+        if entry is None or not entry.is_partial():
+            return entity
+
+        entities.Converter.update_entity(entry, entity)
+        self.cache.put(entry.table, entry)
+
+        return entry
+
+    def get_last_id(self, cursor, table):
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM {0}".format(table))
+
+        return cursor.fetchone()[0]
+
     # Project
     def add_project(self, project):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        # Add project to DB
-        cursor.execute("INSERT INTO projects VALUES ("
-                       ":id,"
-                       ":name,"
-                       ":houdini_build,"
-                       ":width,"
-                       ":height,"
-                       ":description)",
-
-                       {'id': cursor.lastrowid,
-                        'name': project.name,
-                        'houdini_build': project.houdini_build,
-                        'width': project.width,
-                        'height': project.height,
-                        'description': project.description})
-
-        connection.commit()
-        project.id = cursor.lastrowid  # Add database ID to the project object
-        connection.close()
+        with self.connection.transaction() as cursor:
+
+            # Add project to DB
+            cursor.execute("INSERT INTO projects (id, name, houdini_build, width, height, description) VALUES ("
+                           ":id,"
+                           ":name,"
+                           ":houdini_build,"
+                           ":width,"
+                           ":height,"
+                           ":description)",
+
+                           {'id': cursor.lastrowid,
+                            'name': project.name,
+                            'houdini_build': project.houdini_build,
+                            'width': project.width,
+                            'height': project.height,
+                            'description': project.description})
+
+            project.id = cursor.lastrowid  # Add database ID to the project object
+
+        project.mark_saved()
 
         # Add project to data instance
-        self.projects.append(project)
+        for projects in self.get_entity_lists()['projects']:
+            projects.append(project)
+        self.cache.put('projects', project)
 
     def get_project(self, project_id):
         """ Get project by id """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        cursor.execute("SELECT * FROM projects WHERE id=:id",
-                       {'id': project_id})
-        project_tuple = cursor.fetchone()
-        project_object = entities.Converter.convert_to_project([project_tuple])[0]
+        project_object = self.cache.get('projects', project_id)
+        if project_object:
+            return project_object
 
-        connection.close()
+        project_object = query.Query(entities.Project).filter('id', project_id).first(self.connection.cursor())
 
         if project_object:
+            for projects in self.get_entity_lists()['projects']:
+                project_object = self.fill_partial(projects, project_object)
+            self.cache.put('projects', project_object)
             return project_object
 
     def get_project_by_name(self, project_name):
-        """ Get project by id """
-
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        cursor.execute("SELECT * FROM projects WHERE name=:name",
-                       {'name': project_name})
-        project_tuple = cursor.fetchone()
-        project_object = entities.Converter.convert_to_project([project_tuple])[0]
+        """ Get project by name """
 
-        connection.close()
+        project_object = query.Query(entities.Project).filter('name', project_name).first(self.connection.cursor())
 
         if project_object:
+            for projects in self.get_entity_lists()['projects']:
+                project_object = self.fill_partial(projects, project_object)
+            self.cache.put('projects', project_object)
             return project_object
 
     def get_projects(self):
-        """ Get all project items from projects table in db """
+        """ Get all project items from projects table in db (list entries, see read_list) """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        self.projects.extend(self.read_list(query.Query(entities.Project)))
 
-        cursor.execute("SELECT * FROM projects")
-        project_tuples = cursor.fetchall()
-        project_objects = entities.Converter.convert_to_project(project_tuples)
+    def get_project_assets(self, project, asset_type=None, name_prefix=None):
+        """
+        Get project assets from assets table in db
 
-        connection.close()
+        :param project: entities.Project
+        :param asset_type: int, get assets of this type only (asset type database ID)
+        :param name_prefix: string, get assets which names start with prefix
+        """
 
-        self.projects.extend(project_objects)
+        project_graph = self.get_project_graph()
+        if project_graph and project_graph.project.id == project.id:
+            asset_objects = []
+            for asset in project_graph.assets.values():
+                if asset_type is not None and asset.type != asset_type:
+                    continue
+                if name_prefix and not asset.name.startswith(name_prefix):
+                    continue
+                asset_objects.append(asset)
+            self.project_assets.replace(asset_objects)
+            return
 
-    def get_project_assets(self, project):
-        """ Get all project assets from assets table in db """
+        asset_query = query.Query(entities.Asset).filter('project', project.id)
+        if asset_type is not None:
+            asset_query.filter('type', asset_type)
+        asset_query.filter_prefix('name', name_prefix)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        self.project_assets.replace(self.read_list(asset_query))
 
-        cursor.execute("SELECT * FROM assets WHERE project=:project",
-                       {'project': project.id})
+    def get_project_sequences(self, project):
+        """ Get all project sequences from sequences table in db """
 
-        asset_tuples = cursor.fetchall()
-        asset_objects = entities.Converter.convert_to_asset(asset_tuples)
+        project_graph = self.get_project_graph()
+        if project_graph and project_graph.project.id == project.id:
+            self.project_sequences.replace(project_graph.sequences.values())
+            return
 
-        connection.close()
+        self.project_sequences.replace(self.read_list(query.Query(entities.Sequence).filter('project', project.id)))
 
-        # Clear list and append assets
-        del self.project_assets[:]
-        for asset in asset_objects:
-            self.project_assets.append(asset)
+    def read_sequence_shots(self, sequence_id):
+        """
+        Get list of sequence shots.
+        Does not change EveData lists, so it is safe to call from a worker thread (see core.loader)
+        """
 
-    def get_project_sequences(self, project):
-        """ Get all project sequences from sequences table in db """
+        project_graph = self.get_project_graph()
+        if project_graph and sequence_id in project_graph.sequences:
+            return list(project_graph.sequence_shots[sequence_id])
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        return self.read_list(query.Query(entities.Shot).filter('sequence', sequence_id))
 
-        cursor.execute("SELECT * FROM sequences WHERE project=:project",
-                       {'project': project.id})
+    def get_sequence_shots(self, sequence_id, shot_objects=None):
+        """
+        Get all sequence shots from shots table in db
 
-        sequence_tuples = cursor.fetchall()
-        sequence_objects = entities.Converter.convert_to_sequence(sequence_tuples)
+        :param sequence_id: int, sequence database ID
+        :param shot_objects: list of entities.Shot, shots already read with read_sequence_shots()
+        """
 
-        connection.close()
+        if shot_objects is None:
+            shot_objects = self.read_sequence_shots(sequence_id)
 
-        # Clear list and append assets
-        del self.project_sequences[:]
-        for sequence in sequence_objects:
-            self.project_sequences.append(sequence)
+        self.sequence_shots.replace(shot_objects)
 
-    def get_sequence_shots(self, sequence_id):
+    # Pages (keyset pagination for long lists, see models.PagedListModel)
+    def read_page(self, entity_query, after_id, page_size):
         """
-        Get all sequence shots from shots table in db
+        Get next page of query results ordered by ID.
+
+        Page starts after the last row of the previous page (WHERE id > after_id), so reading any page
+        costs the same, unlike OFFSET which walks all previous rows.
+        Does not change EveData lists, so it is safe to call from a worker thread.
+
+        :param entity_query: query.Query
+        :param after_id: int, ID of the last entity of previous page, None for the first page
+        :param page_size: int, maximum number of entities in the page
+        :return: list of entities
         """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        if after_id is not None:
+            entity_query.filter('id', after_id, '>')
 
-        cursor.execute("SELECT * FROM shots WHERE sequence=:sequence",
-                       {'sequence': sequence_id})
+        return self.read_list(entity_query.order_by('id').limit(page_size))
 
-        shot_tuples = cursor.fetchall()
-        shot_objects = entities.Converter.convert_to_shot(shot_tuples)
+    def get_project_assets_page(self, project, after_id=None, page_size=settings.PAGE_SIZE,
+                                asset_type=None, name_prefix=None):
+        """
+        Get page of project assets, filters are the same as in get_project_assets()
+        """
 
-        connection.close()
+        asset_query = query.Query(entities.Asset).filter('project', project.id)
+        if asset_type is not None:
+            asset_query.filter('type', asset_type)
+        asset_query.filter_prefix('name', name_prefix)
 
-        # Clear list and append assets
-        del self.sequence_shots[:]
-        for shot in shot_objects:
-            self.sequence_shots.append(shot)
+        return self.read_page(asset_query, after_id, page_size)
 
-    def update_project(self, project):
+    def get_project_sequences_page(self, project, after_id=None, page_size=settings.PAGE_SIZE):
+
+        sequence_query = query.Query(entities.Sequence).filter('project', project.id)
+
+        return self.read_page(sequence_query, after_id, page_size)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+    def get_sequence_shots_page(self, sequence_id, after_id=None, page_size=settings.PAGE_SIZE):
 
-        cursor.execute("UPDATE projects SET "
-                       "houdini_build=:houdini_build,"
-                       "width=:width,"
-                       "height=:height,"
-                       "description=:description "
+        shot_query = query.Query(entities.Shot).filter('sequence', sequence_id)
 
-                       "WHERE id=:id",
+        return self.read_page(shot_query, after_id, page_size)
 
-                       {'id': project.id,
-                        'houdini_build': project.houdini_build,
-                        'width': project.width,
-                        'height': project.height,
-                        'description': project.description})
+    def update_project(self, project):
+
+        self.save(project, ['houdini_build', 'width', 'height', 'description'])
 
-        connection.commit()
-        connection.close()
+        self.cache.put('projects', project)
 
         return project
 
     def del_project(self, project_id):
+        """
+        Delete project with all its assets, sequences, shots and asset links (ON DELETE CASCADE)
+        """
+
+        with self.connection.transaction() as cursor:
+            cursor.execute("DELETE FROM projects WHERE id=:id",
+                           {'id': project_id})
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        # Project children are not tracked by id, drop cached entities
+        self.cache.clear()
 
-        cursor.execute("DELETE FROM projects WHERE id=:id",
-                       {'id': project_id})
+        if self.project_graph and self.project_graph.project.id == project_id:
+            self.project_graph = None
+            self.project_assets.clear()
+            self.project_sequences.clear()
+            self.sequence_shots.clear()
+            self.shot_assets.clear()
 
-        connection.commit()
-        connection.close()
+        for projects in self.get_entity_lists()['projects']:
+            projects.remove_ids([project_id])
 
-        for project in self.projects:
-            if project.id == project_id:
-                self.projects.remove(project)
+        if self.__dict__.get('project') and self.project.id == project_id:
+            del self.project
 
     # Assets
     def add_asset(self, asset, project_id):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        with self.connection.transaction() as cursor:
+            cursor.execute("INSERT INTO assets (id, name, project, type, description) VALUES ("
+                           ":id,"
+                           ":name,"
+                           ":project,"
+                           ":type,"
+                           ":description)",
 
-        cursor.execute("INSERT INTO assets VALUES ("
-                       ":id,"
-                       ":name,"
-                       ":project,"
-                       ":type,"
-                       ":description)",
+                           {'id': cursor.lastrowid,
+                            'name': asset.name,
+                            'project': project_id,
+                            'type': asset.type,
+                            'description': asset.description})
 
-                       {'id': cursor.lastrowid,
-                        'name': asset.name,
-                        'project': project_id,
-                        'type': asset.type,
-                        'description': asset.description})
+            asset.id = cursor.lastrowid  # Add database ID to the asset object
 
-        connection.commit()
-        asset.id = cursor.lastrowid  # Add database ID to the asset object
-        connection.close()
+        asset.project = project_id
+        asset.mark_saved()
 
         self.project_assets.append(asset)
+        self.cache.put('assets', asset)
 
-    def get_asset(self, asset_id):
+        if self.project_graph and self.project_graph.project.id == project_id:
+            self.project_graph.add_asset(asset)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+    def add_assets(self, assets, project_id):
+        """
+        Add many assets to the project in one transaction
 
-        cursor.execute("SELECT * FROM assets WHERE id=:id",
-                       {'id': asset_id})
+        :param assets: iterable of entities.Asset
+        :param project_id: int, project database ID
+        :return: list of database IDs of added assets
+        """
 
-        asset_tuple = cursor.fetchone()
+        assets = list(assets)
 
-        connection.close()
+        with self.connection.transaction() as cursor:
+            last_id = self.get_last_id(cursor, 'assets')
+            cursor.executemany("INSERT INTO assets (id, name, project, type, description) VALUES ("
+                               ":id,"
+                               ":name,"
+                               ":project,"
+                               ":type,"
+                               ":description)",
 
-        if asset_tuple:
-            return entities.Converter.convert_to_asset([asset_tuple])[0]
+                               [{'id': None,
+                                 'name': asset.name,
+                                 'project': project_id,
+                                 'type': asset.type,
+                                 'description': asset.description} for asset in assets])
 
-    def get_asset_by_name(self, project_id, asset_name):
+            asset_ids = self.get_inserted_ids(cursor, 'assets', last_id)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        for asset, asset_id in zip(assets, asset_ids):
+            asset.id = asset_id
+            asset.project = project_id
+            asset.mark_saved()
 
-        cursor.execute("SELECT * FROM assets WHERE "
-                       "name=:name "
-                       "AND project=:project",
+        self.project_assets.extend(assets)
+        self.cache.put_many('assets', assets)
 
-                       {'name': asset_name,
-                        'project': project_id})
+        if self.project_graph and self.project_graph.project.id == project_id:
+            for asset in assets:
+                self.project_graph.add_asset(asset)
 
-        asset_tuple = cursor.fetchone()
+        return asset_ids
 
-        connection.close()
+    def get_asset(self, asset_id):
 
-        if asset_tuple:
-            return entities.Converter.convert_to_asset([asset_tuple])[0]
+        asset = self.cache.get('assets', asset_id)
+        if asset:
+            return asset
 
-    def get_asset_types(self):
+        asset = query.Query(entities.Asset).filter('id', asset_id).first(self.connection.cursor())
+
+        if asset:
+            asset = self.fill_partial(self.project_assets, asset)
+            self.cache.put('assets', asset)
+            return asset
+
+    def get_assets_by_ids(self, asset_ids):
+        """
+        Get many assets by ids in a few queries
+
+        :param asset_ids: list of asset database IDs
+        :return: list of entities.Asset in the order of asset_ids, missing assets are skipped
+        """
+
+        assets = self.cache.get_many('assets', asset_ids)
+
+        missing_ids = [asset_id for asset_id in asset_ids if asset_id not in assets]
+        asset_tuples = self.get_rows_by_ids(entities.Asset, missing_ids)
+        for asset in entities.Converter.convert_to_asset(asset_tuples.values()):
+            asset = self.fill_partial(self.project_assets, asset)
+            assets[asset.id] = asset
+            self.cache.put('assets', asset)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        return [assets[asset_id] for asset_id in asset_ids if asset_id in assets]
 
-        cursor.execute("SELECT * FROM asset_types")
-        asset_types_tuples = cursor.fetchall()
-        asset_types_objects = entities.Converter.convert_to_asset_types(asset_types_tuples)
+    def get_asset_by_name(self, project_id, asset_name):
+
+        asset_query = query.Query(entities.Asset).filter('project', project_id).filter('name', asset_name)
+
+        return asset_query.first(self.connection.cursor())
 
-        connection.close()
+    def get_asset_types(self):
+
+        asset_types_objects = query.Query(entities.AssetType).all(self.connection.cursor())
 
         self.asset_types.extend(asset_types_objects)
 
@@ -291,269 +1122,566 @@ class EveData:
 
     def update_asset(self, asset):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        cursor.execute("UPDATE assets SET "
-                       "project=:project,"
-                       "type=:type,"
-                       "description=:description "
+        self.save(asset, ['project', 'type', 'description'])
 
-                       "WHERE id=:id",
-
-                       {'id': asset.id,
-                        'project': asset.project,
-                        'type': asset.type,
-                        'description': asset.description})
-
-        connection.commit()
-        connection.close()
+        self.cache.put('assets', asset)
 
         return asset
 
     def del_asset(self, asset_id):
+        """
+        Delete asset and its links to shots (ON DELETE CASCADE)
+        """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        # Delete ASSET
-        cursor.execute("DELETE FROM assets WHERE id=:id",
-                       {'id': asset_id})
+        with self.connection.transaction() as cursor:
+            cursor.execute("DELETE FROM assets WHERE id=:id",
+                           {'id': asset_id})
 
-        # Delete asset LINK
-        cursor.execute("DELETE FROM shot_assets WHERE asset_id=:asset_id",
+        self.cache.remove('assets', asset_id)
 
-                       {'asset_id': asset_id})
+        if self.project_graph:
+            self.project_graph.remove_asset(asset_id)
 
-        connection.commit()
-        connection.close()
-
-        for asset in self.project_assets:
-            if asset.id == asset_id:
-                self.project_assets.remove(asset)
+        self.project_assets.remove_ids([asset_id])
+        self.shot_assets.remove_ids([asset_id])
 
     # Sequence
     def add_sequence(self, sequence, project_id):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        with self.connection.transaction() as cursor:
+            cursor.execute("INSERT INTO sequences (id, name, project, description) VALUES ("
+                           ":id,"
+                           ":name,"
+                           ":project,"
+                           ":description)",
 
-        cursor.execute("INSERT INTO sequences VALUES ("
-                       ":id,"
-                       ":name,"
-                       ":project,"
-                       ":description)",
+                           {'id': cursor.lastrowid,
+                            'name': sequence.name,
+                            'project': project_id,
+                            'description': sequence.description})
 
-                       {'id': cursor.lastrowid,
-                        'name': sequence.name,
-                        'project': project_id,
-                        'description': sequence.description})
+            sequence.id = cursor.lastrowid  # Add database ID to the sequence object
 
-        connection.commit()
-        sequence.id = cursor.lastrowid  # Add database ID to the sequence object
-        connection.close()
+        sequence.project = project_id
+        sequence.mark_saved()
 
         self.project_sequences.append(sequence)
+        self.cache.put('sequences', sequence)
+
+        if self.project_graph and self.project_graph.project.id == project_id:
+            self.project_graph.add_sequence(sequence)
+
+    def add_sequences(self, sequences, project_id):
+        """
+        Add many sequences to the project in one transaction
+
+        :param sequences: iterable of entities.Sequence
+        :param project_id: int, project database ID
+        :return: list of database IDs of added sequences
+        """
+
+        sequences = list(sequences)
+
+        with self.connection.transaction() as cursor:
+            last_id = self.get_last_id(cursor, 'sequences')
+            cursor.executemany("INSERT INTO sequences (id, name, project, description) VALUES ("
+                               ":id,"
+                               ":name,"
+                               ":project,"
+                               ":description)",
+
+                               [{'id': None,
+                                 'name': sequence.name,
+                                 'project': project_id,
+                                 'description': sequence.description} for sequence in sequences])
+
+            sequence_ids = self.get_inserted_ids(cursor, 'sequences', last_id)
+
+        for sequence, sequence_id in zip(sequences, sequence_ids):
+            sequence.id = sequence_id
+            sequence.project = project_id
+            sequence.mark_saved()
+
+        self.project_sequences.extend(sequences)
+        self.cache.put_many('sequences', sequences)
+
+        if self.project_graph and self.project_graph.project.id == project_id:
+            for sequence in sequences:
+                self.project_graph.add_sequence(sequence)
+
+        return sequence_ids
 
     def get_sequence(self, sequence_id):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        sequence = self.cache.get('sequences', sequence_id)
+        if sequence:
+            return sequence
 
-        cursor.execute("SELECT * FROM sequences WHERE id=:id",
-                       {'id': sequence_id})
+        sequence = query.Query(entities.Sequence).filter('id', sequence_id).first(self.connection.cursor())
 
-        sequence_tuple = cursor.fetchone()
+        if sequence:
+            sequence = self.fill_partial(self.project_sequences, sequence)
+            self.cache.put('sequences', sequence)
+            return sequence
 
-        connection.close()
+    def get_sequences_by_ids(self, sequence_ids):
+        """
+        Get many sequences by ids in a few queries
 
-        if sequence_tuple:
-            return entities.Converter.convert_to_sequence([sequence_tuple])[0]
+        :param sequence_ids: list of sequence database IDs
+        :return: list of entities.Sequence in the order of sequence_ids, missing sequences are skipped
+        """
 
-    def update_sequence(self, sequence):
+        sequences = self.cache.get_many('sequences', sequence_ids)
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        missing_ids = [sequence_id for sequence_id in sequence_ids if sequence_id not in sequences]
+        sequence_tuples = self.get_rows_by_ids(entities.Sequence, missing_ids)
+        for sequence in entities.Converter.convert_to_sequence(sequence_tuples.values()):
+            sequence = self.fill_partial(self.project_sequences, sequence)
+            sequences[sequence.id] = sequence
+            self.cache.put('sequences', sequence)
 
-        cursor.execute("UPDATE sequences SET "
-                       "description=:description "
+        return [sequences[sequence_id] for sequence_id in sequence_ids if sequence_id in sequences]
 
-                       "WHERE id=:id",
+    def update_sequence(self, sequence):
 
-                       {'id': sequence.id,
-                        'description': sequence.description})
+        self.save(sequence, ['description'])
 
-        connection.commit()
-        connection.close()
+        self.cache.put('sequences', sequence)
 
         return sequence
 
     def del_sequence(self, sequence_id):
+        """
+        Delete sequence with its shots and their asset links (ON DELETE CASCADE)
+        """
+
+        project_graph = self.get_project_graph()
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        with self.connection.transaction() as cursor:
+            # IDs of deleted shots to update loaded data
+            if project_graph and sequence_id in project_graph.sequences:
+                shot_ids = [shot.id for shot in project_graph.sequence_shots[sequence_id]]
+            else:
+                shot_query = query.Query(entities.Shot).select('id').filter('sequence', sequence_id)
+                shot_ids = [row[0] for row in shot_query.rows(cursor)]
 
-        cursor.execute("DELETE FROM sequences WHERE id=:id",
-                       {'id': sequence_id})
+            cursor.execute("DELETE FROM sequences WHERE id=:id",
+                           {'id': sequence_id})
 
-        connection.commit()
-        connection.close()
+        self.cache.remove('sequences', sequence_id)
+        for shot_id in shot_ids:
+            self.cache.remove('shots', shot_id)
 
-        for sequence in self.project_sequences:
-            if sequence.id == sequence_id:
-                self.project_sequences.remove(sequence)
+        if project_graph:
+            project_graph.remove_sequence(sequence_id)
+
+        self.project_sequences.remove_ids([sequence_id])
+        self.sequence_shots.remove_ids(shot_ids)
 
     # Shot
     def add_shot(self, shot, sequence_id):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
-
-        cursor.execute("INSERT INTO shots VALUES ("
-                       ":id,"
-                       ":name,"
-                       ":sequence,"
-                       ":start_frame,"
-                       ":end_frame,"
-                       ":width,"
-                       ":height,"
-                       ":description)",
-
-                       {'id': cursor.lastrowid,
-                        'name': shot.name,
-                        'sequence': sequence_id,
-                        'start_frame': shot.start_frame,
-                        'end_frame': shot.end_frame,
-                        'width': shot.width,
-                        'height': shot.height,
-                        'description': shot.description})
-
-        connection.commit()
-        shot.id = cursor.lastrowid  # Add database ID to the shot object
-        connection.close()
+        with self.connection.transaction() as cursor:
+            cursor.execute("INSERT INTO shots ("
+                           "id, name, sequence, start_frame, end_frame, width, height, description) VALUES ("
+                           ":id,"
+                           ":name,"
+                           ":sequence,"
+                           ":start_frame,"
+                           ":end_frame,"
+                           ":width,"
+                           ":height,"
+                           ":description)",
+
+                           {'id': cursor.lastrowid,
+                            'name': shot.name,
+                            'sequence': sequence_id,
+                            'start_frame': shot.start_frame,
+                            'end_frame': shot.end_frame,
+                            'width': shot.width,
+                            'height': shot.height,
+                            'description': shot.description})
+
+            shot.id = cursor.lastrowid  # Add database ID to the shot object
+
+        shot.sequence = sequence_id
+        shot.mark_saved()
 
         self.sequence_shots.append(shot)
+        self.cache.put('shots', shot)
+
+        if self.project_graph and sequence_id in self.project_graph.sequences:
+            self.project_graph.add_shot(shot)
+
+    def add_shots(self, shots, sequence_id):
+        """
+        Add many shots to the sequence in one transaction (e.g. load editorial cut)
+
+        :param shots: iterable of entities.Shot
+        :param sequence_id: int, sequence database ID
+        :return: list of database IDs of added shots
+        """
+
+        shots = list(shots)
+
+        with self.connection.transaction() as cursor:
+            last_id = self.get_last_id(cursor, 'shots')
+            cursor.executemany("INSERT INTO shots ("
+                               "id, name, sequence, start_frame, end_frame, width, height, description) VALUES ("
+                               ":id,"
+                               ":name,"
+                               ":sequence,"
+                               ":start_frame,"
+                               ":end_frame,"
+                               ":width,"
+                               ":height,"
+                               ":description)",
+
+                               [{'id': None,
+                                 'name': shot.name,
+                                 'sequence': sequence_id,
+                                 'start_frame': shot.start_frame,
+                                 'end_frame': shot.end_frame,
+                                 'width': shot.width,
+                                 'height': shot.height,
+                                 'description': shot.description} for shot in shots])
+
+            shot_ids = self.get_inserted_ids(cursor, 'shots', last_id)
+
+        for shot, shot_id in zip(shots, shot_ids):
+            shot.id = shot_id
+            shot.sequence = sequence_id
+            shot.mark_saved()
+
+        self.sequence_shots.extend(shots)
+        self.cache.put_many('shots', shots)
+
+        if self.project_graph and sequence_id in self.project_graph.sequences:
+            for shot in shots:
+                self.project_graph.add_shot(shot)
+
+        return shot_ids
 
     def get_shot(self, shot_id):
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        shot = self.cache.get('shots', shot_id)
+        if shot:
+            return shot
+
+        shot = query.Query(entities.Shot).filter('id', shot_id).first(self.connection.cursor())
 
-        cursor.execute("SELECT * FROM shots WHERE id=:id",
-                       {'id': shot_id})
+        if shot:
+            shot = self.fill_partial(self.sequence_shots, shot)
+            self.cache.put('shots', shot)
+            return shot
 
-        shot_tuple = cursor.fetchone()
+    def get_shots_by_ids(self, shot_ids):
+        """
+        Get many shots by ids in a few queries
+
+        :param shot_ids: list of shot database IDs
+        :return: list of entities.Shot in the order of shot_ids, missing shots are skipped
+        """
 
-        connection.close()
+        shots = self.cache.get_many('shots', shot_ids)
 
-        if shot_tuple:
-            return entities.Converter.convert_to_shot([shot_tuple])[0]
+        missing_ids = [shot_id for shot_id in shot_ids if shot_id not in shots]
+        shot_tuples = self.get_rows_by_ids(entities.Shot, missing_ids)
+        for shot in entities.Converter.convert_to_shot(shot_tuples.values()):
+            shot = self.fill_partial(self.sequence_shots, shot)
+            shots[shot.id] = shot
+            self.cache.put('shots', shot)
+
+        return [shots[shot_id] for shot_id in shot_ids if shot_id in shots]
+
+    def read_shot_assets(self, shot_id):
+        """
+        Get list of assets linked to the shot with one query.
+        Does not change EveData lists, so it is safe to call from a worker thread (see core.loader)
+        """
 
-    def get_shot_assets(self, shot_id):
+        project_graph = self.get_project_graph()
+        if project_graph and shot_id in project_graph.shots:
+            return list(project_graph.shot_assets[shot_id])
 
-        # Clear shot_assets list
-        del self.shot_assets[:]
+        cursor = self.connection.cursor()
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        cursor.execute("SELECT " + ', '.join(['assets.' + column for column in entities.Asset.columns]) + " "
+                       "FROM shot_assets "
+                       "JOIN assets ON assets.id=shot_assets.asset_id "
+                       "WHERE shot_assets.shot_id=:shot_id "
+                       "ORDER BY shot_assets.id",
 
-        cursor.execute("SELECT * FROM shot_assets WHERE shot_id=:shot_id",
                        {'shot_id': shot_id})
 
-        link_tuples = cursor.fetchall()
+        asset_tuples = cursor.fetchall()
+        asset_objects = entities.Converter.convert_to_asset(asset_tuples)
+        self.cache.put_many('assets', asset_objects)
 
-        connection.close()
+        return asset_objects
 
-        if link_tuples:
-            # Append assets
-            for link_tuple in link_tuples:
-                self.shot_assets.append(self.get_asset(link_tuple[2]))
+    def get_asset_shots(self, asset_id):
+        """
+        Get list of shots which use the asset with one query (e.g. shots affected by new version of asset HDA).
+        Does not change EveData lists.
 
-    def update_shot(self, shot):
+        :param asset_id: int, asset database ID
+        :return: list of entities.Shot in link order
+        """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        project_graph = self.get_project_graph()
+        if project_graph and asset_id in project_graph.assets:
+            return list(project_graph.asset_shots[asset_id])
 
-        cursor.execute("UPDATE shots SET "
-                       "sequence=:sequence,"
-                       "start_frame=:start_frame,"
-                       "end_frame=:end_frame,"
-                       "width=:width,"
-                       "height=:height,"
-                       "description=:description "
+        cursor = self.connection.cursor()
 
-                       "WHERE id=:id",
+        cursor.execute("SELECT " + ', '.join(['shots.' + column for column in entities.Shot.columns]) + " "
+                       "FROM shot_assets "
+                       "JOIN shots ON shots.id=shot_assets.shot_id "
+                       "WHERE shot_assets.asset_id=:asset_id "
+                       "ORDER BY shot_assets.id",
 
-                       {'id': shot.id,
-                        'sequence': shot.sequence,
-                        'start_frame': shot.start_frame,
-                        'end_frame': shot.end_frame,
-                        'width': shot.width,
-                        'height': shot.height,
-                        'description': shot.description})
+                       {'asset_id': asset_id})
+
+        shot_tuples = cursor.fetchall()
+        shot_objects = entities.Converter.convert_to_shot(shot_tuples)
+        self.cache.put_many('shots', shot_objects)
+
+        return shot_objects
 
-        connection.commit()
-        connection.close()
+    def get_asset_usage(self, project):
+        """
+        Count shots which use each asset of the project with one query
+
+        :param project: entities.Project
+        :return: dictionary {asset_id: number of shots}, unused assets have 0
+        """
+
+        project_graph = self.get_project_graph()
+        if project_graph and project_graph.project.id == project.id:
+            return dict([(asset_id, len(shots)) for asset_id, shots in project_graph.asset_shots.iteritems()])
+
+        cursor = self.connection.cursor()
+
+        cursor.execute("SELECT assets.id, COUNT(shot_assets.id) "
+                       "FROM assets "
+                       "LEFT JOIN shot_assets ON shot_assets.asset_id=assets.id "
+                       "WHERE assets.project=:project "
+                       "GROUP BY assets.id",
+
+                       {'project': project.id})
+
+        return dict(cursor.fetchall())
+
+    def get_shot_assets(self, shot_id, asset_objects=None):
+        """
+        Get all assets linked to the shot
+
+        :param shot_id: int, shot database ID
+        :param asset_objects: list of entities.Asset, assets already read with read_shot_assets()
+        """
+
+        if asset_objects is None:
+            asset_objects = self.read_shot_assets(shot_id)
+
+        self.shot_assets.replace(asset_objects)
+        self.shot_assets_shot_id = shot_id
+
+    def update_shot(self, shot):
+
+        self.save(shot, ['sequence', 'start_frame', 'end_frame', 'width', 'height', 'description'])
+
+        self.cache.put('shots', shot)
 
         return shot
 
     def del_shot(self, shot_id):
+        """
+        Delete shot and its asset links (ON DELETE CASCADE)
+        """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        with self.connection.transaction() as cursor:
+            cursor.execute("DELETE FROM shots WHERE id=:id",
+                           {'id': shot_id})
 
-        cursor.execute("DELETE FROM shots WHERE id=:id",
-                       {'id': shot_id})
+        self.cache.remove('shots', shot_id)
 
-        connection.commit()
-        connection.close()
+        if self.project_graph:
+            self.project_graph.remove_shot(shot_id)
 
-        for shot in self.sequence_shots:
-            if shot.id == shot_id:
-                self.sequence_shots.remove(shot)
+        self.sequence_shots.remove_ids([shot_id])
 
     def link_asset(self, asset_id, shot_id):
         """
         Link asset to the shot
+
+        :return: True if link was added, None if the asset was already linked
         """
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+        if self.link_many(shot_id, [asset_id]):
+            return True
 
-        # Check if the asset link exists:
-        cursor.execute("SELECT * FROM shot_assets WHERE asset_id=:asset_id AND shot_id=:shot_id",
+    def unlink_asset(self, asset_id, shot_id):
 
-                       {'asset_id': asset_id, 'shot_id': shot_id})
+        self.unlink_many(shot_id, [asset_id])
 
-        if cursor.fetchone():
-            connection.close()
-            return
+    def link_many(self, shot_id, asset_ids):
+        """
+        Link assets to the shot in one transaction
 
-        cursor.execute("INSERT INTO shot_assets VALUES ("
-                       ":id,"
-                       ":shot_id,"
-                       ":asset_id)",
+        :return: list of linked asset IDs, assets already linked to the shot are skipped
+        """
 
-                       {'id': cursor.lastrowid,
-                        'shot_id': shot_id,
-                        'asset_id': asset_id})
+        return self.change_links(shot_id, asset_ids, [])[0]
 
-        connection.commit()
-        connection.close()
-        return True
+    def unlink_many(self, shot_id, asset_ids):
+        """
+        Unlink assets from the shot in one transaction
 
-    def unlink_asset(self, asset_id, shot_id):
+        :return: list of unlinked asset IDs
+        """
+
+        return self.change_links(shot_id, [], asset_ids)[1]
+
+    def set_shot_assets(self, shot_id, asset_ids):
+        """
+        Make asset_ids the only assets linked to the shot: add missing links and remove other links
+        in one transaction
+
+        :return: tuple of lists (linked asset IDs, unlinked asset IDs)
+        """
+
+        return self.change_links(shot_id, asset_ids, [], replace=True)
+
+    def read_links(self, cursor, shot_id):
+        """
+        Get IDs of assets linked to the shot (unique link index covers the query)
+        """
+
+        cursor.execute("SELECT asset_id FROM shot_assets WHERE shot_id=:shot_id",
+
+                       {'shot_id': shot_id})
+
+        return [asset_id for asset_id, in cursor.fetchall()]
+
+    def read_queued_links(self, shot_id):
+        """
+        Get IDs of assets linked to the shot in write-behind mode: committed links with queued link edits applied.
+        Queue is not flushed, so links edited one by one are still committed together.
+        """
+
+        linked_ids, queued = self.connection.read_queued(lambda cursor: self.read_links(cursor, shot_id),
+                                                         ('shot_assets', shot_id))
+
+        linked_ids = collections.OrderedDict.fromkeys(linked_ids)
+        for (table, link_shot_id, asset_id), (sql, parameters) in queued:
+            if sql == UNLINK_SQL:
+                linked_ids.pop(asset_id, None)
+            else:
+                linked_ids[asset_id] = None
+
+        return linked_ids.keys()
+
+    def delete_links(self, cursor, shot_id, asset_ids, keep=False):
+        """
+        Delete links of the shot to listed assets, or to all other assets with keep
+
+        :return: list of unlinked asset IDs
+        """
+
+        # Too many IDs for one "NOT IN (...)" query, other assets are found by current links
+        if keep and len(asset_ids) > CHUNK_SIZE:
+            keep_ids = set(asset_ids)
+            asset_ids = [asset_id for asset_id in self.read_links(cursor, shot_id) if asset_id not in keep_ids]
+            keep = False
+
+        if keep:
+            chunks = [asset_ids]
+        else:
+            chunks = [asset_ids[start:start + CHUNK_SIZE] for start in range(0, len(asset_ids), CHUNK_SIZE)]
+
+        unlink_ids = []
+
+        for chunk in chunks:
+            condition = "shot_id=? AND asset_id {0} ({1})".format('NOT IN' if keep else 'IN',
+                                                                   ','.join('?' * len(chunk)))
+
+            cursor.execute("SELECT asset_id FROM shot_assets WHERE " + condition + " ORDER BY id", [shot_id] + chunk)
+            chunk_ids = [asset_id for asset_id, in cursor.fetchall()]
+
+            if chunk_ids:
+                cursor.execute("DELETE FROM shot_assets WHERE " + condition, [shot_id] + chunk)
+                unlink_ids.extend(chunk_ids)
+
+        return unlink_ids
+
+    def change_links(self, shot_id, link_ids, unlink_ids, replace=False):
+        """
+        Add and remove asset links of the shot in one transaction, then update project graph
+        and shot_assets list (if it shows the shot) once.
+
+        Links are compared in SQL: unlinks delete only existing links, INSERT OR IGNORE ... SELECT on the unique
+        link index skips links which exist (and assets which do not), inserted links are found by their revision.
+        In write-behind mode links are queued and flushed together, existing links are known
+        from loaded project graph or committed links with queued edits (see read_queued_links).
+
+        :param shot_id: int, shot database ID
+        :param link_ids: list of asset IDs to link
+        :param unlink_ids: list of asset IDs to unlink
+        :param replace: bool, also unlink all assets which are not in link_ids (see set_shot_assets)
+        :return: tuple of lists (linked asset IDs, unlinked asset IDs)
+        """
+
+        if self.write_behind:
+            project_graph = self.get_project_graph()
+            if project_graph and shot_id in project_graph.shots:
+                linked_ids = [asset.id for asset in project_graph.shot_assets[shot_id]]
+            else:
+                linked_ids = self.read_queued_links(shot_id)
+
+            link_ids, unlink_ids = get_link_changes(linked_ids, link_ids, unlink_ids, replace)
+
+            for asset_id in link_ids:
+                self.write(('shot_assets', shot_id, asset_id), LINK_SQL, {'shot_id': shot_id, 'asset_id': asset_id})
+
+            for asset_id in unlink_ids:
+                self.write(('shot_assets', shot_id, asset_id), UNLINK_SQL, {'asset_id': asset_id, 'shot_id': shot_id})
+        else:
+            link_ids = list(collections.OrderedDict.fromkeys(link_ids))
+
+            with self.connection.transaction() as cursor:
+                token = self.get_change_token(cursor)
+
+                if replace:
+                    unlink_ids = self.delete_links(cursor, shot_id, link_ids, keep=True)
+                else:
+                    unlink_ids = self.delete_links(cursor, shot_id, list(collections.OrderedDict.fromkeys(unlink_ids)))
+
+                for start in range(0, len(link_ids), CHUNK_SIZE):
+                    chunk = link_ids[start:start + CHUNK_SIZE]
+                    cursor.execute("INSERT OR IGNORE INTO shot_assets (shot_id, asset_id) "
+                                   "SELECT ?, id FROM assets WHERE id IN ({0})".format(','.join('?' * len(chunk))),
+                                   [shot_id] + chunk)
+
+                # Inserted links took revisions after the token
+                cursor.execute("SELECT asset_id FROM shot_assets WHERE shot_id=:shot_id AND updated_at>:token "
+                               "ORDER BY id",
 
-        connection = sqlite3.connect(self.SQL_FILE_PATH)
-        cursor = connection.cursor()
+                               {'shot_id': shot_id, 'token': token})
 
-        cursor.execute("DELETE FROM shot_assets WHERE asset_id=:asset_id AND shot_id=:shot_id",
+                link_ids = [asset_id for asset_id, in cursor.fetchall()]
 
-                       {'asset_id': asset_id, 'shot_id': shot_id})
+        if self.project_graph:
+            for asset_id in unlink_ids:
+                self.project_graph.unlink(shot_id, asset_id)
+            for asset_id in link_ids:
+                self.project_graph.link(shot_id, asset_id)
 
-        connection.commit()
-        connection.close()
+        # Update shown shot assets once
+        if shot_id == self.shot_assets_shot_id:
+            self.shot_assets.remove_ids(unlink_ids)
+            if link_ids:
+                self.shot_assets.extend(self.get_assets_by_ids(link_ids))
 
-        for asset in self.shot_assets:
-            if asset.id == asset_id:
-                self.shot_assets.remove(asset)
\ No newline at end of file
+        return link_ids, unlink_ids
@@ -0,0 +1,127 @@
+"""
+Synthetic Eve database for benchmarks
+
+Build eve.db of a given scale with the Project Manager schema (schema.py) and current migrations:
+    generate_database('C:/temp/eve_large.db', **SCALES['large'])
+
+Scale is set by number of projects, sequences per project, shots per sequence, assets per project and
+link density: fraction of project assets linked to each shot. Names and links are random, but the same
+seed always builds the same database.
+
+Run from command line:
+    python generator.py <database path> [small|medium|large]
+"""
+
+
+import os
+import random
+import sqlite3
+
+import entities
+import connection
+import migrations
+import schema
+
+
+# Benchmark scales: projects, sequences per project, shots per sequence, assets per project, link density
+SCALES = {
+    'small': {'projects': 2, 'sequences': 5, 'shots': 20, 'assets': 200, 'link_density': 0.05},
+    'medium': {'projects': 5, 'sequences': 20, 'shots': 50, 'assets': 2000, 'link_density': 0.01},
+    'large': {'projects': 10, 'sequences': 50, 'shots': 100, 'assets': 10000, 'link_density': 0.002}}
+
+# Words for entity names (names share prefixes like real assets do)
+NAMES = ['chair', 'table', 'lamp', 'door', 'window', 'tree', 'rock', 'car', 'house', 'street',
+         'robot', 'hero', 'villain', 'crowd', 'smoke', 'fire', 'water', 'dust', 'sky', 'city']
+
+
+def get_name(generator, index):
+
+    return '{0}_{1}_{2:04d}'.format(generator.choice(NAMES), generator.choice(NAMES), index)
+
+
+def generate_database(SQL_FILE_PATH, projects, sequences, shots, assets, link_density, seed=0):
+    """
+    Create database file filled with synthetic data
+
+    :param SQL_FILE_PATH: string, path to new database file (existing file is replaced)
+    :param projects: int, number of projects
+    :param sequences: int, number of sequences in each project
+    :param shots: int, number of shots in each sequence
+    :param assets: int, number of assets in each project
+    :param link_density: float, fraction of project assets linked to each shot
+    :param seed: random seed
+    :return: dictionary, number of created rows by table
+    """
+
+    for file_path in [SQL_FILE_PATH, SQL_FILE_PATH + '-wal', SQL_FILE_PATH + '-shm']:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    generator = random.Random(seed)
+    asset_type_ids = sorted([data['id'] for data in entities.Asset.asset_types.values()])
+    links_per_shot = min(assets, int(round(assets * link_density)))
+    counts = {'projects': 0, 'assets': 0, 'sequences': 0, 'shots': 0, 'shot_assets': 0}
+
+    database = sqlite3.connect(SQL_FILE_PATH)
+    database.execute('PRAGMA journal_mode=OFF')
+    database.execute('PRAGMA synchronous=OFF')
+    cursor = database.cursor()
+
+    schema.init_database(database, cursor)
+    schema.init_asset_types(database, cursor)
+    schema.init_file_types(database, cursor)
+
+    for project_index in range(projects):
+        cursor.execute("INSERT INTO projects (name, houdini_build, width, height, description) "
+                       "VALUES (?, ?, ?, ?, ?)",
+                       ('project_{0:03d}'.format(project_index), '18.0.460', 1920, 1080, 'Synthetic project'))
+        project_id = cursor.lastrowid
+        counts['projects'] += 1
+
+        cursor.execute("SELECT IFNULL(MAX(id), 0) FROM assets")
+        first_asset_id = cursor.fetchone()[0] + 1
+        cursor.executemany("INSERT INTO assets (name, project, type, description) VALUES (?, ?, ?, ?)",
+                           [(get_name(generator, index), project_id, generator.choice(asset_type_ids), '')
+                            for index in range(assets)])
+        project_asset_ids = range(first_asset_id, first_asset_id + assets)
+        counts['assets'] += assets
+
+        for sequence_index in range(sequences):
+            cursor.execute("INSERT INTO sequences (name, project, description) VALUES (?, ?, ?)",
+                           ('SQ{0:03d}'.format(sequence_index), project_id, ''))
+            sequence_id = cursor.lastrowid
+            counts['sequences'] += 1
+
+            cursor.execute("SELECT IFNULL(MAX(id), 0) FROM shots")
+            first_shot_id = cursor.fetchone()[0] + 1
+            cursor.executemany("INSERT INTO shots (name, sequence, start_frame, end_frame, width, height, "
+                               "description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               [('SH{0:03d}0'.format(index), sequence_id, 1001, 1100, 1920, 1080, '')
+                                for index in range(shots)])
+            counts['shots'] += shots
+
+            links = []
+            for shot_id in range(first_shot_id, first_shot_id + shots):
+                for asset_id in generator.sample(project_asset_ids, links_per_shot):
+                    links.append((shot_id, asset_id))
+
+            cursor.executemany("INSERT INTO shot_assets (shot_id, asset_id) VALUES (?, ?)", links)
+            counts['shot_assets'] += len(links)
+
+    database.commit()
+    database.close()
+
+    # Upgrade to current schema (indexes, change feed, search index...)
+    pool = connection.ConnectionPool(SQL_FILE_PATH)
+    migrations.migrate(pool)
+    pool.close()
+
+    return counts
+
+
+if __name__ == '__main__':
+    import sys
+
+    scale = sys.argv[2] if len(sys.argv) > 2 else 'small'
+    print '>> Generating {0} Eve database {1}...'.format(scale, sys.argv[1])
+    print '>> Created rows: {0}'.format(generate_database(sys.argv[1], **SCALES[scale]))
@@ -0,0 +1,163 @@
+"""
+In-memory graph of one project: sequences, shots, assets and asset links.
+
+Built by EveData.load_project_graph() with a few set based queries,
+after that navigation between project entities does not touch the database.
+
+Lookups:
+    graph.assets[asset_id], graph.sequences[sequence_id], graph.shots[shot_id]
+    graph.asset_names[asset_name], graph.sequence_names[sequence_name]
+    graph.shot_names[(sequence_id, shot_name)]
+
+Adjacency:
+    graph.sequence_shots[sequence_id] = [Shot, ...]
+    graph.shot_assets[shot_id] = [Asset, ...]
+    graph.asset_shots[asset_id] = [Shot, ...]
+"""
+
+
+from collections import OrderedDict
+
+
+class ProjectGraph:
+    def __init__(self, project):
+        self.project = project
+        self.token = None  # Database revision of graph data (see EveData.get_change_token)
+
+        # Entities by ID (in database order)
+        self.assets = OrderedDict()
+        self.sequences = OrderedDict()
+        self.shots = OrderedDict()
+
+        # Entities by name
+        self.asset_names = {}
+        self.sequence_names = {}
+        self.shot_names = {}
+
+        # Parent >> children
+        self.sequence_shots = {}
+
+        # Asset <> shot links
+        self.shot_assets = {}
+        self.asset_shots = {}
+
+    def build(self, assets, sequences, shots, links):
+        """
+        Fill graph with project data
+
+        :param assets: list of entities.Asset
+        :param sequences: list of entities.Sequence
+        :param shots: list of entities.Shot
+        :param links: list of (shot_id, asset_id) tuples
+        """
+
+        for asset in assets:
+            self.add_asset(asset)
+
+        for sequence in sequences:
+            self.add_sequence(sequence)
+
+        for shot in shots:
+            self.add_shot(shot)
+
+        for shot_id, asset_id in links:
+            self.link(shot_id, asset_id)
+
+        return self
+
+    # Add
+    def add_asset(self, asset):
+
+        self.assets[asset.id] = asset
+        self.asset_names[asset.name] = asset
+        self.asset_shots.setdefault(asset.id, [])
+
+    def add_sequence(self, sequence):
+
+        self.sequences[sequence.id] = sequence
+        self.sequence_names[sequence.name] = sequence
+        self.sequence_shots.setdefault(sequence.id, [])
+
+    def add_shot(self, shot):
+
+        self.shots[shot.id] = shot
+        self.shot_names[(shot.sequence, shot.name)] = shot
+        self.sequence_shots.setdefault(shot.sequence, []).append(shot)
+        self.shot_assets.setdefault(shot.id, [])
+
+    def link(self, shot_id, asset_id):
+        """
+        Link asset to shot if both belong to the project
+        """
+
+        shot = self.shots.get(shot_id)
+        asset = self.assets.get(asset_id)
+
+        if not shot or not asset:
+            return
+
+        if asset not in self.shot_assets[shot_id]:
+            self.shot_assets[shot_id].append(asset)
+            self.asset_shots[asset_id].append(shot)
+
+    def set_links(self, links):
+        """
+        Replace all asset links
+
+        :param links: list of (shot_id, asset_id) tuples
+        """
+
+        for shot_id in self.shot_assets:
+            self.shot_assets[shot_id] = []
+
+        for asset_id in self.asset_shots:
+            self.asset_shots[asset_id] = []
+
+        for shot_id, asset_id in links:
+            self.link(shot_id, asset_id)
+
+    # Remove
+    def remove_asset(self, asset_id):
+
+        asset = self.assets.pop(asset_id, None)
+        if not asset:
+            return
+
+        self.asset_names.pop(asset.name, None)
+
+        for shot in self.asset_shots.pop(asset_id, []):
+            self.shot_assets[shot.id].remove(asset)
+
+    def remove_sequence(self, sequence_id):
+
+        sequence = self.sequences.pop(sequence_id, None)
+        if not sequence:
+            return
+
+        self.sequence_names.pop(sequence.name, None)
+
+        for shot in list(self.sequence_shots.get(sequence_id, [])):
+            self.remove_shot(shot.id)
+
+        self.sequence_shots.pop(sequence_id, None)
+
+    def remove_shot(self, shot_id):
+
+        shot = self.shots.pop(shot_id, None)
+        if not shot:
+            return
+
+        self.shot_names.pop((shot.sequence, shot.name), None)
+        self.sequence_shots[shot.sequence].remove(shot)
+
+        for asset in self.shot_assets.pop(shot_id, []):
+            self.asset_shots[asset.id].remove(shot)
+
+    def unlink(self, shot_id, asset_id):
+
+        shot = self.shots.get(shot_id)
+        asset = self.assets.get(asset_id)
+
+        if shot and asset and asset in self.shot_assets[shot_id]:
+            self.shot_assets[shot_id].remove(asset)
+            self.asset_shots[asset_id].remove(shot)
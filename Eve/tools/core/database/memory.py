@@ -0,0 +1,263 @@
+"""
+In-memory copy of Eve database
+
+Unit tests, benchmarks and short hython jobs read eve.db from the network share many times.
+MemoryPool loads a snapshot of eve.db into ":memory:" database once, after that all reads and writes go to RAM:
+    eve_data = EveData(SQL_FILE_PATH, in_memory=memory.SNAPSHOT)  # Changes are dropped on close
+    eve_data = EveData(SQL_FILE_PATH, in_memory=memory.WRITE_BACK)  # Changes are written to eve.db on close
+    eve_data.connection.write_back()  # Write changes now
+
+Snapshot is loaded with SQLite online backup API (Python 3.7+). Python 2 sqlite3 module has no backup API,
+there schema and rows are copied by copy_snapshot().
+
+Write back replays changes of tracked tables (migrations.CHANGE_TABLES) made in memory since the snapshot
+in one transaction: deleted rows are deleted, changed and added rows are written column by column, so triggers
+of eve.db update its change feed and search index and other clients pull the changes. If eve.db was changed
+by other clients after the snapshot, nothing is written and StaleSnapshot is raised.
+Schema changes (migrations run on the copy) and untracked tables are not written back.
+
+MemoryPool has the same interface as connection.ConnectionPool. All threads share one connection
+(":memory:" database belongs to its connection), transactions of different threads run one by one.
+"""
+
+
+import sqlite3
+import threading
+import contextlib
+
+from core import settings
+import connection
+import migrations
+import replica
+import query
+
+
+# In-memory modes (EveData and AssetData in_memory argument)
+SNAPSHOT = 'snapshot'
+WRITE_BACK = 'write_back'
+
+
+class StaleSnapshot(sqlite3.OperationalError):
+    """
+    Eve database was changed by other clients after the snapshot was loaded to memory
+    """
+
+
+def copy_snapshot(source, destination):
+    """
+    Copy database of source connection to empty destination database (when backup API is not available)
+
+    Virtual tables are created first (they create their shadow tables), then other tables.
+    Rows are copied table by table, indexes and triggers are created after the rows.
+
+    :param source: sqlite3.Connection
+    :param destination: sqlite3.Connection in autocommit mode (isolation_level=None)
+    """
+
+    source_cursor = source.cursor()
+    destination_cursor = destination.cursor()
+
+    source_cursor.execute('BEGIN')  # Read one snapshot
+    destination_cursor.execute('BEGIN')
+
+    try:
+        source_cursor.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+        schema = source_cursor.fetchall()
+
+        for object_type, name, sql in schema:
+            if object_type == 'table' and sql.startswith('CREATE VIRTUAL TABLE'):
+                destination_cursor.execute(sql)
+
+        destination_cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing_tables = set([name for name, in destination_cursor.fetchall()])
+
+        tables = []
+        for object_type, name, sql in schema:
+            if object_type != 'table' or sql.startswith('CREATE VIRTUAL TABLE'):
+                continue
+
+            if name.startswith('sqlite_') and name != 'sqlite_sequence':  # Statistics tables are internal
+                continue
+
+            if name not in existing_tables and name != 'sqlite_sequence':
+                destination_cursor.execute(sql)
+
+            tables.append(name)
+
+        for table in tables:
+            source_cursor.execute('SELECT * FROM "{0}"'.format(table))
+            values = ', '.join(['?'] * len(source_cursor.description))
+            destination_cursor.executemany('INSERT OR REPLACE INTO "{0}" VALUES ({1})'.format(table, values),
+                                           source_cursor)
+
+        for object_type, name, sql in schema:
+            if object_type in ('index', 'trigger', 'view'):
+                destination_cursor.execute(sql)
+
+        destination_cursor.execute('PRAGMA user_version={0}'.format(migrations.get_version(source_cursor)))
+
+        destination_cursor.execute('COMMIT')
+    except:
+        destination_cursor.execute('ROLLBACK')
+        raise
+    finally:
+        source_cursor.execute('COMMIT')
+
+
+def write_changes(source, destination, token):
+    """
+    Write rows of tracked tables changed in source database after token revision to destination database
+
+    :param source: sqlite3.Cursor of database with changes
+    :param destination: sqlite3.Cursor inside destination transaction
+    :param token: int, change feed revision (see EveData.get_change_token)
+    :return: int, number of written rows
+    """
+
+    written = 0
+
+    source.execute("SELECT entity, entity_id FROM changes WHERE id>:token ORDER BY id", {'token': token})
+    for table, entity_id in source.fetchall():
+        if table in migrations.CHANGE_TABLES:
+            destination.execute("DELETE FROM {0} WHERE id=:id".format(table), {'id': entity_id})
+            written += 1
+
+    # Parent tables first. Revision column is left to destination triggers.
+    for table in migrations.CHANGE_TABLES:
+        source.execute("PRAGMA table_info({0})".format(table))
+        columns = [column_info[1] for column_info in source.fetchall() if column_info[1] != 'updated_at']
+
+        source.execute("SELECT {0} FROM {1} WHERE updated_at>:token ORDER BY id".format(', '.join(columns), table),
+                       {'token': token})
+        rows = source.fetchall()
+
+        update_sql = query.get_update_sql(table, columns[1:])
+        insert_sql = "INSERT INTO {0} ({1}) VALUES ({2})".format(
+            table, ', '.join(columns), ', '.join([':' + column for column in columns]))
+
+        for row in rows:
+            parameters = dict(zip(columns, row))
+            destination.execute(update_sql, parameters)
+            if not destination.rowcount:
+                destination.execute(insert_sql, parameters)
+            written += 1
+
+    return written
+
+
+class MemoryPool(connection.ConnectionPool):
+    def __init__(self, SQL_FILE_PATH, write_back=False, pragmas=None):
+        """
+        :param SQL_FILE_PATH: string, path to eve.db
+        :param write_back: bool, write changes to eve.db on close
+        """
+
+        connection.ConnectionPool.__init__(self, SQL_FILE_PATH, pragmas)
+        self.write_back_on_close = write_back
+
+        self.revision = None  # Revision of eve.db which memory database is based on (see replica.get_revision)
+        self.token = None  # Change feed revision of memory database written to eve.db
+
+        self._memory = None
+        self._memory_lock = threading.Lock()
+        self._transaction_lock = threading.RLock()
+
+    def open(self):
+        """
+        Load snapshot of eve.db to memory on first use, all threads get the same connection
+        """
+
+        with self._memory_lock:
+            if self._memory is None:
+                memory = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False,
+                                         cached_statements=settings.SQL_CACHED_STATEMENTS)
+                self.load(memory)
+
+                for pragma, value in self.pragmas:
+                    memory.execute('PRAGMA {0}={1}'.format(pragma, value))
+
+                self._memory = memory
+
+            return self._memory
+
+    def load(self, memory):
+        """
+        Copy eve.db to memory database
+        """
+
+        source = sqlite3.connect(self.SQL_FILE_PATH, isolation_level=None)
+
+        try:
+            if hasattr(source, 'backup'):
+                # Online backup API (Python 3.7+)
+                source.backup(memory)
+            else:
+                copy_snapshot(source, memory)
+        finally:
+            source.close()
+
+        self.revision = replica.get_revision(memory.cursor())
+        self.token = self.revision[1]
+
+    @contextlib.contextmanager
+    def transaction(self, mode='IMMEDIATE'):
+        """
+        Threads share one connection, so their transactions must not interleave
+        """
+
+        with self._transaction_lock:
+            with connection.ConnectionPool.transaction(self, mode) as cursor:
+                yield cursor
+
+    def write_back(self):
+        """
+        Write changes made in memory since the snapshot was loaded (or last write back) to eve.db in one transaction
+
+        :return: int, number of written rows
+        """
+
+        with self._transaction_lock:
+            cursor = self.cursor()
+            revision = replica.get_revision(cursor)
+
+            if revision[1] == self.token:
+                return 0
+
+            target = sqlite3.connect(self.SQL_FILE_PATH, isolation_level=None)
+
+            try:
+                target_cursor = target.cursor()
+                target_cursor.execute('BEGIN IMMEDIATE')
+
+                try:
+                    if replica.get_revision(target_cursor) != self.revision:
+                        raise StaleSnapshot('Eve database {0} was changed after it was loaded to memory, '
+                                            'changes are not written'.format(self.SQL_FILE_PATH))
+
+                    written = write_changes(cursor, target_cursor, self.token)
+                    target_cursor.execute('COMMIT')
+                except:
+                    target_cursor.execute('ROLLBACK')
+                    raise
+
+                self.revision = replica.get_revision(target_cursor)
+            finally:
+                target.close()
+
+            self.token = revision[1]
+
+        return written
+
+    def close(self):
+        """
+        Write changes back (write_back mode) and drop memory database, next use loads a new snapshot
+        """
+
+        try:
+            if self.write_back_on_close and self._memory is not None:
+                self.write_back()
+        finally:
+            connection.ConnectionPool.close(self)
+
+            with self._memory_lock:
+                self._memory = None
@@ -0,0 +1,377 @@
+"""
+Eve database schema migrations
+
+Each migration upgrades eve.db from previous schema version to the next one.
+Current schema version is stored in the database file header (PRAGMA user_version),
+so checking for pending migrations costs one PRAGMA read.
+
+To change the schema add a new function and register it at the end of MIGRATIONS list:
+    (version, description, function)
+
+Migration function receives a cursor inside open transaction and must not commit.
+
+Change feed history ("changes" table) is pruned by prune_changes(), EveData calls it on close.
+"""
+
+
+import sqlite3
+
+
+def get_version(cursor):
+    """
+    Get schema version of the database
+    """
+
+    cursor.execute('PRAGMA user_version')
+
+    return cursor.fetchone()[0]
+
+
+# Migrations
+def add_indexes(cursor):
+    """
+    Index foreign key and name columns used in EveData queries
+    """
+
+    # Remove duplicated links before creating unique index (keep the first link)
+    cursor.execute("DELETE FROM shot_assets WHERE id NOT IN ("
+                   "SELECT MIN(id) FROM shot_assets GROUP BY shot_id, asset_id)")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assets_project ON assets(project)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assets_name ON assets(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sequences_project ON sequences(project)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sequences_name ON sequences(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shots_sequence ON shots(sequence)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shots_name ON shots(name)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_shot_assets_link ON shot_assets(shot_id, asset_id)")
+
+
+# Tables tracked by change feed (see EveData.changes_since)
+CHANGE_TABLES = ['projects', 'assets', 'sequences', 'shots', 'shot_assets']
+
+
+def create_change_triggers(cursor, table):
+    """
+    Track changes of the table rows.
+
+    Each change takes next revision number from AUTOINCREMENT sequence of "changes" table.
+    Inserted and updated rows store revision in updated_at column (helper row in "changes" is removed),
+    deleted rows leave a tombstone row in "changes".
+    """
+
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_insert_change AFTER INSERT ON {0} "
+                   "BEGIN "
+                   "INSERT INTO changes (entity, entity_id) VALUES ('{0}', NEW.id); "
+                   "UPDATE {0} SET updated_at=last_insert_rowid() WHERE id=NEW.id; "
+                   "DELETE FROM changes WHERE id=last_insert_rowid(); "
+                   "END".format(table))
+
+    # Skip updated_at updates made by triggers
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_update_change AFTER UPDATE ON {0} "
+                   "WHEN NEW.updated_at IS OLD.updated_at "
+                   "BEGIN "
+                   "INSERT INTO changes (entity, entity_id) VALUES ('{0}', NEW.id); "
+                   "UPDATE {0} SET updated_at=last_insert_rowid() WHERE id=NEW.id; "
+                   "DELETE FROM changes WHERE id=last_insert_rowid(); "
+                   "END".format(table))
+
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_delete_change AFTER DELETE ON {0} "
+                   "BEGIN "
+                   "INSERT INTO changes (entity, entity_id) VALUES ('{0}', OLD.id); "
+                   "END".format(table))
+
+
+def add_change_tracking(cursor):
+    """
+    Add updated_at revision to tracked tables and "changes" table with tombstones of deleted rows
+    """
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS changes (
+                    id integer primary key autoincrement,
+                    entity text,
+                    entity_id integer
+                    )''')
+
+    # First revision for existing rows
+    cursor.execute("INSERT INTO changes (entity, entity_id) VALUES ('changes', 0)")
+    revision = cursor.lastrowid
+    cursor.execute("DELETE FROM changes WHERE id=:id", {'id': revision})
+
+    for table in CHANGE_TABLES:
+        cursor.execute("ALTER TABLE {0} ADD COLUMN updated_at integer".format(table))
+        cursor.execute("UPDATE {0} SET updated_at=:revision".format(table), {'revision': revision})
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_{0}_updated_at ON {0}(updated_at)".format(table))
+        create_change_triggers(cursor, table)
+
+
+def add_asset_filter_indexes(cursor):
+    """
+    Index project assets by type and name (asset filters of get_project_assets).
+    Index on project column alone is covered by the new indexes.
+    """
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assets_project_type ON assets(project, type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assets_project_name ON assets(project, name)")
+    cursor.execute("DROP INDEX IF EXISTS idx_assets_project")
+
+
+# Tables in search index: (table, kind number, project column expression)
+# Index row ID is entity_id * 4 + kind number, so triggers find entity row without scanning the index
+SEARCH_TABLES = [
+    ('assets', 1, 'NEW.project'),
+    ('sequences', 2, 'NEW.project'),
+    ('shots', 3, '(SELECT project FROM sequences WHERE id=NEW.sequence)')]
+
+
+def add_search_index(cursor):
+    """
+    Full text search index over names and descriptions of assets, sequences and shots (see EveData.search)
+    """
+
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE search_index USING fts5("
+                       "name, description, "
+                       "kind UNINDEXED, entity_id UNINDEXED, project UNINDEXED, "
+                       "prefix='2 3')")
+    except sqlite3.OperationalError:
+        print '>> SQLite is built without FTS5, EveData.search() will scan tables'
+        return
+
+    for table, kind, project in SEARCH_TABLES:
+        cursor.execute("INSERT INTO search_index (rowid, name, description, kind, entity_id, project) "
+                       "SELECT NEW.id*4+{1}, NEW.name, NEW.description, '{0}', NEW.id, {2} "
+                       "FROM {0} AS NEW".format(table, kind, project))
+
+        cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_insert_search AFTER INSERT ON {0} "
+                       "BEGIN "
+                       "INSERT INTO search_index (rowid, name, description, kind, entity_id, project) "
+                       "VALUES (NEW.id*4+{1}, NEW.name, NEW.description, '{0}', NEW.id, {2}); "
+                       "END".format(table, kind, project))
+
+        cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_update_search "
+                       "AFTER UPDATE OF id, name, description, {3} ON {0} "
+                       "BEGIN "
+                       "DELETE FROM search_index WHERE rowid=OLD.id*4+{1}; "
+                       "INSERT INTO search_index (rowid, name, description, kind, entity_id, project) "
+                       "VALUES (NEW.id*4+{1}, NEW.name, NEW.description, '{0}', NEW.id, {2}); "
+                       "END".format(table, kind, project, 'sequence' if table == 'shots' else 'project'))
+
+        cursor.execute("CREATE TRIGGER IF NOT EXISTS {0}_delete_search AFTER DELETE ON {0} "
+                       "BEGIN "
+                       "DELETE FROM search_index WHERE rowid=OLD.id*4+{1}; "
+                       "END".format(table, kind))
+
+    # Shots follow their sequence to another project
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS sequences_project_search AFTER UPDATE OF project ON sequences "
+                   "BEGIN "
+                   "UPDATE search_index SET project=NEW.project "
+                   "WHERE rowid IN (SELECT id*4+3 FROM shots WHERE sequence=NEW.id); "
+                   "END")
+
+
+def rebuild_table(cursor, table, create_sql, columns):
+    """
+    Change table definition: create new table, copy rows, replace old table.
+    Indexes and triggers of the table are recreated, AUTOINCREMENT counter is kept.
+
+    :param create_sql: string, CREATE TABLE statement with {0} in place of table name
+    :param columns: list of column names to copy
+    """
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name=:table AND type IN ('index', 'trigger') "
+                   "AND sql IS NOT NULL",
+                   {'table': table})
+    schema = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name=:table", {'table': table})
+    sequence = cursor.fetchone()
+
+    cursor.execute(create_sql.format(table + '_new'))
+    cursor.execute("INSERT INTO {0}_new ({1}) SELECT {1} FROM {0}".format(table, ', '.join(columns)))
+    cursor.execute("DROP TABLE {0}".format(table))
+    cursor.execute("ALTER TABLE {0}_new RENAME TO {0}".format(table))
+
+    for sql in schema:
+        cursor.execute(sql)
+
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq=:seq WHERE name=:table", {'seq': sequence[0], 'table': table})
+
+
+def add_cascading_foreign_keys(cursor):
+    """
+    Delete shots, assets and asset links together with their project, sequence, shot or asset
+    (ON DELETE CASCADE, foreign keys are enabled in settings.SQL_PRAGMAS).
+
+    Runs with foreign keys disabled (see migrate): dropping old tables must not cascade or count violations.
+    """
+
+    # Legacy rename does not check triggers of other tables, which refer to the table being replaced
+    cursor.execute("PRAGMA legacy_alter_table=ON")
+
+    # Remove rows orphaned by previous deletes
+    cursor.execute("UPDATE assets SET type=NULL WHERE type NOT IN (SELECT id FROM asset_types)")
+    cursor.execute("DELETE FROM assets WHERE project NOT IN (SELECT id FROM projects)")
+    cursor.execute("DELETE FROM sequences WHERE project NOT IN (SELECT id FROM projects)")
+    cursor.execute("DELETE FROM shots WHERE sequence NOT IN (SELECT id FROM sequences)")
+    cursor.execute("DELETE FROM shot_assets WHERE shot_id NOT IN (SELECT id FROM shots) "
+                   "OR asset_id NOT IN (SELECT id FROM assets)")
+
+    # Parents first: dropping a table with cascading children would delete the children
+    rebuild_table(cursor, 'sequences',
+                  '''CREATE TABLE {0} (
+                  id integer primary key autoincrement,
+                  name text,
+                  project integer REFERENCES projects(id) ON DELETE CASCADE,
+                  description text,
+                  updated_at integer
+                  )''',
+                  ['id', 'name', 'project', 'description', 'updated_at'])
+
+    rebuild_table(cursor, 'assets',
+                  '''CREATE TABLE {0} (
+                  id integer primary key autoincrement,
+                  name text,
+                  project integer REFERENCES projects(id) ON DELETE CASCADE,
+                  type integer REFERENCES asset_types(id),
+                  description text,
+                  updated_at integer
+                  )''',
+                  ['id', 'name', 'project', 'type', 'description', 'updated_at'])
+
+    rebuild_table(cursor, 'shots',
+                  '''CREATE TABLE {0} (
+                  id integer primary key autoincrement,
+                  name text,
+                  sequence integer REFERENCES sequences(id) ON DELETE CASCADE,
+                  start_frame integer,
+                  end_frame integer,
+                  width integer,
+                  height integer,
+                  description text,
+                  updated_at integer
+                  )''',
+                  ['id', 'name', 'sequence', 'start_frame', 'end_frame', 'width', 'height', 'description',
+                   'updated_at'])
+
+    rebuild_table(cursor, 'shot_assets',
+                  '''CREATE TABLE {0} (
+                  id integer primary key autoincrement,
+                  shot_id integer REFERENCES shots(id) ON DELETE CASCADE,
+                  asset_id integer REFERENCES assets(id) ON DELETE CASCADE,
+                  updated_at integer
+                  )''',
+                  ['id', 'shot_id', 'asset_id', 'updated_at'])
+
+    cursor.execute("PRAGMA legacy_alter_table=OFF")
+
+    for table in ['sequences', 'assets', 'shots', 'shot_assets']:
+        cursor.execute("PRAGMA foreign_key_check({0})".format(table))
+        if cursor.fetchone():
+            raise sqlite3.IntegrityError('Table "{0}" has rows with missing parents'.format(table))
+
+
+def add_asset_usage_index(cursor):
+    """
+    Index asset links by asset (shots which use the asset, see EveData.get_asset_shots).
+    Unique link index starts with shot_id and does not serve lookups by asset.
+    """
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shot_assets_asset ON shot_assets(asset_id)")
+
+
+MIGRATIONS = [
+    (1, 'Indexes on foreign key and name columns', add_indexes),
+    (2, 'Change tracking', add_change_tracking),
+    (3, 'Asset filter indexes', add_asset_filter_indexes),
+    (4, 'Full text search index', add_search_index),
+    (5, 'Cascading deletes', add_cascading_foreign_keys),
+    (6, 'Asset usage index', add_asset_usage_index)]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(connection):
+    """
+    Upgrade database to the latest schema version.
+
+    Each migration runs in its own transaction together with the version bump,
+    so interrupted upgrade leaves the database at the last completed version.
+
+    :param connection: connection.ConnectionPool
+    :return: int, schema version of the database
+    """
+
+    if hasattr(connection, 'get_schema_version'):  # Eve data service upgrades the database at startup
+        return connection.get_schema_version()
+
+    if get_version(connection.cursor()) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    # Replica pool reads local copy, upgrade the primary database
+    connection = getattr(connection, 'primary', connection)
+
+    # Tables are rebuilt with foreign keys disabled. PRAGMA foreign_keys has no effect inside transaction.
+    write_connection = connection.get()
+    foreign_keys = write_connection.execute('PRAGMA foreign_keys').fetchone()[0]
+    write_connection.execute('PRAGMA foreign_keys=OFF')
+
+    try:
+        for version, description, function in MIGRATIONS:
+            with connection.transaction() as cursor:
+                # Other client could upgrade the database while we wait for the write lock
+                if get_version(cursor) >= version:
+                    continue
+
+                print '>> Upgrading Eve database to version {0}: {1}'.format(version, description)
+                function(cursor)
+                cursor.execute('PRAGMA user_version={0}'.format(version))
+    finally:
+        write_connection.execute('PRAGMA foreign_keys={0}'.format(foreign_keys))
+
+    return SCHEMA_VERSION
+
+
+def get_pruned_revision(cursor, keep):
+    """
+    Get revision up to which change history should be pruned, None if history is shorter than 2 * keep revisions
+    """
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'")
+    revision = cursor.fetchone()
+    cursor.execute("SELECT MIN(id) FROM changes")
+    oldest = cursor.fetchone()[0] or 0
+
+    if revision and revision[0] - oldest >= 2 * keep:
+        return revision[0] - keep
+
+
+def prune_changes(connection, keep):
+    """
+    Delete tombstones of deleted rows older than keep latest revisions, so "changes" table does not grow without bound.
+
+    History is cut to keep revisions when it grows to twice as many, so most calls only read two values.
+    Row of 'changes' entity marks the oldest revision of remaining history: changes since older revision
+    miss deleted rows (see EveData.changes_since).
+
+    :param connection: connection.ConnectionPool
+    :param keep: int, number of latest revisions to keep
+    :return: int, number of deleted tombstones
+    """
+
+    if not get_pruned_revision(connection.cursor(), keep):
+        return 0
+
+    with connection.transaction() as cursor:
+        # Other client could prune history while we wait for the write lock
+        revision = get_pruned_revision(cursor, keep)
+        if not revision:
+            return 0
+
+        cursor.execute("DELETE FROM changes WHERE id<=:revision", {'revision': revision})
+        pruned = cursor.rowcount
+        cursor.execute("INSERT INTO changes (id, entity, entity_id) VALUES (:revision, 'changes', 0)",
+                       {'revision': revision})
+
+    return pruned
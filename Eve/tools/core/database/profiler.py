@@ -0,0 +1,420 @@
+"""
+Instrumentation of Eve database layer
+
+Opt-in (settings.PROFILE_DATABASE, EVE_PROFILE environment variable) statistics of EveData and AssetData calls:
+    - per method: number of calls, wall time, number of SQL statements, statement time and rows returned
+    - connection open time of the connection pool
+    - slow query log: statements running longer than settings.SLOW_QUERY_TIME with EXPLAIN QUERY PLAN output
+
+Usage:
+    eve_data = EveData(SQL_FILE_PATH)  # Instrumented when profiling is enabled
+    profiler.PROFILER.export('C:/temp/eve_stats.json')
+
+Method time and rows are inclusive: statements of nested calls (get_projects inside init_data)
+are counted for both methods. All EveData and AssetData instances of the process share PROFILER.
+"""
+
+
+import time
+import json
+import inspect
+import sqlite3
+import datetime
+import threading
+import collections
+
+from core import settings
+
+
+# Statements which have a query plan
+EXPLAINED = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+class ProfiledCursor:
+    def __init__(self, cursor, connection):
+        """
+        Cursor wrapper, reports statement time and rows to the profiler
+
+        :param cursor: sqlite3 or service cursor
+        :param connection: ProfiledConnection
+        """
+
+        self.cursor = cursor
+        self.connection = connection
+        self.statement = None  # Profiler record of the last statement
+
+    def __getattr__(self, name):
+
+        return getattr(self.cursor, name)
+
+    def run(self, function, sql, parameters):
+
+        start = time.time()
+        function(sql, parameters)
+
+        self.statement = self.connection.profiler.add_statement(self.connection, sql, parameters,
+                                                                time.time() - start)
+
+        return self
+
+    def execute(self, sql, parameters=()):
+
+        return self.run(self.cursor.execute, sql, parameters)
+
+    def executemany(self, sql, parameters):
+
+        parameters = list(parameters)
+
+        return self.run(self.cursor.executemany, sql, parameters)
+
+    def fetch(self, function, *args):
+
+        start = time.time()
+        rows = function(*args)
+
+        if rows is None:
+            count = 0
+        elif isinstance(rows, list):
+            count = len(rows)
+        else:
+            count = 1
+
+        if self.statement:
+            self.connection.profiler.add_rows(self.statement, count, time.time() - start)
+
+        return rows
+
+    def fetchone(self):
+
+        return self.fetch(self.cursor.fetchone)
+
+    def fetchmany(self, *args):
+
+        return self.fetch(self.cursor.fetchmany, *args)
+
+    def fetchall(self):
+
+        return self.fetch(self.cursor.fetchall)
+
+    def __iter__(self):
+
+        return iter(self.fetchall())
+
+
+class ProfiledConnection:
+    def __init__(self, connection, profiler):
+        """
+        Connection wrapper, returns profiled cursors
+
+        :param connection: sqlite3 or service connection
+        :param profiler: Profiler
+        """
+
+        self.connection = connection
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+
+        return getattr(self.connection, name)
+
+    def cursor(self):
+
+        return ProfiledCursor(self.connection.cursor(), self)
+
+    def execute(self, sql, parameters=()):
+
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+
+        return self.cursor().executemany(sql, parameters)
+
+
+class Profiler:
+    def __init__(self, slow_query_time=settings.SLOW_QUERY_TIME, slow_query_log_size=settings.SLOW_QUERY_LOG_SIZE):
+        """
+        :param slow_query_time: float, seconds. Slower statements are logged with query plan
+        :param slow_query_log_size: int, number of recent slow statements kept
+        """
+
+        self.slow_query_time = slow_query_time
+        self.slow_query_log_size = slow_query_log_size
+
+        self.started_at = None
+        self.methods = {}  # {'EveData.get_asset': {calls, time, statements, statement_time, rows}}
+        self.connections = None  # Connection open stats
+        self.statements = None  # Total of all statements
+        self.slow_queries = None
+
+        self._local = threading.local()  # Stack of running methods of the thread
+        self._lock = threading.Lock()
+
+        self.reset()
+
+    def reset(self):
+        """
+        Clear collected stats
+        """
+
+        with self._lock:
+            self.started_at = datetime.datetime.now()
+            self.methods = {}
+            self.connections = {'opened': 0, 'time': 0.0}
+            self.statements = {'count': 0, 'time': 0.0, 'rows': 0}
+            self.slow_queries = collections.deque(maxlen=self.slow_query_log_size)
+
+    def get_stack(self):
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    # Instrument
+    def instrument(self, data):
+        """
+        Collect stats of data object (EveData or AssetData): wrap its public methods and connection pool
+        """
+
+        self.instrument_pool(data.connection)
+
+        class_name = data.__class__.__name__
+        for name, method in inspect.getmembers(data, inspect.ismethod):
+            if name.startswith('_'):
+                continue
+
+            setattr(data, name, self.wrap_method('{0}.{1}'.format(class_name, name), method))
+
+    def instrument_pool(self, pool):
+        """
+        Profile connections opened by the pool
+        """
+
+        # Write-behind pool runs statements on another pool
+        if hasattr(pool, 'pool'):
+            self.instrument_pool(pool.pool)
+            return
+
+        # Replica pool reads from one pool and writes to another
+        if hasattr(pool, 'primary'):
+            self.instrument_pool(pool.primary)
+            self.instrument_pool(pool.replica)
+            return
+
+        if getattr(pool, 'profiler', None):
+            return
+
+        pool.profiler = self
+        pool.open = self.wrap_open(pool.open)
+
+    def wrap_open(self, open_connection):
+
+        def open_profiled():
+
+            start = time.time()
+            connection = open_connection()
+            duration = time.time() - start
+
+            with self._lock:
+                self.connections['opened'] += 1
+                self.connections['time'] += duration
+
+            return ProfiledConnection(connection, self)
+
+        return open_profiled
+
+    def wrap_method(self, name, method):
+
+        def run_profiled(*args, **kwargs):
+
+            stack = self.get_stack()
+            record = {'name': name, 'statements': 0, 'statement_time': 0.0, 'rows': 0}
+            stack.append(record)
+
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                duration = time.time() - start
+                stack.pop()
+                self.add_call(name, duration, record)
+
+        run_profiled.__name__ = method.__name__
+        run_profiled.__doc__ = method.__doc__
+
+        return run_profiled
+
+    # Record
+    def add_call(self, name, duration, record):
+
+        with self._lock:
+            stats = self.methods.get(name)
+            if stats is None:
+                stats = self.methods[name] = {'calls': 0, 'time': 0.0, 'max_time': 0.0,
+                                              'statements': 0, 'statement_time': 0.0, 'rows': 0}
+
+            stats['calls'] += 1
+            stats['time'] += duration
+            stats['max_time'] = max(stats['max_time'], duration)
+            for key in ['statements', 'statement_time', 'rows']:
+                stats[key] += record[key]
+
+    def add_statement(self, connection, sql, parameters, duration):
+        """
+        Record executed statement, log it if it is slow
+
+        :return: statement record, cursor adds rows fetched later
+        """
+
+        stack = self.get_stack()
+        statement = {'sql': sql,
+                     'parameters': parameters,
+                     'time': duration,
+                     'rows': 0,
+                     'methods': list(stack),
+                     'connection': connection,
+                     'logged': None}
+
+        for record in stack:
+            record['statements'] += 1
+            record['statement_time'] += duration
+
+        with self._lock:
+            self.statements['count'] += 1
+            self.statements['time'] += duration
+
+        self.check_slow(statement)
+
+        return statement
+
+    def add_rows(self, statement, count, duration):
+
+        statement['rows'] += count
+        statement['time'] += duration
+
+        for record in statement['methods']:
+            record['rows'] += count
+            record['statement_time'] += duration
+
+        with self._lock:
+            self.statements['rows'] += count
+            self.statements['time'] += duration
+
+        if statement['logged']:
+            statement['logged']['time'] = statement['time']
+            statement['logged']['rows'] = statement['rows']
+        else:
+            self.check_slow(statement)
+
+    def check_slow(self, statement):
+        """
+        Add statement to slow query log when it runs longer than slow_query_time
+        """
+
+        if statement['logged'] or statement['time'] < self.slow_query_time:
+            return
+
+        entry = {'sql': statement['sql'],
+                 'parameters': get_logged_parameters(statement['parameters']),
+                 'time': statement['time'],
+                 'rows': statement['rows'],
+                 'method': statement['methods'][-1]['name'] if statement['methods'] else None,
+                 'at': datetime.datetime.now().isoformat(),
+                 'plan': self.explain(statement['connection'], statement['sql'], statement['parameters'])}
+
+        statement['logged'] = entry
+
+        with self._lock:
+            self.slow_queries.append(entry)
+
+    def explain(self, connection, sql, parameters):
+        """
+        Get EXPLAIN QUERY PLAN output of a statement
+
+        :return: list of plan lines or None
+        """
+
+        if not sql.strip().upper().startswith(EXPLAINED):
+            return
+
+        # executemany parameters: explain the first set
+        if isinstance(parameters, list) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+            parameters = parameters[0]
+
+        try:
+            cursor = connection.connection.cursor()
+            cursor.execute('EXPLAIN QUERY PLAN {0}'.format(sql), parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        except sqlite3.Error as error:
+            return ['EXPLAIN failed: {0}'.format(error)]
+
+    # Report
+    def get_stats(self):
+        """
+        Get collected stats as a dictionary
+        """
+
+        with self._lock:
+            methods = {}
+            for name, stats in self.methods.items():
+                methods[name] = dict(stats)
+                methods[name]['average_time'] = stats['time'] / stats['calls']
+
+            return {'started_at': self.started_at.isoformat(),
+                    'exported_at': datetime.datetime.now().isoformat(),
+                    'slow_query_time': self.slow_query_time,
+                    'connections': dict(self.connections),
+                    'statements': dict(self.statements),
+                    'methods': methods,
+                    'slow_queries': [dict(entry) for entry in self.slow_queries]}
+
+    def export(self, file_path):
+        """
+        Save collected stats to JSON file
+        """
+
+        with open(file_path, 'w') as json_file:
+            json.dump(self.get_stats(), json_file, indent=4, sort_keys=True, default=str)
+
+    def report(self, count=20):
+        """
+        Print slowest methods by total time
+        """
+
+        stats = self.get_stats()
+        methods = sorted(stats['methods'].items(), key=lambda item: item[1]['time'], reverse=True)
+
+        print '>> Eve database stats since {0}:'.format(stats['started_at'])
+        print '   {0} connections opened in {1:.3f}s, {2} statements in {3:.3f}s, {4} rows'.format(
+            stats['connections']['opened'], stats['connections']['time'],
+            stats['statements']['count'], stats['statements']['time'], stats['statements']['rows'])
+
+        for name, method_stats in methods[:count]:
+            print '   {0}: {1} calls, {2:.3f}s, {3} statements, {4} rows'.format(
+                name, method_stats['calls'], method_stats['time'], method_stats['statements'], method_stats['rows'])
+
+        print '   {0} slow queries'.format(len(stats['slow_queries']))
+
+
+def get_logged_parameters(parameters):
+    """
+    Make statement parameters short enough for the log
+    """
+
+    if isinstance(parameters, list) and len(parameters) > 10:
+        return parameters[:10] + ['... {0} more'.format(len(parameters) - 10)]
+
+    return parameters
+
+
+# Stats of all EveData and AssetData instances of the process
+PROFILER = Profiler()
+
+
+def instrument(data):
+    """
+    Collect stats of data object in shared PROFILER
+    """
+
+    PROFILER.instrument(data)
@@ -0,0 +1,275 @@
+"""
+Schema driven SELECT queries for Eve entities (and UPDATE statements of changed columns, see get_update_sql)
+
+Entity classes declare their table and columns (see entities.py). Query composes filters, ordering,
+projection and limits into one parameterized statement:
+
+    # Entities
+    assets = Query(entities.Asset).filter('project', project.id).filter('type', 2).order_by('name').all(cursor)
+
+    # Projection, rows are tuples of selected columns
+    rows = Query(entities.Asset).select('id', 'name').filter_prefix('name', 'chair').limit(50).rows(cursor)
+
+    # Partial entities with id and name only, for lists in UI
+    assets = Query(entities.Asset).filter('project', project.id).partial(cursor)
+
+    # Subquery
+    sequence_ids = Query(entities.Sequence).select('id').filter('project', project.id)
+    shots = Query(entities.Shot).filter('sequence', sequence_ids, 'IN').all(cursor)
+
+Statement text depends only on the query shape (columns, filter columns and operators, ordering),
+values are always passed as parameters. Statements are built once per shape and cached,
+sqlite3 also reuses compiled statements for repeated SQL text (see settings.SQL_CACHED_STATEMENTS).
+"""
+
+
+import sys
+
+import entities
+
+
+OPERATORS = ['=', '!=', '<', '<=', '>', '>=', 'IN']
+
+CONVERTERS = {
+    entities.Project: entities.Converter.convert_to_project,
+    entities.Asset: entities.Converter.convert_to_asset,
+    entities.Sequence: entities.Converter.convert_to_sequence,
+    entities.Shot: entities.Converter.convert_to_shot,
+    entities.AssetType: entities.Converter.convert_to_asset_types}
+
+# Statements by query shape
+_statements = {}
+
+
+def get_update_sql(table, columns):
+    """
+    Get UPDATE statement of the row with :id parameter, which sets listed columns from parameters of the same names
+
+    :param table: string, table name
+    :param columns: list of changed columns
+    """
+
+    shape = ('UPDATE', table, tuple(columns))
+
+    sql = _statements.get(shape)
+    if sql:
+        return sql
+
+    sql = 'UPDATE {0} SET {1} WHERE id=:id'.format(table, ', '.join(['{0}=:{0}'.format(column) for column in columns]))
+    _statements[shape] = sql
+
+    return sql
+
+
+class Query:
+    def __init__(self, entity_class):
+        """
+        :param entity_class: entity class with table and columns attributes (e.g. entities.Asset)
+        """
+
+        self.entity_class = entity_class
+
+        self.columns = list(entity_class.columns)
+        self.conditions = []  # [(column, operator, number of values or subquery SQL)]
+        self.parameters = []
+        self.ordering = []  # [(column, 'ASC' or 'DESC')]
+        self.limit_count = None
+        self.offset_count = None
+
+    def check_column(self, column):
+
+        if column not in self.entity_class.columns:
+            raise ValueError('Table "{0}" has no column "{1}"'.format(self.entity_class.table, column))
+
+    # Compose
+    def select(self, *columns):
+        """
+        Read only listed columns. Use rows() to get results of such query.
+        """
+
+        for column in columns:
+            self.check_column(column)
+
+        self.columns = list(columns)
+
+        return self
+
+    def filter(self, column, value, operator='='):
+        """
+        Add condition "column operator value", conditions are joined with AND
+
+        :param column: string, column name
+        :param value: value to compare with. For IN operator: list of values or Query selecting one column
+        :param operator: string, one of OPERATORS
+        """
+
+        self.check_column(column)
+
+        operator = operator.upper()
+        if operator not in OPERATORS:
+            raise ValueError('Unsupported operator "{0}"'.format(operator))
+
+        if operator != 'IN':
+            self.conditions.append((column, operator, 1))
+            self.parameters.append(value)
+        elif isinstance(value, Query):
+            self.conditions.append((column, operator, value.get_sql()))
+            self.parameters.extend(value.get_parameters())
+        else:
+            values = list(value)
+            self.conditions.append((column, operator, len(values)))
+            self.parameters.extend(values)
+
+        return self
+
+    def filter_prefix(self, column, prefix):
+        """
+        Add condition "column value starts with prefix". Empty prefix does not filter.
+
+        Uses range condition instead of LIKE, so SQLite can search the column index.
+        Byte string prefix is decoded from UTF-8.
+        """
+
+        if not prefix:
+            return self
+
+        if isinstance(prefix, str):
+            prefix = prefix.decode('utf-8')
+
+        self.filter(column, prefix, '>=')
+
+        # Strings with the prefix are below the prefix with its last character incremented.
+        # There is no next character after the largest one, such prefix has no upper bound.
+        if ord(prefix[-1]) < sys.maxunicode:
+            self.filter(column, prefix[:-1] + unichr(ord(prefix[-1]) + 1), '<')
+
+        return self
+
+    def order_by(self, *columns):
+        """
+        Sort results by columns, "-name" sorts in descending order
+        """
+
+        for column in columns:
+            if column.startswith('-'):
+                self.check_column(column[1:])
+                self.ordering.append((column[1:], 'DESC'))
+            else:
+                self.check_column(column)
+                self.ordering.append((column, 'ASC'))
+
+        return self
+
+    def limit(self, count, offset=None):
+
+        self.limit_count = count
+        self.offset_count = offset
+
+        return self
+
+    # Build
+    def get_sql(self):
+        """
+        Get statement text of the query
+        """
+
+        shape = (self.entity_class.table,
+                 tuple(self.columns),
+                 tuple(self.conditions),
+                 tuple(self.ordering),
+                 self.limit_count is not None,
+                 self.offset_count is not None)
+
+        sql = _statements.get(shape)
+        if sql:
+            return sql
+
+        sql = 'SELECT {0} FROM {1}'.format(', '.join(self.columns), self.entity_class.table)
+
+        if self.conditions:
+            conditions = []
+            for column, operator, values in self.conditions:
+                if operator != 'IN':
+                    conditions.append('{0}{1}?'.format(column, operator))
+                elif isinstance(values, int):
+                    conditions.append('{0} IN ({1})'.format(column, ','.join('?' * values)))
+                else:
+                    conditions.append('{0} IN ({1})'.format(column, values))
+
+            sql += ' WHERE ' + ' AND '.join(conditions)
+
+        if self.ordering:
+            sql += ' ORDER BY ' + ', '.join(['{0} {1}'.format(column, order) for column, order in self.ordering])
+
+        if self.limit_count is not None:
+            sql += ' LIMIT ?'
+            if self.offset_count is not None:
+                sql += ' OFFSET ?'
+
+        _statements[shape] = sql
+
+        return sql
+
+    def get_parameters(self):
+
+        parameters = list(self.parameters)
+
+        if self.limit_count is not None:
+            parameters.append(self.limit_count)
+            if self.offset_count is not None:
+                parameters.append(self.offset_count)
+
+        return parameters
+
+    # Run
+    def execute(self, cursor):
+
+        cursor.execute(self.get_sql(), self.get_parameters())
+
+        return cursor
+
+    def rows(self, cursor):
+        """
+        Get result rows as tuples of selected columns
+        """
+
+        return self.execute(cursor).fetchall()
+
+    def all(self, cursor):
+        """
+        Get result rows as entity objects
+        """
+
+        if self.columns != list(self.entity_class.columns):
+            raise ValueError('Query with selected columns returns rows, not entities')
+
+        return CONVERTERS[self.entity_class](self.rows(cursor))
+
+    def partial(self, cursor):
+        """
+        Get result rows as partial entities with entities.LIST_COLUMNS only
+        """
+
+        columns = self.columns
+        self.columns = list(entities.LIST_COLUMNS)
+        try:
+            rows = self.rows(cursor)
+        finally:
+            self.columns = columns
+
+        from_list_row = self.entity_class.from_list_row
+
+        return [from_list_row(row) for row in rows]
+
+    def first(self, cursor):
+        """
+        Get first entity of the result or None
+        """
+
+        if self.limit_count is None:
+            self.limit(1)
+
+        entity_objects = self.all(cursor)
+
+        if entity_objects:
+            return entity_objects[0]
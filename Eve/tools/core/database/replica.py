@@ -0,0 +1,248 @@
+"""
+Local read replica of Eve database for render farm nodes
+
+Farm jobs start at the same time and all of them read eve.db from the network share, so they queue on the file lock.
+ReplicaPool copies the database to a local file once and reads from the copy, writes still go to the primary database.
+
+Freshness check is cheap: replica is fresh while PRAGMA data_version of the primary connection does not change,
+otherwise revision of the primary (schema version and change feed revision, see migrations.add_change_tracking)
+is compared with the revision of the copy. Stale replica is copied again to a temporary file
+which replaces the replica file, so readers never see a half written copy.
+
+ReplicaPool has the same interface as connection.ConnectionPool:
+    pool = connection.get_pool(SQL_FILE_PATH, replica_path=settings.SQL_REPLICA_PATH)
+    cursor = pool.cursor()  # Read from replica
+    with pool.transaction() as cursor:  # Write to primary
+        ...
+
+After own writes replica is stale, so reads go to the primary database until the next freshness check
+refreshes the copy (read your own writes). Own commits do not change data_version of the primary connection,
+so the check after own writes compares revisions.
+"""
+
+
+import os
+import time
+import sqlite3
+import threading
+import contextlib
+
+from core import settings
+import connection
+
+
+def get_revision(cursor):
+    """
+    Get database revision: (schema version, last change feed revision)
+    """
+
+    cursor.execute('PRAGMA user_version')
+    version = cursor.fetchone()[0]
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE name='sqlite_sequence'")
+    if not cursor.fetchone():
+        return version, 0
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'")
+    revision = cursor.fetchone()
+
+    return version, revision[0] if revision else 0
+
+
+def copy_database(source_path, destination_path):
+    """
+    Make consistent copy of the database file while other clients work with it
+    """
+
+    source = sqlite3.connect(source_path)
+
+    try:
+        if hasattr(source, 'backup'):
+            # Online backup API (Python 3.7+)
+            destination = sqlite3.connect(destination_path)
+            source.backup(destination)
+            destination.close()
+        elif sqlite3.sqlite_version_info >= (3, 27, 0):
+            # Python 2 module has no backup API, VACUUM INTO makes the same consistent copy
+            source.execute('VACUUM INTO ?', (destination_path,))
+        else:
+            destination = sqlite3.connect(destination_path)
+            source.execute('BEGIN')  # Dump one snapshot
+            destination.executescript('\n'.join(source.iterdump()))
+            source.execute('COMMIT')
+            destination.close()
+    finally:
+        source.close()
+
+
+def replace_file(source_path, destination_path):
+    """
+    Replace destination file with source file
+    """
+
+    if hasattr(os, 'replace'):
+        os.replace(source_path, destination_path)
+        return
+
+    # Python 2 os.rename does not overwrite files on Windows
+    if os.name == 'nt' and os.path.exists(destination_path):
+        os.remove(destination_path)
+
+    os.rename(source_path, destination_path)
+
+
+class ReplicaPool:
+    def __init__(self, SQL_FILE_PATH, replica_path, check_interval=settings.REPLICA_CHECK_INTERVAL):
+        """
+        :param SQL_FILE_PATH: string, path to primary eve.db
+        :param replica_path: string, path to local copy
+        :param check_interval: int, seconds between freshness checks
+        """
+
+        self.SQL_FILE_PATH = SQL_FILE_PATH
+        self.replica_path = replica_path
+        self.check_interval = check_interval
+
+        self.primary = connection.ConnectionPool(SQL_FILE_PATH)
+        self.replica = connection.ConnectionPool(replica_path, settings.SQL_REPLICA_PRAGMAS)
+
+        self.listeners = []  # Functions called when replica file was refreshed
+
+        self.stale = True  # Read from primary database
+        self.checked_at = None
+        self._data_version = None  # (primary connection, PRAGMA data_version) at last check
+        self._lock = threading.RLock()
+
+    def is_fresh(self):
+        """
+        Check if replica has the same data as primary database
+        """
+
+        data_version = self.primary.get_data_version()
+        if data_version == self._data_version:
+            return True
+
+        if not os.path.exists(self.replica_path):
+            return False
+
+        replica_revision = get_revision(self.replica.cursor())
+        primary_revision = get_revision(self.primary.cursor())
+        fresh = replica_revision == primary_revision
+
+        if fresh:
+            self._data_version = data_version
+
+        return fresh
+
+    def refresh(self):
+        """
+        Copy primary database to replica file
+        """
+
+        data_version = self.primary.get_data_version()
+        temp_path = '{0}.{1}.tmp'.format(self.replica_path, os.getpid())
+
+        folder = os.path.dirname(self.replica_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        copy_database(self.SQL_FILE_PATH, temp_path)
+
+        # Replica is a plain read only file, journal files of WAL mode could be left from the previous copy
+        copy = sqlite3.connect(temp_path)
+        copy.execute('PRAGMA journal_mode=DELETE')
+        copy.close()
+
+        self.replica.close()
+
+        try:
+            replace_file(temp_path, self.replica_path)
+        except OSError:
+            # Replica file is open by another job (Windows), keep reading primary database
+            os.remove(temp_path)
+            print '>> Eve replica {0} is in use, reading primary database'.format(self.replica_path)
+            return False
+
+        self._data_version = data_version
+
+        for listener in self.listeners:
+            listener()
+
+        return True
+
+    def update(self):
+        """
+        Refresh replica if it is outdated, check not more often than check_interval
+        """
+
+        with self._lock:
+            if self.checked_at is not None and time.time() - self.checked_at < self.check_interval:
+                return
+
+            self.checked_at = time.time()
+
+            if self.is_fresh():
+                self.stale = False
+            else:
+                self.stale = not self.refresh()
+
+    def get(self):
+        """
+        Get connection of the current thread for reading
+        """
+
+        self.update()
+
+        if self.stale:
+            return self.primary.get()
+
+        return self.replica.get()
+
+    def cursor(self):
+
+        return self.get().cursor()
+
+    def get_data_version(self):
+
+        read_connection = self.get()
+
+        return read_connection, read_connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def add_commit_listener(self, get_revision, listener):
+
+        self.primary.add_commit_listener(get_revision, listener)
+
+    def transaction(self, mode='IMMEDIATE'):
+        """
+        Write transaction on primary database. DEFERRED transactions only read, so they run on current read database.
+        """
+
+        if mode == 'DEFERRED':
+            self.update()
+            if not self.stale:
+                return self.replica.transaction(mode)
+
+            return self.primary.transaction(mode)
+
+        return self._write_transaction(mode)
+
+    @contextlib.contextmanager
+    def _write_transaction(self, mode):
+        """
+        Write to primary database, replica does not have our changes until next refresh
+        """
+
+        self.stale = True
+
+        try:
+            with self.primary.transaction(mode) as cursor:
+                yield cursor
+        finally:
+            with self._lock:
+                self.stale = True
+                self._data_version = None
+
+    def close(self):
+
+        self.primary.close()
+        self.replica.close()
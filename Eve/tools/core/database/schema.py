@@ -0,0 +1,168 @@
+"""
+Eve database schema
+
+Tables and type records of a new eve.db. Project Manager creates the database with these functions,
+core/database/generator.py builds synthetic databases for benchmarks with the same schema.
+Later schema changes are applied by migrations.py.
+"""
+
+
+import entities
+
+
+def init_database(connection, cursor):
+    """
+    Create database tables
+    :return:
+    """
+
+    # TYPES
+    cursor.execute('''CREATE TABLE asset_types (
+                    id integer primary key autoincrement,
+                    name text,
+                    description text
+                    )''')
+
+    cursor.execute('''CREATE TABLE file_types (
+                    id integer primary key autoincrement,
+                    name text,
+                    description text
+                    )''')
+
+    # MAIN ITEMS
+    cursor.execute('''CREATE TABLE projects (
+                    id integer primary key autoincrement,
+                    name text,
+                    houdini_build text,
+                    width integer,
+                    height integer,
+                    description text
+                    )''')
+
+    cursor.execute('''CREATE TABLE assets (
+                    id integer primary key autoincrement,
+                    name text,
+                    project integer,
+                    type integer,
+                    description text,
+                    FOREIGN KEY(project) REFERENCES projects(id)
+                    FOREIGN KEY(type) REFERENCES asset_types(id)
+                    )''')
+
+    cursor.execute('''CREATE TABLE sequences (
+                    id integer primary key autoincrement,
+                    name text,
+                    project integer,
+                    description text,
+                    FOREIGN KEY(project) REFERENCES projects(id)
+                    )''')
+
+    cursor.execute('''CREATE TABLE shots (
+                    id integer primary key autoincrement,
+                    name text,
+                    sequence integer,
+                    start_frame integer,
+                    end_frame integer,
+                    width integer, 
+                    height integer,
+                    description text,
+                    FOREIGN KEY(sequence) REFERENCES sequences(id)
+                    )''')
+
+    # FILES
+    cursor.execute('''CREATE TABLE asset_files (
+                    id integer primary key autoincrement,
+                    type integer,
+                    asset integer,
+                    snapshot integer,
+                    description text,
+                    FOREIGN KEY(type) REFERENCES file_types(id)
+                    FOREIGN KEY(asset) REFERENCES assets(id)
+                    FOREIGN KEY(snapshot) REFERENCES asset_snapshots(id)
+                    )''')
+
+    cursor.execute('''CREATE TABLE shot_files (
+                    id integer primary key autoincrement,
+                    type integer,
+                    shot integer,
+                    snapshot integer,
+                    description text,
+                    FOREIGN KEY(type) REFERENCES file_types(id)
+                    FOREIGN KEY(shot) REFERENCES shots(id)
+                    FOREIGN KEY(snapshot) REFERENCES shot_snapshots(id)
+                    )''')
+
+    # LINKS
+    # Link assets to the shots
+    cursor.execute('''CREATE TABLE shot_assets (
+                    id integer primary key autoincrement,
+                    shot_id integer,
+                    asset_id integer,
+                    FOREIGN KEY(shot_id) REFERENCES shots(id)
+                    FOREIGN KEY(asset_id) REFERENCES assets(id)
+                    )''')
+
+    # SNAPSHOTS
+    cursor.execute('''CREATE TABLE asset_snapshot (
+                    id integer primary key autoincrement,
+                    asset_name text,
+                    asset_id text,
+                    asset_version text,
+                    description text
+                    )''')
+
+    connection.commit()
+
+
+def init_asset_types(connection, cursor):
+    """
+    Fill asset types table in the DB (character, environment, prop, FX)
+
+    :param connection:
+    :param cursor:
+    :return:
+    """
+
+    for name, data in entities.Asset.asset_types.iteritems():
+        cursor.execute("INSERT INTO asset_types VALUES ("
+                       ":id,"
+                       ":name,"
+                       ":description)",
+
+                       {'id': data['id'],
+                        'name': name,
+                        'description': data['description']})
+
+    connection.commit()
+
+
+def init_file_types(connection, cursor):
+    """
+    Fill file types table in the DB.
+
+    Any file used in Eve should has a particular type. Here is the full list of all possible types in Eve.
+
+    asset_hip:
+        Working scene for Assets. Here we store all source data to build an asset. Results are exported as caches,
+        and caches used in asset_hda files.
+
+    asset_hda:
+        Houdini Digital Asset for ASSETS. Used to load assets of any type (char, env, props, fx) into shots.
+        Contain cached data with interface. Source of cached data is stored in asset_hip
+
+    :param connection:
+    :param cursor:
+    :return:
+    """
+
+    for name, data in entities.EveFile.file_types.iteritems():
+        cursor.execute("INSERT INTO file_types VALUES ("
+                       ":id,"
+                       ":name,"
+                       ":description)",
+
+                       {'id': data['id'],
+                        'name': name,
+                        'description': data['description']})
+
+    connection.commit()
@@ -0,0 +1,476 @@
+"""
+Eve data service
+
+Concurrent writers on one SQLite file over network share wait on each other's file locks. Eve data service runs
+on any machine, owns eve.db on its local disk and serializes writes of all clients (Project Manager, Houdini tools).
+
+Clients talk to the service over TCP with JSON lines, each request is one SQL statement:
+    {"sql": "SELECT * FROM projects WHERE id=:id", "parameters": {"id": 1}}
+    {"sql": "INSERT INTO ...", "parameters": [{...}, {...}], "many": true}
+    {"data_version": true}
+    {"schema_version": true}
+Response:
+    {"rows": [[...], ...], "lastrowid": 1, "rowcount": 1} or {"error": "IntegrityError", "message": "..."}
+
+The service has no authentication, it listens on localhost unless other address is given.
+Only data statements (STATEMENTS) and transaction control are accepted: schema changes, ATTACH and PRAGMA
+are rejected, the service upgrades the database itself at startup. Reads run on query only connections.
+
+Reads of each client use a separate connection, so they do not wait for writers.
+Write transactions (BEGIN IMMEDIATE ... COMMIT) of all clients run one by one on a single writer connection,
+each as a savepoint of a shared batch transaction. The batch is committed when no other client waits for
+write access or when it has SERVICE_BATCH_SIZE transactions. Client receives COMMIT response after the batch
+is committed, so failed batch is reported to each client of the batch.
+
+EveData and AssetData work through the service when settings.SERVICE_ADDRESS is set, with ServicePool
+in place of connection.ConnectionPool.
+
+Run the service:
+    python service.py [host:port]
+"""
+
+
+import json
+import socket
+import sqlite3
+import threading
+import SocketServer
+
+from core import settings
+import connection
+import migrations
+
+
+# Statements accepted from clients
+STATEMENTS = ['SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE']
+# Transaction control statements
+TRANSACTION_STATEMENTS = ['BEGIN', 'COMMIT', 'END', 'ROLLBACK', 'SAVEPOINT', 'RELEASE']
+
+
+def parse_address(address):
+    """
+    Convert "host:port" string to (host, port) tuple
+    """
+
+    host, port = address.rsplit(':', 1)
+
+    return host, int(port)
+
+
+def send_message(stream, message):
+
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+
+    line = stream.readline()
+    if not line:
+        return
+
+    return json.loads(line.decode('utf-8'))
+
+
+def get_statement_type(sql):
+    """
+    Get first keyword of SQL statement (upper case)
+    """
+
+    words = sql.split(None, 1)
+    if not words:
+        return ''
+
+    return words[0].split('(', 1)[0].upper()
+
+
+# Server
+class WriteBatch:
+    def __init__(self, writer, batch_size):
+        """
+        Serialize write transactions of service sessions and commit them in batches
+
+        :param writer: sqlite3 connection used for all writes
+        :param batch_size: int, maximum number of transactions in one batch
+        """
+
+        self.writer = writer
+        self.batch_size = batch_size
+
+        self.sessions = []  # Connected sessions
+        self.owner = None  # Session running write transaction
+        self.waiting = 0  # Number of sessions waiting for write access
+        self.writers = set()  # Sessions with transactions in current batch
+        self.is_open = False  # Batch transaction started
+
+        self.batch = 0
+        self.errors = {}  # {batch: error} of failed batches
+        self.data_version = writer.execute('PRAGMA data_version').fetchone()[0]  # Changes by other processes
+
+        self.condition = threading.Condition()
+
+    def get_data_version(self, session):
+        """
+        Data version of the session: changes when other sessions (or processes) commit
+        """
+
+        with self.condition:
+            if not self.is_open and self.owner is None:
+                self.data_version = self.writer.execute('PRAGMA data_version').fetchone()[0]
+
+            return [self.data_version, session.others_version]
+
+    def begin(self, session):
+        """
+        Wait for write access and start session transaction
+        """
+
+        with self.condition:
+            self.waiting += 1
+            while self.owner is not None:
+                self.condition.wait()
+            self.waiting -= 1
+
+            self.owner = session
+
+            try:
+                if not self.is_open:
+                    self.writer.execute('BEGIN IMMEDIATE')
+                    self.is_open = True
+                self.writer.execute('SAVEPOINT session')
+            except sqlite3.Error:
+                self.owner = None
+                self.condition.notify_all()
+                raise
+
+    def commit(self, session):
+        """
+        Add session transaction to the batch, return when the batch is committed
+        """
+
+        try:
+            self.writer.execute('RELEASE session')
+        except sqlite3.Error as error:
+            self.rollback(session)
+            raise error
+
+        with self.condition:
+            self.owner = None
+            self.writers.add(session)
+            batch = self.batch
+
+            if self.waiting and len(self.writers) < self.batch_size:
+                # Let next session write into the same batch
+                self.condition.notify_all()
+                while self.batch == batch:
+                    self.condition.wait()
+            else:
+                self.finish()
+
+            error = self.errors.get(batch)
+
+        if error:
+            raise error
+
+    def rollback(self, session):
+        """
+        Discard session transaction
+        """
+
+        try:
+            self.writer.execute('ROLLBACK TO session')
+            self.writer.execute('RELEASE session')
+        finally:
+            # Release write access even if the savepoint is gone (e.g. SQLite rolled back the whole batch)
+            with self.condition:
+                self.owner = None
+
+                try:
+                    if not self.waiting:
+                        self.finish()
+                finally:
+                    self.condition.notify_all()
+
+    def finish(self):
+        """
+        Commit current batch. Called with locked condition.
+        """
+
+        try:
+            if self.is_open:
+                try:
+                    self.writer.execute('COMMIT')
+                except sqlite3.Error as error:
+                    self.errors[self.batch] = error
+                    connection.rollback(self.writer)
+
+            # Sessions see changes made by others
+            if self.writers:
+                for session in self.sessions:
+                    if self.writers - set([session]):
+                        session.others_version += 1
+        finally:
+            # Sessions waiting for the batch are always released
+            self.is_open = False
+            self.errors.pop(self.batch - self.batch_size, None)
+            self.writers = set()
+            self.batch += 1
+            self.condition.notify_all()
+
+
+class Session(SocketServer.StreamRequestHandler):
+    """
+    Connection of one client
+    """
+
+    def setup(self):
+        SocketServer.StreamRequestHandler.setup(self)
+
+        # Writes go through the shared writer connection only
+        self.reader = connection.ConnectionPool(self.server.SQL_FILE_PATH,
+                                                settings.SQL_PRAGMAS + [('query_only', 1)]).open()
+        self.is_writing = False
+        self.others_version = 0
+
+        with self.server.write_batch.condition:
+            self.server.write_batch.sessions.append(self)
+
+    def handle(self):
+
+        while True:
+            try:
+                request = receive_message(self.rfile)
+            except socket.error:  # Client disconnected
+                return
+
+            if request is None:
+                return
+
+            try:
+                response = self.run_request(request)
+            except Exception as error:
+                response = {'error': type(error).__name__,
+                            'message': str(error)}
+
+            send_message(self.wfile, response)
+
+    def finish(self):
+
+        write_batch = self.server.write_batch
+
+        # Client disconnected in the middle of transaction
+        if self.is_writing:
+            self.is_writing = False
+            write_batch.rollback(self)
+
+        with write_batch.condition:
+            write_batch.sessions.remove(self)
+
+        self.reader.close()
+        SocketServer.StreamRequestHandler.finish(self)
+
+    def run_request(self, request):
+
+        write_batch = self.server.write_batch
+
+        if request.get('data_version'):
+            return {'data_version': write_batch.get_data_version(self)}
+
+        if request.get('schema_version'):
+            return {'schema_version': migrations.get_version(self.reader.cursor())}
+
+        sql = request['sql']
+        statement = sql.strip().upper()
+        statement_type = get_statement_type(statement)
+
+        if statement_type not in STATEMENTS and statement_type not in TRANSACTION_STATEMENTS:
+            raise sqlite3.OperationalError('Statement is not allowed by Eve data service: {0}'.format(sql))
+
+        # Transaction control
+        if statement.startswith('BEGIN') and not statement.endswith('DEFERRED'):
+            write_batch.begin(self)
+            self.is_writing = True
+            return {'rows': []}
+
+        if self.is_writing and statement in ('COMMIT', 'END'):
+            self.is_writing = False
+            write_batch.commit(self)
+            return {'rows': []}
+
+        if self.is_writing and statement == 'ROLLBACK':
+            self.is_writing = False
+            write_batch.rollback(self)
+            return {'rows': []}
+
+        # Statements of write transaction see its uncommitted changes
+        if self.is_writing:
+            cursor = write_batch.writer.cursor()
+        else:
+            cursor = self.reader.cursor()
+
+        if request.get('many'):
+            cursor.executemany(sql, request['parameters'])
+        else:
+            cursor.execute(sql, request.get('parameters', ()))
+
+        return {'rows': cursor.fetchall(),
+                'lastrowid': cursor.lastrowid,
+                'rowcount': cursor.rowcount}
+
+
+class EveService(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, SQL_FILE_PATH, address, batch_size=settings.SERVICE_BATCH_SIZE):
+        SocketServer.ThreadingTCPServer.__init__(self, address, Session)
+
+        self.SQL_FILE_PATH = SQL_FILE_PATH
+
+        # Service owns the database file, clients find it upgraded
+        pool = connection.ConnectionPool(SQL_FILE_PATH)
+        migrations.migrate(pool)
+        pool.close()
+
+        writer = connection.ConnectionPool(SQL_FILE_PATH).open()
+        self.write_batch = WriteBatch(writer, batch_size)
+
+
+def run_service(SQL_FILE_PATH, address):
+
+    service = EveService(SQL_FILE_PATH, address)
+    print '>> Eve data service is running on {0}:{1}'.format(*service.server_address)
+
+    service.serve_forever()
+
+
+# Client
+class ServiceCursor:
+    def __init__(self, service_connection):
+        self.connection = service_connection
+
+        self.rows = []
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def run(self, request):
+
+        response = self.connection.request(request)
+
+        self.rows = [tuple(row) for row in response['rows']]
+        self.rows.reverse()  # Fetch from the end
+        self.lastrowid = response.get('lastrowid')
+        self.rowcount = response.get('rowcount', -1)
+
+        return self
+
+    def execute(self, sql, parameters=()):
+
+        return self.run({'sql': sql, 'parameters': parameters})
+
+    def executemany(self, sql, parameters):
+
+        return self.run({'sql': sql, 'parameters': list(parameters), 'many': True})
+
+    def fetchone(self):
+
+        if self.rows:
+            return self.rows.pop()
+
+    def fetchall(self):
+
+        rows = self.rows[::-1]
+        self.rows = []
+
+        return rows
+
+    def __iter__(self):
+
+        return iter(self.fetchall())
+
+
+class ServiceConnection:
+    def __init__(self, address):
+
+        self.socket = socket.create_connection(address)
+        self.stream = self.socket.makefile('rwb')
+        self._lock = threading.Lock()
+
+    def request(self, request):
+        """
+        Send request to the service and return response, raise sqlite3 errors reported by the service
+        """
+
+        with self._lock:
+            send_message(self.stream, request)
+            response = receive_message(self.stream)
+
+        if response is None:
+            raise sqlite3.OperationalError('Eve data service closed connection')
+
+        if 'error' in response:
+            error = getattr(sqlite3, response['error'], sqlite3.DatabaseError)
+            if not isinstance(error, type) or not issubclass(error, Exception):
+                error = sqlite3.DatabaseError
+            raise error(response['message'])
+
+        return response
+
+    def cursor(self):
+
+        return ServiceCursor(self)
+
+    def execute(self, sql, parameters=()):
+
+        return self.cursor().execute(sql, parameters)
+
+    def close(self):
+
+        self.stream.close()
+        self.socket.close()
+
+
+class ServicePool(connection.ConnectionPool):
+    def __init__(self, address):
+        """
+        Connection pool working through Eve data service
+
+        :param address: string "host:port" or (host, port) tuple
+        """
+
+        if isinstance(address, basestring):
+            address = parse_address(address)
+
+        connection.ConnectionPool.__init__(self, None, pragmas=[])
+        self.address = address
+
+    def open(self):
+
+        return ServiceConnection(self.address)
+
+    def get_data_version(self):
+
+        service_connection = self.get()
+
+        return service_connection, service_connection.request({'data_version': True})['data_version']
+
+    def get_schema_version(self):
+        """
+        Schema version of the database (service rejects PRAGMA statements)
+        """
+
+        return self.get().request({'schema_version': True})['schema_version']
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    SQL_FILE_PATH = settings.SQL_FILE_PATH.format(os.environ['EVE_ROOT'])
+
+    if len(sys.argv) > 1:
+        address = parse_address(sys.argv[1])
+    else:
+        address = (settings.SERVICE_HOST, settings.SERVICE_PORT)
+
+    run_service(SQL_FILE_PATH, address)
@@ -0,0 +1,317 @@
+"""
+Write-behind queue of Eve database edits
+
+Each EveData update commits its own transaction, so rapid edits (retime 50 shots, link assets one by one)
+pay a commit on the network share each. WriteBehindPool queues such edits and commits them together
+in one transaction, settings.WRITE_BEHIND_DELAY seconds after the first queued edit or on flush().
+
+Pending edits are merged by key: the last UPDATE of an entity or the last link/unlink of a shot asset wins,
+so each row is written once. Ordering:
+    - queued edits are committed in one transaction, all of them or none
+    - any other read or write through the pool flushes the queue first, so queries never see data older
+      than the edits and synchronous writes (add, delete) run after edits made before them
+Pending edits are lost if the process crashes before the flush, but the database always holds
+a consistent state. The queue is flushed at close() and at interpreter exit (pools with pending edits
+are tracked by weak references, closed pools are not kept alive).
+The flush thread commits with its own connection. EveData gets the commit as its own from the pool
+(see connection.ConnectionPool.add_commit_listener), so cached entities and project graph are kept.
+Call flush() to commit in the current thread.
+
+Failed flush keeps edits in the queue and the flush thread waits for next edit or flush() to retry.
+Edits rejected by the database (constraint errors) are dropped. flush() raises both kinds of errors,
+failures of other flushes are passed to functions in failure_listeners (may be called in the flush thread).
+Functions in flush_listeners get keys of written and rejected edits after each flush, e.g. EveData marks
+entities of rejected edits as not saved.
+
+WriteBehindPool has the same interface as connection.ConnectionPool:
+    pool = WriteBehindPool(connection.get_pool(SQL_FILE_PATH), delay=0.5)
+    pool.put(('shots', shot.id), "UPDATE shots SET start_frame=:start_frame WHERE id=:id", {...})
+    pool.put_update('shots', shot.id, {'end_frame': 1100})  # Merged with queued UPDATE of the shot
+    pool.read_queued(read_links, ('shot_assets', shot.id))  # Committed links and queued link edits of the shot
+    pool.flush()
+"""
+
+
+import time
+import atexit
+import weakref
+import sqlite3
+import itertools
+import threading
+import collections
+
+import query
+
+
+# Pools flushed at interpreter exit
+_open_pools = weakref.WeakSet()
+
+
+def flush_at_exit():
+
+    for pool in list(_open_pools):
+        pool.flush_at_exit()
+
+
+atexit.register(flush_at_exit)
+
+
+class RejectedWrites(sqlite3.IntegrityError):
+    def __init__(self, rejected):
+        """
+        Queued edits rejected by the database
+
+        :param rejected: list of (key, error)
+        """
+
+        sqlite3.IntegrityError.__init__(self, '; '.join(['{0}: {1}'.format(key, error) for key, error in rejected]))
+        self.rejected = rejected
+
+
+class WriteBehindPool:
+    def __init__(self, pool, delay):
+        """
+        :param pool: connection pool which runs the writes (connection.ConnectionPool, replica.ReplicaPool...)
+        :param delay: float, seconds between the first queued edit and the flush
+        """
+
+        self.pool = pool
+        self.delay = delay
+
+        self.writes = collections.OrderedDict()  # {key: (sql, parameters)} in order of first edit
+        self.queued_at = None  # Time of the first pending edit
+        self.failed = False  # Last flush failed, wait for next edit before retry
+        self.closed = False
+        self.failure_listeners = []  # Functions called with exception when background flush fails
+        self.flush_listeners = []  # Functions called with (keys, rejected) after each flush, see flush()
+
+        self._condition = threading.Condition(threading.RLock())
+        self._thread = None
+
+    def __getattr__(self, name):
+
+        return getattr(self.pool, name)
+
+    # Queue
+    def put(self, key, sql, parameters):
+        """
+        Queue write statement, replace pending statement with the same key
+
+        :param key: tuple, written row (e.g. ('assets', asset_id) or ('shot_assets', shot_id, asset_id))
+        :param sql: string, statement
+        :param parameters: statement parameters
+        """
+
+        with self._condition:
+            if not self.writes:
+                self.queued_at = time.time()
+
+            self.writes[key] = (sql, parameters)
+            self.failed = False
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='EveWriteBehind')
+                self._thread.daemon = True
+                self._thread.start()
+                _open_pools.add(self)
+
+            self._condition.notify_all()
+
+    def put_update(self, table, row_id, changes):
+        """
+        Queue UPDATE of changed columns of a row. Columns of queued UPDATE of the same row are kept,
+        so edits of different columns made before the flush are written by one statement.
+
+        :param table: string, table name
+        :param row_id: int, row database ID
+        :param changes: dictionary {column: value}
+        """
+
+        key = (table, row_id)
+
+        with self._condition:
+            if key in self.writes:
+                parameters = dict(self.writes[key][1])
+                parameters.update(changes)
+            else:
+                parameters = dict(changes, id=row_id)
+
+            columns = sorted([column for column in parameters if column != 'id'])
+            self.put(key, query.get_update_sql(table, columns), parameters)
+
+    def read_queued(self, read, key_prefix):
+        """
+        Read committed data together with queued edits of it, without flushing the queue
+        (e.g. links of a shot while assets are linked one by one)
+
+        :param read: function(cursor), reads committed data
+        :param key_prefix: tuple, first items of keys of queued edits, e.g. ('shot_assets', shot_id)
+        :return: tuple (result of read, list of (key, (sql, parameters)) of queued edits in order of first edit)
+        """
+
+        # Flush does not commit the queue between the reads
+        with self._condition:
+            result = read(self.pool.cursor())
+            queued = [(key, write) for key, write in self.writes.iteritems() if key[:len(key_prefix)] == key_prefix]
+
+        return result, queued
+
+    def flush(self):
+        """
+        Commit pending edits in one transaction
+
+        If the transaction fails (e.g. database is locked), all edits stay in the queue and the error is raised.
+        Edits rejected by the database (e.g. link to a shot deleted by another artist) are dropped,
+        other edits are committed and RejectedWrites error is raised.
+
+        :return: int, number of written statements
+        """
+
+        with self._condition:
+            if not self.writes:
+                return 0
+
+            writes = self.writes.items()
+
+            try:
+                rejected = self.write(writes)
+            except Exception:
+                self.failed = True
+                raise
+
+            self.writes.clear()
+            self.queued_at = None
+            self.failed = False
+
+        for listener in self.flush_listeners:
+            listener([key for key, write in writes], rejected)
+
+        if rejected:
+            raise RejectedWrites(rejected)
+
+        return len(writes) - len(rejected)
+
+    def write(self, writes):
+        """
+        Run queued statements in one transaction
+
+        :param writes: list of (key, (sql, parameters))
+        :return: list of (key, error) of rejected statements
+        """
+
+        try:
+            with self.pool.transaction() as cursor:
+                # Statements of the same kind run together
+                for sql, statements in itertools.groupby(writes, lambda write: write[1][0]):
+                    cursor.executemany(sql, [parameters for _, (_, parameters) in statements])
+            return []
+        except sqlite3.IntegrityError:
+            pass
+
+        # Find rejected statements: run each one in a savepoint
+        rejected = []
+        with self.pool.transaction():
+            for key, (sql, parameters) in writes:
+                try:
+                    with self.pool.transaction() as cursor:
+                        cursor.execute(sql, parameters)
+                except sqlite3.IntegrityError as error:
+                    rejected.append((key, error))
+
+        return rejected
+
+    def run(self):
+        """
+        Flush thread: commit edits delay seconds after the first pending edit
+        """
+
+        while True:
+            with self._condition:
+                while not self.closed and (not self.writes or self.failed):
+                    self._condition.wait()
+
+                if self.closed:
+                    return
+
+                wait_time = self.queued_at + self.delay - time.time()
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+                    continue
+
+                try:
+                    self.flush()
+                except Exception as error:
+                    self.report(error)
+
+    def flush_pending(self):
+        """
+        Flush before other statements. Only failed transaction is raised, rejected edits are reported.
+        """
+
+        try:
+            self.flush()
+        except RejectedWrites as error:
+            self.report(error)
+
+    def flush_at_exit(self):
+
+        try:
+            self.flush()
+        except Exception as error:
+            self.report(error)
+
+        self.stop()
+
+    def report(self, error):
+
+        print '>> ERROR! Eve database edits were not saved: {0}'.format(error)
+
+        for listener in self.failure_listeners:
+            listener(error)
+
+    # Pool interface, pending edits are written before other statements
+    def get(self):
+
+        return self.pool.get()
+
+    def cursor(self):
+
+        if self.writes:
+            self.flush_pending()
+
+        return self.pool.cursor()
+
+    def transaction(self, mode='IMMEDIATE'):
+
+        if self.writes:
+            self.flush_pending()
+
+        return self.pool.transaction(mode)
+
+    def get_data_version(self):
+
+        return self.pool.get_data_version()
+
+    def stop(self):
+        """
+        Stop flush thread, next edit starts a new one
+        """
+
+        if self._thread:
+            with self._condition:
+                self.closed = True
+                self._condition.notify_all()
+
+            self._thread.join()
+            self._thread = None
+            self.closed = False
+
+        _open_pools.discard(self)
+
+    def close(self):
+
+        try:
+            self.flush()
+        finally:
+            self.stop()
+            self.pool.close()
@@ -0,0 +1,144 @@
+"""
+Background data loading for Eve tools UI
+
+Run database reads in worker threads and deliver results to the GUI thread with Qt signals,
+so slow network share does not freeze the window.
+
+Requests are grouped in channels ('project', 'sequence', 'shot'...). New request in a channel cancels
+the previous one: not started task is removed from the pool, result of a running task is ignored.
+
+Usage:
+    loader = DataLoader()
+    loader.busy.connect(show_loading_state)
+    loader.load('project', read_project, project_id, callback=fill_project)
+
+Functions passed to loader run in a worker thread, so they must not touch widgets or
+EveData lists used by UI models. Callback runs in GUI thread.
+"""
+
+
+import traceback
+from PySide2 import QtCore
+
+
+class TaskSignals(QtCore.QObject):
+    finished = QtCore.Signal(int, object)  # Request ID, result
+    failed = QtCore.Signal(int, str)  # Request ID, error message
+
+
+class Task(QtCore.QRunnable):
+    def __init__(self, request_id, function, args):
+        super(Task, self).__init__()
+        self.setAutoDelete(False)
+
+        self.request_id = request_id
+        self.function = function
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+
+        try:
+            result = self.function(*self.args)
+        except Exception:
+            self.signals.failed.emit(self.request_id, traceback.format_exc())
+            return
+
+        self.signals.finished.emit(self.request_id, result)
+
+
+class DataLoader(QtCore.QObject):
+    busy = QtCore.Signal(bool)  # True when loading started, False when all requests are done
+    failed = QtCore.Signal(str, str)  # Channel, error message
+
+    def __init__(self, parent=None):
+        super(DataLoader, self).__init__(parent)
+
+        self.pool = QtCore.QThreadPool(self)
+        self.request_id = 0
+
+        self._channels = {}  # {channel: request_id}, latest request in channel
+        self._requests = {}  # {request_id: (channel, task, callback)}, pending requests
+
+    def load(self, channel, function, *args, **kwargs):
+        """
+        Run function(*args) in worker thread, call callback(result) in GUI thread when it is done.
+
+        :param channel: string, request group. New request cancels previous request in the same channel
+        :param function: function to run in worker thread
+        :param args: function arguments
+        :param kwargs: callback=function receiving function result
+        :return: int, request ID
+        """
+
+        self.cancel(channel)
+
+        self.request_id += 1
+        task = Task(self.request_id, function, args)
+        task.signals.finished.connect(self.on_finished)
+        task.signals.failed.connect(self.on_failed)
+
+        self._channels[channel] = self.request_id
+        self._requests[self.request_id] = (channel, task, kwargs.get('callback'))
+
+        if len(self._requests) == 1:
+            self.busy.emit(True)
+
+        self.pool.start(task)
+
+        return self.request_id
+
+    def cancel(self, channel):
+        """
+        Cancel current request in the channel
+        """
+
+        request_id = self._channels.pop(channel, None)
+        if request_id is None:
+            return
+
+        # Remove task from queue if it is not started yet, otherwise on_finished will skip its result
+        channel, task, callback = self._requests[request_id]
+        if self.pool.tryTake(task):
+            self.finish_request(request_id)
+
+    def is_current(self, request_id):
+
+        if request_id not in self._requests:
+            return False
+
+        channel = self._requests[request_id][0]
+
+        return self._channels.get(channel) == request_id
+
+    def finish_request(self, request_id):
+
+        self._requests.pop(request_id, None)
+
+        if not self._requests:
+            self.busy.emit(False)
+
+    def on_finished(self, request_id, result):
+
+        current = self.is_current(request_id)
+        channel, task, callback = self._requests[request_id]
+        self.finish_request(request_id)
+
+        # Skip result of cancelled request
+        if not current:
+            return
+
+        del self._channels[channel]
+
+        if callback:
+            callback(result)
+
+    def on_failed(self, request_id, message):
+
+        current = self.is_current(request_id)
+        channel = self._requests[request_id][0]
+        self.finish_request(request_id)
+
+        if current:
+            del self._channels[channel]
+            self.failed.emit(channel, message)
@@ -1,5 +1,7 @@
 from PySide2 import QtCore, QtGui
 
+from core import settings
+
 
 # PySide Eve Data Model
 class ListModel(QtCore.QAbstractListModel):
@@ -8,6 +10,10 @@ class ListModel(QtCore.QAbstractListModel):
         self._data = data
         # print 'Model [data] = ', self._data
 
+        # EveData collections notify the model about added, removed and changed rows (see EntityCollection)
+        if hasattr(data, 'observers'):
+            data.observers.add(self)
+
     def rowCount(self, parent):
         """
         How many items the model contains
@@ -35,3 +41,117 @@ class ListModel(QtCore.QAbstractListModel):
             return data.id
         if role == QtCore.Qt.UserRole + 2:  # Return NAME
             return data.name
+
+    # Collection notifications
+    def rows_about_to_be_inserted(self, first, last):
+
+        self.beginInsertRows(QtCore.QModelIndex(), first, last)
+
+    def rows_inserted(self):
+
+        self.endInsertRows()
+
+    def rows_about_to_be_removed(self, first, last):
+
+        self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+
+    def rows_removed(self):
+
+        self.endRemoveRows()
+
+    def rows_changed(self, first, last):
+
+        self.dataChanged.emit(self.index(first), self.index(last))
+
+    def rows_about_to_be_reset(self):
+
+        self.beginResetModel()
+
+    def rows_reset(self):
+
+        self.endResetModel()
+
+
+class PagedListModel(ListModel):
+    """
+    List model which reads entities page by page when view scrolls to the end of loaded rows.
+
+    Pages are read with keyset pagination functions of EveData, e.g.:
+        fetch_page = functools.partial(eve_data.get_project_assets_page, project)
+        model = PagedListModel(fetch_page)
+    """
+
+    def __init__(self, fetch_page, page_size=settings.PAGE_SIZE, parent=None):
+        """
+        :param fetch_page: function(after_id, page_size), returns list of entities with ID greater than after_id
+        :param page_size: int, number of entities read at once
+        """
+
+        ListModel.__init__(self, [], parent)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.has_more = True
+
+    def canFetchMore(self, parent):
+
+        if parent.isValid():
+            return False
+
+        return self.has_more
+
+    def fetchMore(self, parent):
+
+        if parent.isValid() or not self.has_more:
+            return
+
+        after_id = self._data[-1].id if self._data else None
+        page = self.fetch_page(after_id, self.page_size)
+        self.has_more = len(page) == self.page_size
+
+        if not page:
+            return
+
+        self.beginInsertRows(QtCore.QModelIndex(), len(self._data), len(self._data) + len(page) - 1)
+        self._data.extend(page)
+        self.endInsertRows()
+
+    def find_row(self, entity_id):
+        """
+        Get row of the entity, read next pages until entity is found.
+        Pages are ordered by ID, so reading stops at the first page past entity ID (e.g. entity was deleted).
+
+        :return: int, row number or -1 if entity is not in the list
+        """
+
+        if entity_id is None:
+            return -1
+
+        row = 0
+        while True:
+            for entity in self._data[row:]:
+                if entity.id == entity_id:
+                    return row
+                row += 1
+
+            if not self.has_more or (self._data and self._data[-1].id > entity_id):
+                return -1
+
+            self.fetchMore(QtCore.QModelIndex())
+
+    def reset(self, fetch_page=None):
+        """
+        Drop loaded rows and read the first page
+
+        :param fetch_page: new page function (e.g. with other filters)
+        """
+
+        self.beginResetModel()
+
+        if fetch_page:
+            self.fetch_page = fetch_page
+        del self._data[:]
+        self.has_more = True
+
+        self.endResetModel()
+
+        self.fetchMore(QtCore.QModelIndex())
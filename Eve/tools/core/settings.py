@@ -2,6 +2,8 @@
 Eve pipeline core settings
 """
 
+import os
+
 # Path to Eve SQL database file
 SQL_FILE_PATH = '{0}/data/eve.db'
 # Folder with projects
@@ -13,3 +15,57 @@ HOUDINI = 'C:/Program Files/Side Effects Software/Houdini {0}/bin/houdinifx.exe'
 HIP = 'hipnc'
 # Eve documentation
 DOCS = 'https://github.com/kiryha/Houdini/wiki/'
+# SQLite journal mode of eve.db. Default 'DELETE' journal is safe on a network share used from many hosts.
+# WAL allows readers to work while one artist writes, but relies on shared memory: enable it (EVE_JOURNAL_MODE=WAL)
+# only when all clients run on one host or work through the data service.
+SQL_JOURNAL_MODE = os.environ.get('EVE_JOURNAL_MODE', 'DELETE').upper()
+# SQLite PRAGMA profile applied to each database connection when it opens.
+# Memory mapped I/O is enabled with WAL only, it is not safe for files on a network share.
+SQL_PRAGMAS = [
+    ('journal_mode', SQL_JOURNAL_MODE),
+    ('foreign_keys', 'ON'),  # Deletes cascade to children (see migrations.add_cascading_foreign_keys)
+    ('synchronous', 'NORMAL' if SQL_JOURNAL_MODE == 'WAL' else 'FULL'),
+    ('cache_size', -16000),  # Negative value is KiB (16 MB)
+    ('mmap_size', 268435456 if SQL_JOURNAL_MODE == 'WAL' else 0)]  # 256 MB
+# Maximum number of entities kept in EveData identity map (0 disables the cache)
+ENTITY_CACHE_SIZE = 10000
+# How often Houdini tools pull database changes made by other artists (milliseconds)
+SYNC_INTERVAL = 10000
+# Local read replica of eve.db for render farm nodes: reads go to the local copy, writes to eve.db.
+# Enabled by EVE_REPLICA_PATH environment variable (e.g. 'C:/temp/eve_replica.db')
+SQL_REPLICA_PATH = os.environ.get('EVE_REPLICA_PATH')
+# How often replica checks if eve.db was changed (seconds)
+REPLICA_CHECK_INTERVAL = 30
+# PRAGMA profile of replica connections
+SQL_REPLICA_PRAGMAS = [
+    ('query_only', 1),
+    ('cache_size', -16000),
+    ('mmap_size', 268435456)]
+# Eve data service owns eve.db and serializes writes of all clients (core/database/service.py).
+# Clients work through the service when EVE_SERVICE environment variable is set ('host:port')
+SERVICE_ADDRESS = os.environ.get('EVE_SERVICE')
+# Address the service listens on. The service has no authentication: serve other hosts ('0.0.0.0')
+# on a trusted network only.
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 9500
+# Maximum number of client transactions committed together by the service
+SERVICE_BATCH_SIZE = 100
+# Work with in-memory copy of eve.db (unit tests, benchmarks, short hython jobs, see core/database/memory.py).
+# Enabled by EVE_IN_MEMORY environment variable: 'snapshot' drops changes on close, 'write_back' writes them to eve.db
+SQL_IN_MEMORY = os.environ.get('EVE_IN_MEMORY')
+# Number of compiled SQL statements kept by each connection (query.Query reuses statement text per query shape)
+SQL_CACHED_STATEMENTS = 200
+# Number of entities read at once by paged lists (models.PagedListModel)
+PAGE_SIZE = 200
+# Seconds between EveData edit and its commit: edits made in between are saved in one transaction
+# (core/database/write_behind.py). 0 commits each edit immediately.
+WRITE_BEHIND_DELAY = 0
+# Number of latest database revisions kept in change feed history, older tombstones of deleted rows are pruned
+# when EveData is closed (see migrations.prune_changes)
+CHANGE_HISTORY_SIZE = 100000
+# Collect EveData and AssetData call stats (core/database/profiler.py), enabled by EVE_PROFILE environment variable
+PROFILE_DATABASE = bool(os.environ.get('EVE_PROFILE'))
+# Statements running longer are logged with their query plan (seconds)
+SLOW_QUERY_TIME = 0.1
+# Number of recent slow statements kept in the log
+SLOW_QUERY_LOG_SIZE = 200
@@ -1,5 +1,6 @@
 import hou
 import os
+import functools
 from PySide2 import QtCore, QtWidgets
 from ui import ui_asset_manager
 
@@ -28,6 +29,7 @@ class AssetManager(QtWidgets.QDialog, ui_asset_manager.Ui_AssetManager):
         # Get Project Manager data
         self.eve_data = None
         self.project = None
+        self.model_asset_types = None
         self.model_assets = None
         # Get asset data
         self.asset_data = None
@@ -35,23 +37,62 @@ class AssetManager(QtWidgets.QDialog, ui_asset_manager.Ui_AssetManager):
         self.init_asset_manager()
 
         # Setup UI functionality
+        self.comAssetType.currentIndexChanged.connect(self.init_assets)
         self.btnAssetCrete.clicked.connect(self.create_asset_scene)
         self.btnAssetOpen.clicked.connect(self.open_asset_scene)
 
+        # Pull changes made by other artists
+        self.sync_timer = QtCore.QTimer(self)
+        self.sync_timer.timeout.connect(self.sync)
+        self.sync_timer.start(settings.SYNC_INTERVAL)
+
     def init_asset_manager(self):
 
         # Get Eve data
-        self.eve_data = eve_data.EveData(self.SQL_FILE_PATH)
-        self.project = self.eve_data.get_project_by_name(self.project_name)
+        self.eve_data = eve_data.EveData(self.SQL_FILE_PATH, project_name=self.project_name)
+        self.project = self.eve_data.project
 
-        # Fill Asset Types
-        model_asset_types = models.ListModel(self.eve_data.asset_types)
-        self.comAssetType.setModel(model_asset_types)
+        # Fill Asset Types (first item shows assets of all types)
+        asset_types = [entities.AssetType(None, 'all', 'All asset types')] + self.eve_data.asset_types
+        self.model_asset_types = models.ListModel(asset_types)
+        self.comAssetType.setModel(self.model_asset_types)
 
-        # Fill Asset list in UI
-        self.eve_data.get_project_assets(self.project)
-        self.model_assets = models.ListModel(self.eve_data.project_assets)
+        # Fill Asset list in UI (assets are read page by page when list scrolls)
+        fetch_page = functools.partial(self.eve_data.get_project_assets_page, self.project)
+        self.model_assets = models.PagedListModel(fetch_page)
         self.comAssetName.setModel(self.model_assets)
+        self.init_assets()
+
+    def init_assets(self):
+        """
+        Show project assets of selected type
+        """
+
+        model_index = self.comAssetType.model().index(self.comAssetType.currentIndex(), 0)
+        asset_type = model_index.data(QtCore.Qt.UserRole + 1)
+
+        self.model_assets.reset(functools.partial(self.eve_data.get_project_assets_page, self.project,
+                                                  asset_type=asset_type))
+
+    def sync(self):
+        """
+        Apply database changes made by other artists, keep current asset selected
+        """
+
+        if not self.eve_data.pull_changes():
+            return
+
+        asset_id = self.comAssetName.model().index(self.comAssetName.currentIndex(), 0).data(QtCore.Qt.UserRole + 1)
+
+        self.init_assets()
+
+        # Selected asset was deleted or nothing was selected: do not page through the project looking for it
+        if asset_id is None or self.eve_data.get_asset(asset_id) is None:
+            return
+
+        row = self.model_assets.find_row(asset_id)
+        if row != -1:
+            self.comAssetName.setCurrentIndex(row)
 
     def get_asset_data(self):
         # Get Asset Object
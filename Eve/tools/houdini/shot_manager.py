@@ -43,16 +43,21 @@ class ShotManager(QtWidgets.QDialog, ui_shot_manager.Ui_ShotManager):
         self.btnCreateRenderScene.clicked.connect(self.run_create_render_scene)
         self.btnOpenRenderScene.clicked.connect(self.run_open_render_scene)
 
+        # Pull changes made by other artists
+        self.sync_timer = QtCore.QTimer(self)
+        self.sync_timer.timeout.connect(self.sync)
+        self.sync_timer.start(settings.SYNC_INTERVAL)
+
     def init_shot_manager(self):
         """
         Load data for Shot Manager
         :return:
         """
 
-        self.eve_data = eve_data.EveData(self.SQL_FILE_PATH)
-        self.project = self.eve_data.get_project_by_name(self.project_name)
+        self.eve_data = eve_data.EveData(self.SQL_FILE_PATH, project_name=self.project_name)
+        self.project = self.eve_data.project
 
-        self.eve_data.get_project_sequences(self.project)
+        self.eve_data.load_project_graph(self.project)
         self.model_sequences = models.ListModel(self.eve_data.project_sequences)
 
         self.boxSequence.setModel(self.model_sequences)
@@ -84,7 +89,34 @@ class ShotManager(QtWidgets.QDialog, ui_shot_manager.Ui_ShotManager):
         shot = self.eve_data.get_shot(shot_id)
 
         if shot:
-            self.selected_shot = self.eve_data.get_shot(shot.id)
+            self.selected_shot = shot
+
+    def sync(self):
+        """
+        Apply database changes made by other artists, keep current sequence and shot selected
+        """
+
+        if not self.eve_data.pull_changes():
+            return
+
+        sequence_id = self.selected_sequence.id if self.selected_sequence else None
+        shot_id = self.selected_shot.id if self.selected_shot else None
+
+        self.boxSequence.blockSignals(True)
+        self.boxShot.blockSignals(True)
+
+        self.eve_data.get_project_sequences(self.project)
+        self.eve_data.get_sequence_shots(sequence_id)
+
+        self.boxSequence.setCurrentIndex(max(self.eve_data.project_sequences.row(sequence_id), 0))
+        self.boxShot.setCurrentIndex(max(self.eve_data.sequence_shots.row(shot_id), 0))
+
+        self.boxSequence.blockSignals(False)
+        self.boxShot.blockSignals(False)
+
+        # Selected sequence was deleted
+        if self.eve_data.project_sequences.get(sequence_id) is None:
+            self.init_shots()
 
     def run_create_render_scene(self):
 
@@ -1,4 +1,5 @@
 import os
+import time
 import sqlite3
 import subprocess
 import webbrowser
@@ -23,8 +24,11 @@ from ui import ui_pm_add_shot
 
 from core.database import entities
 from core.database import eve_data
+from core.database import profiler
+from core.database import schema
 from core import settings
 from core import models
+from core import loader
 
 import houdini_launcher
 
@@ -471,6 +475,12 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         self.model_sequences = None
         self.model_shots = None
         self.model_shot_assets = None
+        self.model_asset_shots = None
+
+        # Read database in worker threads
+        self.loader = loader.DataLoader(self)
+        self.loader.busy.connect(self.show_loading)
+        self.loader.failed.connect(self.show_loading_error)
 
         # Eve data
         self.selected_project = None
@@ -491,6 +501,8 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Connect functions
         # Menu
         self.actionEveDocs.triggered.connect(self.docs)
+        self.actionDumpDatabaseStats.triggered.connect(self.dump_database_stats)
+        self.actionDumpDatabaseStats.setVisible(settings.PROFILE_DATABASE)
         # Project section
         self.listProjects.clicked.connect(self.init_project)
         self.btnAddProject.clicked.connect(self.AP.exec_)
@@ -532,160 +544,39 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Root folder for the report files
         webbrowser.open(settings.DOCS)
 
+    def dump_database_stats(self):
+        """
+        Save database call stats collected since Project Manager start (EVE_PROFILE mode) to JSON file
+        """
+
+        stats_file = '{0}/data/eve_stats_{1}.json'.format(self.eve_root, time.strftime('%Y%m%d_%H%M%S'))
+        profiler.PROFILER.export(stats_file)
+        profiler.PROFILER.report()
+
+        print '>> Database stats saved to {0}'.format(stats_file)
+        self.statusbar.showMessage('Database stats saved to {0}'.format(stats_file))
+
     def init_database(self, connection, cursor):
         """
         Create database tables
         :return:
         """
 
-        # TYPES
-        cursor.execute('''CREATE TABLE asset_types (
-                        id integer primary key autoincrement,
-                        name text,
-                        description text
-                        )''')
-
-        cursor.execute('''CREATE TABLE file_types (
-                        id integer primary key autoincrement,
-                        name text,
-                        description text
-                        )''')
-
-        # MAIN ITEMS
-        cursor.execute('''CREATE TABLE projects (
-                        id integer primary key autoincrement,
-                        name text,
-                        houdini_build text,
-                        width integer,
-                        height integer,
-                        description text
-                        )''')
-
-        cursor.execute('''CREATE TABLE assets (
-                        id integer primary key autoincrement,
-                        name text,
-                        project integer,
-                        type integer,
-                        description text,
-                        FOREIGN KEY(project) REFERENCES projects(id)
-                        FOREIGN KEY(type) REFERENCES asset_types(id)
-                        )''')
-
-        cursor.execute('''CREATE TABLE sequences (
-                        id integer primary key autoincrement,
-                        name text,
-                        project integer,
-                        description text,
-                        FOREIGN KEY(project) REFERENCES projects(id)
-                        )''')
-
-        cursor.execute('''CREATE TABLE shots (
-                        id integer primary key autoincrement,
-                        name text,
-                        sequence integer,
-                        start_frame integer,
-                        end_frame integer,
-                        width integer, 
-                        height integer,
-                        description text,
-                        FOREIGN KEY(sequence) REFERENCES sequences(id)
-                        )''')
-
-        # FILES
-        cursor.execute('''CREATE TABLE asset_files (
-                        id integer primary key autoincrement,
-                        type integer,
-                        asset integer,
-                        snapshot integer,
-                        description text,
-                        FOREIGN KEY(type) REFERENCES file_types(id)
-                        FOREIGN KEY(asset) REFERENCES assets(id)
-                        FOREIGN KEY(snapshot) REFERENCES asset_snapshots(id)
-                        )''')
-
-        cursor.execute('''CREATE TABLE shot_files (
-                        id integer primary key autoincrement,
-                        type integer,
-                        shot integer,
-                        snapshot integer,
-                        description text,
-                        FOREIGN KEY(type) REFERENCES file_types(id)
-                        FOREIGN KEY(shot) REFERENCES shots(id)
-                        FOREIGN KEY(snapshot) REFERENCES shot_snapshots(id)
-                        )''')
-
-        # LINKS
-        # Link assets to the shots
-        cursor.execute('''CREATE TABLE shot_assets (
-                        id integer primary key autoincrement,
-                        shot_id integer,
-                        asset_id integer,
-                        FOREIGN KEY(shot_id) REFERENCES shots(id)
-                        FOREIGN KEY(asset_id) REFERENCES assets(id)
-                        )''')
-
-        # SNAPSHOTS
-        cursor.execute('''CREATE TABLE asset_snapshot (
-                        id integer primary key autoincrement,
-                        asset_name text,
-                        asset_id text,
-                        asset_version text,
-                        description text
-                        )''')
-
-        connection.commit()
+        schema.init_database(connection, cursor)
 
     def init_asset_types(self, connection, cursor):
         """
         Fill asset types table in the DB (character, environment, prop, FX)
-
-        :param connection:
-        :param cursor:
-        :return:
         """
 
-        for name, data in entities.Asset.asset_types.iteritems():
-            cursor.execute("INSERT INTO asset_types VALUES ("
-                           ":id,"
-                           ":name,"
-                           ":description)",
-
-                           {'id': data['id'],
-                            'name': name,
-                            'description': data['description']})
-
-        connection.commit()
+        schema.init_asset_types(connection, cursor)
 
     def init_file_types(self, connection, cursor):
         """
-        Fill file types table in the DB.
-
-        Any file used in Eve should has a particular type. Here is the full list of all possible types in Eve.
-
-        asset_hip:
-            Working scene for Assets. Here we store all source data to build an asset. Results are exported as caches,
-            and caches used in asset_hda files.
-
-        asset_hda:
-            Houdini Digital Asset for ASSETS. Used to load assets of any type (char, env, props, fx) into shots.
-            Contain cached data with interface. Source of cached data is stored in asset_hip
-
-        :param connection:
-        :param cursor:
-        :return:
+        Fill file types table in the DB (see schema.init_file_types)
         """
 
-        for name, data in entities.EveFile.file_types.iteritems():
-            cursor.execute("INSERT INTO file_types VALUES ("
-                           ":id,"
-                           ":name,"
-                           ":description)",
-
-                           {'id': data['id'],
-                            'name': name,
-                            'description': data['description']})
-
-        connection.commit()
+        schema.init_file_types(connection, cursor)
 
     def init_default_project(self, SQL_FILE_PATH, project_name):
         """
@@ -702,7 +593,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         cursor = connection.cursor()
 
         # Add "library" project to DB
-        cursor.execute("INSERT INTO projects VALUES ("
+        cursor.execute("INSERT INTO projects (id, name, houdini_build, description) VALUES ("
                        ":id,"
                        ":name,"
                        ":houdini_build,"
@@ -783,14 +674,39 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Setup data
         model_index = self.listProjects.currentIndex()  # .selectedIndexes()[0]
         project_id = model_index.data(QtCore.Qt.UserRole + 1)
-        project = self.eve_data.get_project(project_id)
-        self.selected_project = project
-        self.eve_data.get_project_assets(project)
-        self.eve_data.get_project_sequences(project)
 
         # Clear SHOTS in UI
         self.listShots.setModel(models.ListModel([]))
 
+        # Load project data in background, results of previous project, sequence and shot selection are dropped
+        self.loader.cancel('sequence')
+        self.loader.cancel('shot')
+        self.loader.load('project', self.read_project, project_id, callback=self.fill_project)
+
+    def read_project(self, project_id):
+        """
+        Read project data from database. Runs in worker thread.
+
+        Load project assets, sequences and shots, so sequence and shot selection will not query database
+        """
+
+        project = self.eve_data.get_project(project_id)
+        project_graph = self.eve_data.read_project_graph(project)
+        project_exists = os.path.exists(build_project_root(project.name))
+
+        return project_graph, project_exists
+
+    def fill_project(self, project_data):
+        """
+        Fill UI with project data loaded by read_project()
+        """
+
+        project_graph, project_exists = project_data
+        project = self.eve_data.fill_partial(self.eve_data.projects, project_graph.project)
+        project_graph.project = project
+        self.selected_project = project
+        self.eve_data.set_project_graph(project_graph)
+
         # Fill Project Properties widget
         project_root = build_project_root(project.name)
         self.project_properties_ui.project_ui.linProjectLocation.setText(project_root)
@@ -810,7 +726,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         self.listSequences.setModel(self.model_sequences)
 
         # Enable/disable UI buttons depending on project existence
-        if os.path.exists(project_root):
+        if project_exists:
             self.project_properties_ui.btnCreateProject.setText(self.btn_project_update)
             self.project_properties_ui.btnLaunchHoudini.setEnabled(True)
             self.project_properties_ui.btnLaunchNuke.setEnabled(True)
@@ -851,6 +767,14 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         self.asset_properties_ui.asset_ui.comAssetType.setCurrentText(asset_type_string)
         self.asset_properties_ui.asset_ui.txtDescription.setText(asset.description)
 
+        # Shots which use the asset (affected by asset changes)
+        self.model_asset_shots = models.ListModel(self.eve_data.get_asset_shots(asset.id))
+        self.asset_properties_ui.listAssetShots.setModel(self.model_asset_shots)
+        asset_usage = self.eve_data.get_asset_usage(self.selected_project)
+        unused_assets = len([asset_id for asset_id, shots in asset_usage.iteritems() if not shots])
+        usage_text = 'Used in {0} shots (project assets not used in shots: {1})'
+        self.asset_properties_ui.labAssetShots.setText(usage_text.format(asset_usage.get(asset.id, 0), unused_assets))
+
     def init_sequence(self):
         """
         When SEQUENCE selected in UI
@@ -865,10 +789,30 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Setup data for sequence
         model_index = self.listSequences.currentIndex()
         sequence_id = model_index.data(QtCore.Qt.UserRole + 1)
+
+        self.loader.cancel('shot')
+        self.loader.load('sequence', self.read_sequence, sequence_id, callback=self.fill_sequence)
+
+    def read_sequence(self, sequence_id):
+        """
+        Read sequence and its shots from database. Runs in worker thread.
+        """
+
         sequence = self.eve_data.get_sequence(sequence_id)
+        shots = self.eve_data.read_sequence_shots(sequence_id)
+
+        return sequence, shots
+
+    def fill_sequence(self, sequence_data):
+        """
+        Fill UI with sequence data loaded by read_sequence()
+        """
+
+        sequence, shots = sequence_data
+        sequence = self.eve_data.fill_partial(self.eve_data.project_sequences, sequence)
         self.selected_sequence = sequence
         # and shot
-        self.eve_data.get_sequence_shots(sequence.id)
+        self.eve_data.get_sequence_shots(sequence.id, shots)
         self.model_shots = models.ListModel(self.eve_data.sequence_shots)
         self.listShots.setModel(self.model_shots)
 
@@ -892,11 +836,30 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Setup data
         model_index = self.listShots.currentIndex()
         shot_id = model_index.data(QtCore.Qt.UserRole + 1)
+
+        self.loader.load('shot', self.read_shot, shot_id, callback=self.fill_shot)
+
+    def read_shot(self, shot_id):
+        """
+        Read shot and linked assets from database. Runs in worker thread.
+        """
+
         shot = self.eve_data.get_shot(shot_id)
+        assets = self.eve_data.read_shot_assets(shot_id)
+
+        return shot, assets
+
+    def fill_shot(self, shot_data):
+        """
+        Fill UI with shot data loaded by read_shot()
+        """
+
+        shot, assets = shot_data
+        shot = self.eve_data.fill_partial(self.eve_data.sequence_shots, shot)
         self.selected_shot = shot
 
         # FILL SHOT ASSETS WIDGET
-        self.eve_data.get_shot_assets(shot_id)
+        self.eve_data.get_shot_assets(shot.id, assets)
         self.model_shot_assets = models.ListModel(self.eve_data.shot_assets)
         self.shot_properties_ui.shot_ui.listAssets.setModel(self.model_shot_assets)
 
@@ -911,6 +874,23 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         self.shot_properties_ui.shot_ui.linHeight.setText(str(shot.height))
         self.shot_properties_ui.shot_ui.txtDescription.setText(shot.description)
 
+    def show_loading(self, loading):
+        """
+        Show loading state while loader reads database
+        """
+
+        if loading:
+            self.statusbar.showMessage('Loading...')
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.BusyCursor)
+        else:
+            self.statusbar.clearMessage()
+            QtWidgets.QApplication.restoreOverrideCursor()
+
+    def show_loading_error(self, channel, message):
+
+        print '>> ERROR! Loading {0} data failed:\n{1}'.format(channel, message)
+        self.statusbar.showMessage('Loading {0} data failed!'.format(channel))
+
     def add_project(self, project_name, houdini_build, project_width, project_height, project_description):
         """
         Add project to database and reload UI
@@ -924,9 +904,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         project.description = project_description
 
         # Add project to DB and update UI
-        self.model_projects.layoutAboutToBeChanged.emit()
         self.eve_data.add_project(project)
-        self.model_projects.layoutChanged.emit()
 
     def add_asset(self, project, asset_name, asset_type_id, asset_description):
         """
@@ -939,9 +917,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         asset.description = asset_description
 
         # Add asset to DB and update UI
-        self.model_assets.layoutAboutToBeChanged.emit()
         self.eve_data.add_asset(asset, project.id)
-        self.model_assets.layoutChanged.emit()
 
     def add_sequence(self, project, sequence_name, sequence_description):
 
@@ -950,9 +926,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         sequence.description = sequence_description
 
         # Add asset to DB and update UI
-        self.model_sequences.layoutAboutToBeChanged.emit()
         self.eve_data.add_sequence(sequence, project.id)
-        self.model_sequences.layoutChanged.emit()
 
     def add_shot(self, sequence, shot_name, shot_start_frame, shot_end_frame, shot_width, shot_height, shot_description):
 
@@ -965,9 +939,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         shot.description = shot_description
 
         # Add asset to DB and update UI
-        self.model_shots.layoutAboutToBeChanged.emit()
         self.eve_data.add_shot(shot, sequence.id)
-        self.model_shots.layoutChanged.emit()
 
     def del_project(self):
         """
@@ -982,9 +954,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         warn = Warnings(project_name)
         if warn.exec_():
             # Remove project from DB
-            self.model_projects.layoutAboutToBeChanged.emit()
             self.eve_data.del_project(project_id)
-            self.model_projects.layoutChanged.emit()
 
     def del_asset(self):
         """
@@ -994,27 +964,21 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Notify user about delete
         warning = Warnings(self.selected_asset.name)
         if warning.exec_():
-            self.model_assets.layoutAboutToBeChanged.emit()
             self.eve_data.del_asset(self.selected_asset.id)
-            self.model_assets.layoutChanged.emit()
 
     def del_sequence(self):
 
         # Notify user about delete
         warning = Warnings(self.selected_sequence.name)
         if warning.exec_():
-            self.model_sequences.layoutAboutToBeChanged.emit()
             self.eve_data.del_sequence(self.selected_sequence.id)
-            self.model_sequences.layoutChanged.emit()
 
     def del_shot(self):
 
         # Notify user about delete
         warning = Warnings(self.selected_shot.name)
         if warning.exec_():
-            self.model_shots.layoutAboutToBeChanged.emit()
             self.eve_data.del_shot(self.selected_shot.id)
-            self.model_shots.layoutChanged.emit()
 
     def update_project(self):
         """
@@ -1027,7 +991,7 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         project = self.selected_project
 
         # Update project data
-        project.maya = self.project_properties_ui.project_ui.linHoudini.text()
+        project.houdini_build = self.project_properties_ui.project_ui.linHoudini.text()
         project.width = self.project_properties_ui.project_ui.linProjectWidth.text()
         project.height = self.project_properties_ui.project_ui.linProjectHeight.text()
         project.description = self.project_properties_ui.project_ui.txtDescription.toPlainText()
@@ -1106,24 +1070,28 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
 
     def link_assets(self, model_indexes, shot):
 
-        for model_index in model_indexes:
-            # Link asset
-            if self.eve_data.link_asset(model_index.data(QtCore.Qt.UserRole + 1), shot.id):
-                # Updated UI
-                self.model_shot_assets.layoutAboutToBeChanged.emit()
-                self.eve_data.get_shot_assets(shot.id)
-                self.model_shot_assets.layoutChanged.emit()
+        # Link assets in one transaction, shot assets list is updated once
+        asset_ids = [model_index.data(QtCore.Qt.UserRole + 1) for model_index in model_indexes]
+        linked_ids = self.eve_data.link_many(shot.id, asset_ids)
 
+        for model_index in model_indexes:
+            if model_index.data(QtCore.Qt.UserRole + 1) in linked_ids:
                 print '>> Asset {0} linked to shot {1}'.format(model_index.data(QtCore.Qt.UserRole + 2), shot.name)
             else:
                 print '>> Asset {0} already linked to shot {1}'.format(model_index.data(QtCore.Qt.UserRole + 2), shot.name)
 
+        # Save queued links (write-behind mode)
+        self.eve_data.flush()
+
     def unlink_assets(self, list_assets, shot):
 
+        self.eve_data.unlink_many(shot.id, [asset.id for asset in list_assets])
+
         for asset in list_assets:
-            self.eve_data.unlink_asset(asset.id, shot.id)
             print '>> Asset {0} unlinked from shot {1}'.format(asset.name, shot.name)
 
+        self.eve_data.flush()
+
     # MAIN FUNCTIONS
     def launch_houdini(self, script=None, id=None):
 
@@ -1243,9 +1211,8 @@ class ProjectManager(QtWidgets.QMainWindow,  ui_pm_main.Ui_ProjectManager):
         # Get selected assets from UI
         model_indexes = self.shot_properties_ui.shot_ui.listAssets.selectedIndexes()
 
-        list_assets = []
-        for model_index in model_indexes:
-            list_assets.append(self.eve_data.get_asset(model_index.data(QtCore.Qt.UserRole + 1)))
+        asset_ids = [model_index.data(QtCore.Qt.UserRole + 1) for model_index in model_indexes]
+        list_assets = self.eve_data.get_assets_by_ids(asset_ids)
 
         # Break links
         self.unlink_assets(list_assets, self.selected_shot)
@@ -20,6 +20,12 @@ class Ui_AssetProperties(object):
         self.layoutAsset = QtWidgets.QVBoxLayout()
         self.layoutAsset.setObjectName("layoutAsset")
         self.verticalLayout.addLayout(self.layoutAsset)
+        self.labAssetShots = QtWidgets.QLabel(AssetProperties)
+        self.labAssetShots.setObjectName("labAssetShots")
+        self.verticalLayout.addWidget(self.labAssetShots)
+        self.listAssetShots = QtWidgets.QListView(AssetProperties)
+        self.listAssetShots.setObjectName("listAssetShots")
+        self.verticalLayout.addWidget(self.listAssetShots)
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         self.verticalLayout.addItem(spacerItem)
         self.btnUpdateAsset = QtWidgets.QPushButton(AssetProperties)
@@ -40,6 +46,7 @@ class Ui_AssetProperties(object):
 
     def retranslateUi(self, AssetProperties):
         AssetProperties.setWindowTitle(QtWidgets.QApplication.translate("AssetProperties", "Form", None, -1))
+        self.labAssetShots.setText(QtWidgets.QApplication.translate("AssetProperties", "Used in shots", None, -1))
         self.btnUpdateAsset.setText(QtWidgets.QApplication.translate("AssetProperties", "Update Asset Data", None, -1))
         self.btnCreateHoudiniFile.setText(QtWidgets.QApplication.translate("AssetProperties", "Create Houdini Scene", None, -1))
         self.btnOpenHoudiniFile.setText(QtWidgets.QApplication.translate("AssetProperties", "Open Houdini Scene", None, -1))
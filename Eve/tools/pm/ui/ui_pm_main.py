@@ -106,8 +106,11 @@ class Ui_ProjectManager(object):
         self.actionSettings.setObjectName("actionSettings")
         self.actionCreateDatabase = QtWidgets.QAction(ProjectManager)
         self.actionCreateDatabase.setObjectName("actionCreateDatabase")
+        self.actionDumpDatabaseStats = QtWidgets.QAction(ProjectManager)
+        self.actionDumpDatabaseStats.setObjectName("actionDumpDatabaseStats")
         self.menuHelp.addAction(self.actionEveDocs)
         self.menuEve.addAction(self.actionSettings)
+        self.menuEve.addAction(self.actionDumpDatabaseStats)
         self.menubar.addAction(self.menuEve.menuAction())
         self.menubar.addAction(self.menuHelp.menuAction())
 
@@ -133,4 +136,5 @@ class Ui_ProjectManager(object):
         self.actionEveDocs.setText(QtWidgets.QApplication.translate("ProjectManager", "Eve Documentation", None, -1))
         self.actionSettings.setText(QtWidgets.QApplication.translate("ProjectManager", "Settings", None, -1))
         self.actionCreateDatabase.setText(QtWidgets.QApplication.translate("ProjectManager", "Create Database", None, -1))
+        self.actionDumpDatabaseStats.setText(QtWidgets.QApplication.translate("ProjectManager", "Dump Database Stats", None, -1))
 